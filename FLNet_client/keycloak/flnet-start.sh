@@ -0,0 +1,75 @@
+#!/bin/bash
+# Entrypoint of the optimized keycloak image: runs 'kc.sh "$@"' and imports the realm only on the first boot.
+# After the first successful start with --import-realm a marker is written and --import-realm is dropped
+# from then on, so keycloak does not parse the realm export on every restart.
+# If the realm is missing despite the marker (e.g. the database volume was removed), the marker is
+# deleted, keycloak is stopped and the script runs itself again with the original arguments, so
+# the realm is imported within the same container.
+set -uo pipefail
+
+MARKER="/opt/keycloak/data/flnet/realm-imported"
+REALM="${FLNET_REALM:-FLNet-Client}"
+RELATIVE_PATH="${KC_HTTP_RELATIVE_PATH:-}"
+
+# HTTP status code of a GET request to keycloak, bash only as the image has no curl/wget
+http_status() {
+    local port="$1" path="$2" status
+    exec 3<>"/dev/tcp/127.0.0.1/${port}" || return 1
+    printf 'GET %s HTTP/1.1\r\nHost: localhost:%s\r\nConnection: close\r\n\r\n' "$path" "$port" >&3
+    read -r _ status _ <&3
+    exec 3<&-
+    echo "$status"
+}
+
+args=()
+skipped_import=false
+for arg in "$@"; do
+    if [[ "$arg" == "--import-realm" && -f "$MARKER" ]]; then
+        echo "flnet-start: realm '${REALM}' was imported before, starting without --import-realm"
+        skipped_import=true
+        continue
+    fi
+    args+=("$arg")
+done
+
+/opt/keycloak/bin/kc.sh "${args[@]}" &
+pid=$!
+trap 'kill -TERM "$pid" 2>/dev/null' TERM INT
+
+until [[ "$(http_status 9000 "${RELATIVE_PATH}/health/ready" 2>/dev/null)" == "200" ]]; do
+    if ! kill -0 "$pid" 2>/dev/null; then
+        wait "$pid"
+        exit $?
+    fi
+    sleep 1
+done
+
+case "$(http_status 8080 "${RELATIVE_PATH}/realms/${REALM}" 2>/dev/null)" in
+    200)
+        if [[ ! -f "$MARKER" ]]; then
+            echo "flnet-start: realm '${REALM}' is present, later starts skip the import"
+            touch "$MARKER"
+        fi
+        ;;
+    404)
+        if [[ "$skipped_import" == true ]]; then
+            echo "flnet-start: realm '${REALM}' is missing, restarting with --import-realm"
+            rm -f "$MARKER"
+            trap - TERM INT
+            kill -TERM "$pid"
+            wait "$pid"
+            # without the marker the import is not skipped, so a missing realm cannot loop
+            exec "$0" "$@"
+        fi
+        echo "flnet-start: WARNING: realm '${REALM}' is missing after the start"
+        ;;
+esac
+
+# wait returns early when a signal is trapped, keep waiting until keycloak has shut down
+wait "$pid"
+status=$?
+while kill -0 "$pid" 2>/dev/null; do
+    wait "$pid"
+    status=$?
+done
+exit "$status"
@@ -0,0 +1,19 @@
+#!/bin/bash
+# Creates the databases and roles of all services in the shared postgres server
+# (see docker-compose.shared-postgres.yml). Only run by the postgres image on the first start.
+set -euo pipefail
+
+create_database() {
+    local database="$1" user="$2" password="$3"
+    echo "Creating database '${database}' owned by '${user}'"
+    psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" \
+        --set=database="$database" --set=user="$user" --set=password="$password" <<'EOSQL'
+CREATE ROLE :"user" LOGIN PASSWORD :'password';
+CREATE DATABASE :"database" OWNER :"user";
+REVOKE ALL ON DATABASE :"database" FROM PUBLIC;
+EOSQL
+}
+
+create_database "$ORCH_API_DB" "$ORCH_API_DB_USER" "$ORCH_API_DB_PASSWORD"
+create_database "$LOCAL_LEARNING_API_DB" "$LOCAL_LEARNING_API_DB_USER" "$LOCAL_LEARNING_API_DB_PASSWORD"
+create_database "$KEYCLOAK_DB" "$KEYCLOAK_DB_USER" "$KEYCLOAK_DB_PASSWORD"
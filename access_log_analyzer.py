@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Analyzes the access log of the FLNet Client reverse proxy.
+Reads the detailed_debug log format of nginx_server.conf (enable it with the
+access log question of client_installer.py) and reports latency percentiles,
+error rates and bytes per location, per upstream and per time window, plus the
+slowest endpoints and requests. Comparing the request time with the upstream
+response time shows whether keycloak, the importer, the learning API or the
+proxy itself is the latency source.
+
+The log is parsed as a stream with constant memory (log bucketed histograms),
+so logs of several GB work. Plain files are split into byte ranges and
+analyzed by several processes (see --jobs).
+
+Usage:
+    docker compose logs --no-log-prefix reverse-proxy-encrypted | python3 access_log_analyzer.py -
+    python3 access_log_analyzer.py proxy.log proxy.log.1.gz --window 1h --output latency.json
+    python3 access_log_analyzer.py --check-locations --client-dir FLNet_client
+"""
+import argparse
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from client_installer import FLNET_CLIENT_DIR
+
+# The detailed_debug log_format of nginx_server.conf, up to bytes_sent. search() instead of
+# match(), so prefixes of 'docker compose logs' (e.g. 'reverse-proxy-1  | ') are skipped.
+DETAILED_DEBUG_PATTERN = re.compile(
+    rb'\[(?P<time>[^\]]+)\] "(?P<request>[^"]*)" (?P<status>\d{3}) (?P<body_bytes>\d+) "[^"]*" '
+    rb'rt=(?P<request_time>[\d.]+) ua="[^"]*" upstream_addr="(?P<upstream_addr>[^"]*)" '
+    rb'upstream_status="[^"]*" upstream_response_time="(?P<upstream_time>[^"]*)" '
+    rb'request_length=(?P<request_length>\d+) bytes_sent=(?P<bytes_sent>\d+)'
+)
+# Path segments that identify a resource, collapsed so endpoints group e.g. /runs/17 and /runs/18
+ID_SEGMENT_PATTERN = re.compile(r'^(\d+|[0-9a-fA-F-]{32,36}|[0-9a-fA-F]{16,})$')
+# Tokens of an nginx config: quoted strings (may contain braces, e.g. regex locations), comments, braces/semicolons and words
+NGINX_TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|#[^\n]*|[{};]|[^\s{};"\'#]+')
+PROXY_PASS_UPSTREAM_PATTERN = re.compile(r'^https?://([\w.$-]+)')
+# The prefix locations of the shipped nginx.conf, checked by --check-locations
+EXPECTED_LOCATIONS = ("/", "/importer/", "/local-learning-api/", "/auth/")
+MINUTE_FORMAT = "%d/%b/%Y:%H:%M %z"
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# nginx logs times with millisecond resolution, buckets grow by 2% (the relative error of the percentiles)
+HISTOGRAM_MIN_SECONDS = 0.001
+HISTOGRAM_GROWTH = 1.02
+HISTOGRAM_INVERSE_LOG_GROWTH = 1 / math.log(HISTOGRAM_GROWTH)
+# Bounds of the memory used for endpoints, all further endpoints are counted as OTHER_ENDPOINT
+MAX_ENDPOINTS = 10000
+OTHER_ENDPOINT = "(other endpoints)"
+SLOWEST_REQUESTS = 20
+MIN_REQUESTS_PER_SLOW_ENDPOINT = 5
+READ_BUFFER_BYTES = 1024 * 1024
+MIN_RANGE_BYTES = 64 * 1024 * 1024
+# Raw paths whose normalized endpoint is remembered, the cache is cleared when full
+MAX_CACHED_PATHS = 100000
+
+# ============================================================================
+# Statistics
+# ============================================================================
+class LatencyHistogram:
+    """Latency histogram with log sized buckets, constant memory and mergeable across processes."""
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        bucket = 0 if seconds <= HISTOGRAM_MIN_SECONDS else int(math.log(seconds / HISTOGRAM_MIN_SECONDS) * HISTOGRAM_INVERSE_LOG_GROWTH) + 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the percentile, in seconds."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** bucket)
+        return self.max
+
+
+class RequestStats:
+    """Counters and latency histograms of a group of requests (a location, upstream or time window)."""
+    def __init__(self):
+        self.requests = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.request_time = LatencyHistogram()
+        self.upstream_time = LatencyHistogram()
+
+    def add(self, status: int, request_time: float, upstream_time: Optional[float], bytes_sent: int, bytes_received: int) -> None:
+        self.requests += 1
+        if 400 <= status < 500:
+            self.client_errors += 1
+        elif status >= 500:
+            self.server_errors += 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.request_time.add(request_time)
+        if upstream_time is not None:
+            self.upstream_time.add(upstream_time)
+
+    def merge(self, other: 'RequestStats') -> None:
+        self.requests += other.requests
+        self.client_errors += other.client_errors
+        self.server_errors += other.server_errors
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.request_time.merge(other.request_time)
+        self.upstream_time.merge(other.upstream_time)
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "client_error_rate": self.client_errors / self.requests if self.requests else None,
+            "server_error_rate": self.server_errors / self.requests if self.requests else None,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            **{f"request_{name}": self.request_time.percentile(fraction) for name, fraction in PERCENTILES.items()},
+            "request_max": self.request_time.max if self.requests else None,
+            **{f"upstream_{name}": self.upstream_time.percentile(fraction) for name, fraction in PERCENTILES.items()},
+        }
+
+
+PERCENTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+class EndpointStats:
+    """Count, total and maximum request time of one endpoint, small enough for thousands of endpoints."""
+    def __init__(self):
+        self.requests = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, request_time: float) -> None:
+        self.requests += 1
+        self.total += request_time
+        if request_time > self.max:
+            self.max = request_time
+
+    def merge(self, other: 'EndpointStats') -> None:
+        self.requests += other.requests
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+
+class LogAnalysis:
+    """The statistics of a log (or a part of it), grouped by location, upstream, time window and endpoint."""
+    def __init__(self, locations: dict, window_seconds: int):
+        self.locations = locations  # location prefix -> upstream name, see load_locations
+        self.window_seconds = window_seconds
+        self.lines = 0
+        self.unparsed = 0
+        self.by_location = {}
+        self.by_upstream = {}
+        self.by_window = {}
+        self.endpoints = {}
+        self.slowest = []  # min heap of (request_time, time, request, status)
+        self._prefixes = sorted(locations, key=len, reverse=True)
+        self._last_minute = (None, None)
+        self._endpoint_of_path = {}
+
+    def location_of(self, path: str) -> str:
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                return prefix
+        return "(no location)"
+
+    def window_of(self, time_local: str) -> int:
+        # time_local is e.g. '17/Oct/2026:10:00:00 +0000', consecutive lines share their minute,
+        # so only the minute is parsed (strptime is slow) and the seconds are added
+        minute = time_local[:17] + time_local[20:]
+        if self._last_minute[0] != minute:
+            self._last_minute = (minute, int(datetime.strptime(minute, MINUTE_FORMAT).timestamp()))
+        timestamp = self._last_minute[1] + int(time_local[18:20])
+        return timestamp // self.window_seconds * self.window_seconds
+
+    def endpoint_of(self, method: str, path: str) -> str:
+        endpoint = self._endpoint_of_path.get((method, path))
+        if endpoint is None:
+            if len(self._endpoint_of_path) >= MAX_CACHED_PATHS:
+                self._endpoint_of_path.clear()
+            endpoint = self._endpoint_of_path[(method, path)] = f"{method} {normalize_path(path)}"
+        return endpoint
+
+    def add_line(self, line: bytes) -> None:
+        self.lines += 1
+        match = DETAILED_DEBUG_PATTERN.search(line)
+        if not match:
+            self.unparsed += 1
+            return
+        request = match.group("request").decode(errors="replace")
+        parts = request.split(" ")
+        method, path = (parts[0], parts[1]) if len(parts) >= 2 else ("-", request)
+        path = path.split("?", 1)[0]
+        status = int(match.group("status"))
+        request_time = float(match.group("request_time"))
+        upstream_time = parse_upstream_time(match.group("upstream_time"))
+        bytes_sent = int(match.group("bytes_sent"))
+        bytes_received = int(match.group("request_length"))
+
+        location = self.location_of(path)
+        upstream = self.locations.get(location) or ("(none)" if upstream_time is None else "(unknown)")
+        time_local = match.group("time").decode()
+        window = self.window_of(time_local)
+        for groups, key in ((self.by_location, location), (self.by_upstream, upstream), (self.by_window, window)):
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = RequestStats()
+            stats.add(status, request_time, upstream_time, bytes_sent, bytes_received)
+
+        endpoint = self.endpoint_of(method, path)
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            if len(self.endpoints) >= MAX_ENDPOINTS:
+                endpoint = OTHER_ENDPOINT
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+        stats.add(request_time)
+
+        if len(self.slowest) < SLOWEST_REQUESTS:
+            heapq.heappush(self.slowest, (request_time, time_local, request, status))
+        elif request_time > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (request_time, time_local, request, status))
+
+    def merge(self, other: 'LogAnalysis') -> None:
+        self.lines += other.lines
+        self.unparsed += other.unparsed
+        for own, others in ((self.by_location, other.by_location), (self.by_upstream, other.by_upstream),
+                            (self.by_window, other.by_window), (self.endpoints, other.endpoints)):
+            for key, stats in others.items():
+                if key in own:
+                    own[key].merge(stats)
+                else:
+                    own[key] = stats
+        for entry in other.slowest:
+            if len(self.slowest) < SLOWEST_REQUESTS:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def slowest_endpoints(self, limit: int) -> list:
+        """Endpoints with the highest mean request time, ignoring rarely requested ones."""
+        candidates = [(stats.total / stats.requests, endpoint, stats) for endpoint, stats in self.endpoints.items()
+                      if stats.requests >= MIN_REQUESTS_PER_SLOW_ENDPOINT]
+        return [
+            {"endpoint": endpoint, "requests": stats.requests, "mean": mean, "max": stats.max}
+            for mean, endpoint, stats in sorted(candidates, reverse=True)[:limit]
+        ]
+
+    def report(self, limit: int) -> dict:
+        return {
+            "lines": self.lines,
+            "unparsed_lines": self.unparsed,
+            "locations": {key: stats.summary() for key, stats in sorted(self.by_location.items())},
+            "upstreams": {key: stats.summary() for key, stats in sorted(self.by_upstream.items())},
+            "windows": {datetime.fromtimestamp(key).astimezone().isoformat(): stats.summary()
+                        for key, stats in sorted(self.by_window.items())},
+            "slowest_endpoints": self.slowest_endpoints(limit),
+            "slowest_requests": [
+                {"request_time": request_time, "time": time_local, "request": request, "status": status}
+                for request_time, time_local, request, status in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+def parse_upstream_time(value: bytes) -> Optional[float]:
+    """Sum of the upstream response times, nginx logs one per tried upstream server ('0.010, 0.002') or '-'."""
+    total, found = 0.0, False
+    for part in value.replace(b":", b",").split(b","):
+        part = part.strip()
+        if part and part != b"-":
+            total += float(part)
+            found = True
+    return total if found else None
+
+
+def normalize_path(path: str) -> str:
+    return "/".join(":id" if ID_SEGMENT_PATTERN.match(segment) else segment for segment in path.split("/"))
+
+# ============================================================================
+# Reading
+# ============================================================================
+def parse_nginx_config(text: str) -> list:
+    """The statements of an nginx config as nested [(words, children)], children is None for simple directives."""
+    stack = [[]]
+    words = []
+    for token in NGINX_TOKEN_PATTERN.findall(text):
+        if token.startswith('#'):
+            continue
+        if token == '{':
+            block = (words, [])
+            stack[-1].append(block)
+            stack.append(block[1])
+            words = []
+        elif token == '}':
+            if len(stack) > 1:
+                stack.pop()
+            words = []
+        elif token == ';':
+            stack[-1].append((words, None))
+            words = []
+        else:
+            words.append(token.strip('"\''))
+    return stack[0]
+
+
+def walk_nginx_blocks(statements: list):
+    """All block statements (server, location, map, if, ...) at any depth."""
+    for words, children in statements:
+        if children is not None:
+            yield words, children
+            yield from walk_nginx_blocks(children)
+
+
+def load_locations(client_dir: Path) -> dict:
+    """
+    The prefix locations of nginx.conf and the upstream each proxies to (its own proxy_pass, not the ones
+    of nested blocks). A proxy_pass to a variable of a map (e.g. $frontend_upstream, which selects the
+    network of co-hosted domains) is reported as the default upstream of the map, or as the variable
+    itself if the map selects further upstreams.
+    """
+    nginx_conf = client_dir / 'nginx.conf'
+    if not nginx_conf.exists():
+        return {}
+    statements = parse_nginx_config(nginx_conf.read_text())
+    maps = {}
+    for words, children in walk_nginx_blocks(statements):
+        if words[:1] == ['map'] and len(words) == 3:
+            values = {entry[0]: entry[1] for entry, nested in children if nested is None and len(entry) == 2}
+            maps[words[2]] = values['default'] if list(values) == ['default'] else words[2]
+    locations = {}
+    for words, children in walk_nginx_blocks(statements):
+        if words[:1] != ['location'] or len(words) != 2 or not words[1].startswith('/'):
+            continue  # regex, exact and named locations are not matched by prefix
+        for directive, nested in children:
+            match = PROXY_PASS_UPSTREAM_PATTERN.match(directive[1]) if nested is None and directive[:1] == ['proxy_pass'] and len(directive) > 1 else None
+            if match:
+                upstream = match.group(1)
+                locations[words[1]] = maps.get(upstream, upstream) if upstream.startswith('$') else upstream
+                break
+    return locations
+
+
+def parse_window(value: str) -> int:
+    match = re.fullmatch(r"(\d+)([smhd])", value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a window like 30s, 15m, 1h or 1d")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+
+def analyze_stream(stream, locations: dict, window_seconds: int) -> LogAnalysis:
+    analysis = LogAnalysis(locations, window_seconds)
+    for line in stream:
+        analysis.add_line(line)
+    return analysis
+
+
+def analyze_range(path: str, start: int, end: int, locations: dict, window_seconds: int) -> LogAnalysis:
+    """Analyze the lines starting within [start, end) of a plain file."""
+    analysis = LogAnalysis(locations, window_seconds)
+    with open(path, "rb", buffering=READ_BUFFER_BYTES) as stream:
+        if start:
+            # the line crossing start belongs to the previous range
+            stream.seek(start - 1)
+            stream.readline()
+        position = stream.tell()
+        while position < end:
+            line = stream.readline()
+            if not line:
+                break
+            position += len(line)
+            analysis.add_line(line)
+    return analysis
+
+
+def split_ranges(size: int, jobs: int) -> list:
+    count = max(1, min(jobs, size // MIN_RANGE_BYTES))
+    step = math.ceil(size / count) if size else 1
+    return [(start, min(size, start + step)) for start in range(0, max(size, 1), step)]
+
+
+def analyze(paths: list, locations: dict, window_seconds: int, jobs: int) -> LogAnalysis:
+    """Analyze all logs, '-' is stdin. Plain files are analyzed in parallel byte ranges."""
+    total = LogAnalysis(locations, window_seconds)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+        for path in paths:
+            if path == "-":
+                total.merge(analyze_stream(sys.stdin.buffer, locations, window_seconds))
+            elif path.endswith(".gz"):
+                with gzip.open(path, "rb") as stream:
+                    total.merge(analyze_stream(stream, locations, window_seconds))
+            else:
+                futures += [executor.submit(analyze_range, path, start, end, locations, window_seconds)
+                            for start, end in split_ranges(os.path.getsize(path), jobs)]
+        for future in futures:
+            total.merge(future.result())
+    return total
+
+# ============================================================================
+# Report
+# ============================================================================
+def format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"{value * 1000:.0f}ms" if value < 1 else f"{value:.2f}s"
+
+
+def format_rate(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def format_bytes(value: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.0f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TB"
+
+
+def print_table(title: str, groups: dict) -> None:
+    print(title)
+    print(f"{'':<28}{'requests':>10}{'4xx':>8}{'5xx':>8}{'sent':>9}{'received':>10}"
+          f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'upstream p50':>14}{'p95':>9}{'p99':>9}")
+    for key, summary in groups.items():
+        print(f"{str(key):<28}{summary['requests']:>10}{format_rate(summary['client_error_rate']):>8}"
+              f"{format_rate(summary['server_error_rate']):>8}{format_bytes(summary['bytes_sent']):>9}"
+              f"{format_bytes(summary['bytes_received']):>10}"
+              + "".join(f"{format_seconds(summary[f'request_{name}']):>9}" for name in PERCENTILES)
+              + f"{format_seconds(summary['request_max']):>9}"
+              + f"{format_seconds(summary['upstream_p50']):>14}"
+              + "".join(f"{format_seconds(summary[f'upstream_{name}']):>9}" for name in ("p95", "p99")))
+    print()
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['lines']} lines, {report['unparsed_lines']} not in the detailed_debug format.")
+    if report["lines"] and report["unparsed_lines"] == report["lines"]:
+        print("Warning: No line matched. Enable the detailed access log with client_installer.py.")
+    print()
+    print_table("Per location:", report["locations"])
+    print_table("Per upstream (upstream = time spent in the service, the rest is proxy and client):", report["upstreams"])
+    print_table("Per time window:", report["windows"])
+    print("Slowest endpoints (mean request time):")
+    for endpoint in report["slowest_endpoints"]:
+        print(f"  {format_seconds(endpoint['mean']):>9} mean {format_seconds(endpoint['max']):>9} max "
+              f"{endpoint['requests']:>8} requests  {endpoint['endpoint']}")
+    print()
+    print("Slowest requests:")
+    for request in report["slowest_requests"]:
+        print(f"  {format_seconds(request['request_time']):>9}  {request['time']}  {request['status']}  {request['request']}")
+
+# ============================================================================
+# Main
+# ============================================================================
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="*", help="Access log files (plain or .gz), '-' reads stdin")
+    parser.add_argument("--client-dir", type=Path, default=FLNET_CLIENT_DIR, help="Client directory with the nginx.conf of the locations")
+    parser.add_argument("--window", type=parse_window, default="1h", help="Size of the time windows, e.g. 15m, 1h or 1d (default 1h)")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest endpoints to report")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processes analyzing plain files in parallel")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    parser.add_argument("--check-locations", action="store_true",
+                        help="Only list the locations found in nginx.conf, exit code 1 if one of the shipped ones is missing")
+    args = parser.parse_args(argv)
+
+    locations = load_locations(args.client_dir)
+    missing = [location for location in EXPECTED_LOCATIONS if location not in locations]
+    if args.check_locations:
+        for location, upstream in sorted(locations.items()):
+            print(f"{location:<32}{upstream}")
+        if missing:
+            print(f"Missing locations: {', '.join(missing)}")
+        return 1 if missing else 0
+    if not args.logs:
+        parser.error("no access logs given")
+    if missing:
+        print(f"Warning: Locations not found in '{args.client_dir / 'nginx.conf'}': {', '.join(missing)}, "
+              "their requests are reported as '(no location)'.", file=sys.stderr)
+
+    report = analyze(args.logs, locations, args.window, max(1, args.jobs)).report(args.top)
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to '{args.output}'.")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\nCancelled by user.")
+        sys.exit(1)
+    except (ValueError, OSError) as e:
+        print(f"\n\nError: {e}", file=sys.stderr)
+        sys.exit(1)
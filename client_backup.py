@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Backs up and restores the databases and imported files of a running FLNet Client.
+
+    backup:  dump all databases concurrently with their online dump tools (pg_dump, mariadb-dump) and
+             tar the imported files. Every dump is streamed through gzip straight into the backup
+             folder, next to SHA256SUMS and a manifest.json with the sizes and timings. The client
+             keeps running, the dumps are consistent snapshots per database.
+    restore: verify the checksums, stop the services using the data, restore all dumps in parallel
+             and start the services again. The downtime is reported.
+
+The databases of every postgres server are discovered, so the databases of co-hosted networks and
+the shared database mode are included. The credentials are read from the generated env/*-secrets.env,
+a restore on another host needs the env/ folder of the backed up client.
+
+Usage:
+    python3 client_backup.py backup --target /backup/flnet
+    python3 client_backup.py restore --source /backup/flnet/20261017T020000Z
+
+All docker interaction goes through the docker CLI (see --docker), so the tool can
+be run against a stand-in script instead of a real daemon.
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from client_installer import (
+    FLNET_CLIENT_DIR, MARIADB_SERVICES, POSTGRES_SERVICES, SHARED_POSTGRES_OVERLAY, SHARED_POSTGRES_SERVICE, read_env_file,
+)
+from image_bundle import CHUNK_SIZE, HashingWriter, file_sha256
+
+# Superuser and secrets file of every postgres server, the password is POSTGRES_PASSWORD in all of them
+POSTGRES_CREDENTIALS = {
+    'orch-api-db': ('user', 'orch-secrets.env'),
+    'local-learning-api-db': ('user', 'local-learning-secrets.env'),
+    'keycloak-postgres': ('keycloak', 'keycloak-secrets.env'),
+    SHARED_POSTGRES_SERVICE.name: ('postgres', 'postgres-shared-secrets.env'),
+}
+MARIADB_SECRETS_FILE = 'dataimport-secrets.env'
+MARIADB_DATABASE = 'dataimport'
+FILES_SERVICE = 'dataimporter-api'
+FILES_DIR = '/usr/src/api/files'
+# connections of the databases to themselves, so the dumps are not limited by the docker network
+DATABASE_HOST = '127.0.0.1'
+LIST_DATABASES_QUERY = "SELECT datname FROM pg_database WHERE datallowconn AND NOT datistemplate AND datname <> 'postgres' ORDER BY datname"
+MANIFEST_FILE = 'manifest.json'
+CHECKSUMS_FILE = 'SHA256SUMS'
+PARTIAL_SUFFIX = '.partial'
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# ============================================================================
+# Backup items
+# ============================================================================
+class BackupItem:
+    """
+    One dump of the backup: a postgres database, the mariadb database or the imported files.
+    kind is 'postgres', 'mariadb' or 'files', database is None for the files.
+    """
+    def __init__(self, kind: str, service: str, database: Optional[str] = None):
+        self.kind = kind
+        self.service = service
+        self.database = database
+
+    @property
+    def file_name(self) -> str:
+        if self.kind == 'postgres':
+            return f'{self.service}.{self.database}.pgdump.gz'
+        if self.kind == 'mariadb':
+            return f'{self.service}.{self.database}.sql.gz'
+        return f'{self.service}.files.tar.gz'
+
+    def __str__(self) -> str:
+        return f'{self.service}/{self.database}' if self.database else f'{self.service}:{FILES_DIR}'
+
+
+def database_mode(client_dir: Path) -> str:
+    """'shared' if the client runs the shared postgres server (per COMPOSE_FILE of .env), else 'separate'."""
+    compose_files = read_env_file(client_dir / '.env').get('COMPOSE_FILE', 'docker-compose.yml').split(os.pathsep)
+    return "shared" if SHARED_POSTGRES_OVERLAY in compose_files else "separate"
+
+
+def postgres_servers(mode: str) -> list:
+    if mode == "shared":
+        return [SHARED_POSTGRES_SERVICE.name]
+    return [service.name for service in POSTGRES_SERVICES]
+
+
+def credentials(client_dir: Path, item_kind: str, service: str) -> tuple:
+    """(user, environment for the client tool) of a database service, the password never is part of a command line."""
+    if item_kind == 'files':
+        return None, {}
+    if item_kind == 'postgres':
+        user, secrets_file = POSTGRES_CREDENTIALS[service]
+        return user, {'PGPASSWORD': read_env_file(client_dir / 'env' / secrets_file)['POSTGRES_PASSWORD']}
+    return 'root', {'MYSQL_PWD': read_env_file(client_dir / 'env' / MARIADB_SECRETS_FILE)['MYSQL_ROOT_PASSWORD']}
+
+
+def compose_exec(docker: str, service: str, environment: dict, command: list) -> list:
+    """'docker compose exec' of command in the running service, the variables are passed on from the environment."""
+    variables = [argument for name in sorted(environment) for argument in ("-e", name)]
+    return [docker, "compose", "exec", "-T", *variables, service, *command]
+
+
+def list_databases(docker: str, client_dir: Path, service: str) -> list:
+    user, environment = credentials(client_dir, 'postgres', service)
+    output = subprocess.run(
+        compose_exec(docker, service, environment,
+                     ["psql", "-h", DATABASE_HOST, "-U", user, "-d", "postgres", "-At", "-c", LIST_DATABASES_QUERY]),
+        cwd=client_dir, env={**os.environ, **environment}, check=True, capture_output=True, text=True,
+    ).stdout
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
+
+def backup_items(docker: str, client_dir: Path, mode: str) -> list:
+    """Everything a backup of the client contains."""
+    items = []
+    for service in postgres_servers(mode):
+        items.extend(BackupItem('postgres', service, database) for database in list_databases(docker, client_dir, service))
+    items.extend(BackupItem('mariadb', service.name, MARIADB_DATABASE) for service in MARIADB_SERVICES)
+    items.append(BackupItem('files', FILES_SERVICE))
+    return items
+
+
+def dump_command(docker: str, item: BackupItem, user: Optional[str], environment: dict) -> list:
+    if item.kind == 'postgres':
+        # custom format without compression, gzip compresses the stream outside of the database container
+        command = ["pg_dump", "-h", DATABASE_HOST, "-U", user, "-Fc", "-Z0", "-d", item.database]
+    elif item.kind == 'mariadb':
+        command = ["mariadb-dump", "-h", DATABASE_HOST, f"-u{user}", "--single-transaction", "--quick",
+                   "--routines", "--triggers", "--events", "--databases", item.database]
+    else:
+        command = ["tar", "-C", FILES_DIR, "-cf", "-", "."]
+    return compose_exec(docker, item.service, environment, command)
+
+
+def restore_command(docker: str, item: BackupItem, user: Optional[str], environment: dict) -> list:
+    if item.kind == 'postgres':
+        # the dump recreates the database, connected to the maintenance database meanwhile
+        return compose_exec(docker, item.service, environment,
+                            ["pg_restore", "-h", DATABASE_HOST, "-U", user, "-d", "postgres",
+                             "--create", "--clean", "--if-exists", "--exit-on-error"])
+    if item.kind == 'mariadb':
+        # the dump of --databases drops and recreates every table
+        return compose_exec(docker, item.service, environment, ["mariadb", "-h", DATABASE_HOST, f"-u{user}"])
+    # the importer is stopped during a restore, a one-off container of it mounts the volume
+    return [docker, "compose", "run", "--rm", "--no-deps", "-T", "--entrypoint", "sh", item.service, "-c",
+            f"find {FILES_DIR} -mindepth 1 -delete && tar -C {FILES_DIR} -xf -"]
+
+# ============================================================================
+# Streaming
+# ============================================================================
+def stream_to_file(command: list, cwd: Path, environment: dict, path: Path, compression_level: int) -> dict:
+    """
+    gzip the output of command on the fly into path. The file is written under a temporary
+    name and only renamed when the command succeeded, so a backup never contains a cut off dump.
+    If writing fails (e.g. a full disk), the command is killed and the partial file removed.
+    """
+    partial = path.with_name(path.name + PARTIAL_SUFFIX)
+    uncompressed_size = 0
+    completed = False
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, cwd=cwd, env={**os.environ, **environment},
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            with partial.open("wb") as file:
+                writer = HashingWriter(file)
+                with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=compression_level, mtime=0) as compressed:
+                    while chunk := process.stdout.read(CHUNK_SIZE):
+                        uncompressed_size += len(chunk)
+                        compressed.write(chunk)
+            if process.wait() != 0:
+                errors.seek(0)
+                raise subprocess.CalledProcessError(process.returncode, command, stderr=errors.read().decode(errors="replace"))
+            partial.rename(path)
+            completed = True
+        finally:
+            if process.poll() is None:
+                # otherwise blocked forever on the full pipe nobody reads anymore
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            if not completed:
+                partial.unlink(missing_ok=True)
+    return {"uncompressed_bytes": uncompressed_size, "compressed_bytes": writer.size, "sha256": writer.sha256.hexdigest()}
+
+
+def stream_from_file(command: list, cwd: Path, environment: dict, path: Path) -> None:
+    """Decompress path on the fly into the standard input of command."""
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, cwd=cwd, env={**os.environ, **environment},
+                                   stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errors)
+        try:
+            with gzip.open(path, "rb") as compressed:
+                while chunk := compressed.read(CHUNK_SIZE):
+                    process.stdin.write(chunk)
+        except BrokenPipeError:
+            pass  # the command exited early, its exit code and output tell why
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        if process.wait() != 0:
+            errors.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=errors.read().decode(errors="replace"))
+
+
+def run_parallel(function, items: list, jobs: int) -> tuple:
+    """
+    Run function(item) for all items with jobs threads.
+    Returns ({item: (result, seconds)}, {item: error}), one failed item does not stop the others.
+    """
+    def timed(item):
+        started = time.monotonic()
+        return function(item), time.monotonic() - started
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {item: executor.submit(timed, item) for item in items}
+        for item, future in futures.items():
+            try:
+                results[item] = future.result()
+            except (subprocess.CalledProcessError, ValueError, OSError) as e:
+                errors[item] = e
+    return results, errors
+
+
+def error_details(error: Exception) -> str:
+    stderr = getattr(error, "stderr", None)
+    return f"{error} {stderr.strip()}" if stderr else str(error)
+
+# ============================================================================
+# Backup
+# ============================================================================
+def backup(docker: str, client_dir: Path, target: Path, jobs: Optional[int], compression_level: int) -> dict:
+    """Dump all items concurrently into a new timestamped folder of target, returns the manifest."""
+    started = time.monotonic()
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+    mode = database_mode(client_dir)
+    items = backup_items(docker, client_dir, mode)
+    backup_dir = target / created_at.strftime(TIMESTAMP_FORMAT)
+    backup_dir.mkdir(parents=True)
+    print(f"Backing up {len(items)} items into '{backup_dir}'...")
+
+    def dump(item: BackupItem) -> dict:
+        user, environment = credentials(client_dir, item.kind, item.service)
+        return stream_to_file(dump_command(docker, item, user, environment), client_dir, environment,
+                              backup_dir / item.file_name, compression_level)
+
+    results, errors = run_parallel(dump, items, jobs or len(items))
+    entries = []
+    for item in items:
+        if item in errors:
+            print(f"  FAILED {item}: {error_details(errors[item])}")
+            continue
+        result, seconds = results[item]
+        entries.append({"kind": item.kind, "service": item.service, "database": item.database, "file": item.file_name,
+                        "seconds": round(seconds, 3), **result})
+        print(f"  {item}: {result['uncompressed_bytes'] / 2**20:.1f} MiB -> "
+              f"{result['compressed_bytes'] / 2**20:.1f} MiB in {seconds:.1f} s")
+
+    manifest = {
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "client_dir": str(client_dir),
+        "database_mode": mode,
+        "complete": not errors,
+        "wall_clock_seconds": round(time.monotonic() - started, 3),
+        # all dumps are taken from the running databases
+        "downtime_seconds": 0,
+        "items": entries,
+    }
+    (backup_dir / CHECKSUMS_FILE).write_text("".join(f"{entry['sha256']}  {entry['file']}\n" for entry in entries))
+    (backup_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+# ============================================================================
+# Restore
+# ============================================================================
+def verify_backup(backup_dir: Path, manifest: dict, jobs: int) -> list:
+    """Files of the manifest that are missing or do not match SHA256SUMS (hashed in parallel)."""
+    expected = {}
+    for line in (backup_dir / CHECKSUMS_FILE).read_text().splitlines():
+        if line.strip():
+            checksum, name = line.split(maxsplit=1)
+            expected[name.strip()] = checksum
+    names = [entry["file"] for entry in manifest["items"]]
+    present = [name for name in names if (backup_dir / name).is_file()]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        checksums = dict(zip(present, executor.map(lambda name: file_sha256(backup_dir / name), present)))
+    return [name for name in names if checksums.get(name) is None or checksums[name] != expected.get(name)]
+
+
+def running_services(docker: str, client_dir: Path) -> list:
+    output = subprocess.run([docker, "compose", "ps", "--services", "--status", "running"],
+                            cwd=client_dir, check=True, capture_output=True, text=True).stdout
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
+
+def restore(docker: str, client_dir: Path, backup_dir: Path, jobs: Optional[int]) -> dict:
+    """
+    Restore a backup into the client: the database servers keep running (and are started if needed),
+    all other running services are stopped for the restore and started again afterwards.
+    """
+    started = time.monotonic()
+    manifest = json.loads((backup_dir / MANIFEST_FILE).read_text())
+    mode = database_mode(client_dir)
+    if manifest["database_mode"] != mode:
+        raise ValueError(f"The backup was taken in the {manifest['database_mode']} database mode, the client runs "
+                         f"the {mode} database mode. Re-run client_installer.py with the database mode of the backup.")
+    items = [BackupItem(entry["kind"], entry["service"], entry["database"]) for entry in manifest["items"]]
+    jobs = jobs or max(1, len(items))
+    damaged = verify_backup(backup_dir, manifest, jobs)
+    if damaged:
+        raise ValueError(f"Missing or damaged in '{backup_dir}': " + ", ".join(damaged))
+    if not manifest.get("complete", True):
+        print("WARNING: The backup is incomplete, only the contained items are restored.")
+
+    database_servers = sorted({item.service for item in items if item.kind != 'files'})
+    subprocess.run([docker, "compose", "up", "--detach", "--wait", *database_servers], cwd=client_dir, check=True)
+    stopped = [service for service in running_services(docker, client_dir) if service not in database_servers]
+    print(f"Stopping {len(stopped)} services for the restore...")
+    downtime_started = time.monotonic()
+    if stopped:
+        subprocess.run([docker, "compose", "stop", *stopped], cwd=client_dir, check=True)
+
+    def load(item: BackupItem) -> None:
+        user, environment = credentials(client_dir, item.kind, item.service)
+        stream_from_file(restore_command(docker, item, user, environment), client_dir, environment,
+                         backup_dir / item.file_name)
+
+    try:
+        print(f"Restoring {len(items)} items from '{backup_dir}'...")
+        results, errors = run_parallel(load, items, jobs)
+        for item in items:
+            if item in errors:
+                print(f"  FAILED {item}: {error_details(errors[item])}")
+            else:
+                print(f"  {item}: {results[item][1]:.1f} s")
+    finally:
+        if stopped:
+            subprocess.run([docker, "compose", "start", *stopped], cwd=client_dir, check=True)
+    return {
+        "items": len(items),
+        "failed": [str(item) for item in errors],
+        "wall_clock_seconds": time.monotonic() - started,
+        "downtime_seconds": time.monotonic() - downtime_started,
+    }
+
+# ============================================================================
+# Main
+# ============================================================================
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("backup", "restore"),
+                        help="backup: dump the running client. restore: load a backup into the client.")
+    parser.add_argument("--client-dir", type=Path, default=FLNET_CLIENT_DIR, help="Client directory with .env and env/")
+    parser.add_argument("--target", type=Path, help="backup: folder receiving a new timestamped backup folder")
+    parser.add_argument("--source", type=Path, help="restore: backup folder with manifest.json")
+    parser.add_argument("--jobs", type=int, help="Number of parallel dumps/restores (default: all at once)")
+    parser.add_argument("--compression-level", type=int, default=1, choices=range(1, 10), metavar="1-9",
+                        help="backup: gzip level, higher is smaller but slower")
+    parser.add_argument("--docker", default="docker", help="docker CLI to use, e.g. a stand-in script for testing")
+    args = parser.parse_args(argv)
+    jobs = max(1, args.jobs) if args.jobs else None
+
+    if args.command == "backup":
+        if args.target is None:
+            parser.error("backup needs --target")
+        manifest = backup(args.docker, args.client_dir, args.target, jobs, args.compression_level)
+        total = sum(entry["compressed_bytes"] for entry in manifest["items"])
+        print(f"{len(manifest['items'])} items backed up ({total / 2**20:.1f} MiB) in "
+              f"{manifest['wall_clock_seconds']:.1f} s wall-clock time, no downtime.")
+        return 0 if manifest["complete"] else 1
+
+    if args.source is None:
+        parser.error("restore needs --source")
+    result = restore(args.docker, args.client_dir, args.source, jobs)
+    print(f"{result['items'] - len(result['failed'])} of {result['items']} items restored in "
+          f"{result['wall_clock_seconds']:.1f} s wall-clock time, {result['downtime_seconds']:.1f} s downtime.")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\nCancelled by user.")
+        sys.exit(1)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"\n\nError: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -5,11 +5,25 @@ Checks first for requirements, requests relevant parameters from the user and
 initializes secrets.
 Leaves the user with instructions on how to then start and setup their FLNet Client.
 """
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
+import os
+import random
 import secrets
+import shutil
+import socket
+import ssl
 import string
+import subprocess
 import sys
+import tempfile
+import time
 from pathlib import Path
 
 BASE_DIR_INSTALLER_SCRIPT = Path(__file__).resolve().parent
@@ -41,10 +55,12 @@ class PredefinedConfiguration:
     that the user can choose at the beginning of the installer.
     Example is the predefined config for the daibetes/microbaiome projects
     """
-    def __init__(self, name: str, global_domain: str, global_tcp_port: str):
+    def __init__(self, name: str, global_domain: str, global_tcp_port: str, alternative_domains: tuple = ()):
         self.name = name
         self.global_domain = global_domain
         self.global_tcp_port = global_tcp_port
+        # equivalent endpoints of the same platform, the installer picks the one with the lowest latency
+        self.candidate_domains = (global_domain, *alternative_domains)
         self.frontend_image = GLOBAL_DOMAIN_TO_IMAGE.get(global_domain, DEFAULT_FRONTEND_IMAGE)
         if global_domain not in GLOBAL_DOMAIN_TO_IMAGE:
             print(f"Warning: No predefined frontend image for global domain '{global_domain}'. Using default image '{DEFAULT_FRONTEND_IMAGE}'.")
@@ -59,13 +75,15 @@ FLNET_CONFIG = PredefinedConfiguration(
 DAIBETES_CONFIG = PredefinedConfiguration(
     name="Daibetes",
     global_domain="https://daibetes-net.federated-learning.net",
-    global_tcp_port="9153"
+    global_tcp_port="9153",
+    alternative_domains=("https://daibetes-net.cosy.bio",),
 )
 
 MICROBAIOME_CONFIG = PredefinedConfiguration(
     name="MicrobAIome",
     global_domain="https://microb-ai-net.federated-learning.net",
-    global_tcp_port="9154"
+    global_tcp_port="9154",
+    alternative_domains=("https://microb-ai-net.cosy.bio",),
 )
 
 def gen_secret(length: int = 64) -> str:
@@ -91,22 +109,23 @@ def write_env_file(filepath: Path, comments: Optional[dict] = None, skip_when_ex
     Returns:
         True if successful, False if user aborted
     """
-    if filepath.exists():
-        if skip_when_exists:
-            print(f"Info: The file '{filepath}' already exists. Skipping.")
-            return True
-        else:
-            print(f"Warning: The file '{filepath}' already exists. Overwriting with new settings.")
+    if filepath.exists() and skip_when_exists:
+        print(f"Info: The file '{filepath.name}' already exists. Skipping.")
+        return True
+
+    content = "".join(
+        (f"# {comments[key]}\n" if comments and key in comments else "") + f"{key}={value}\n"
+        for key, value in variables.items()
+    )
+    # re-runs render into a copy of the client directory (see stage_client_dir), so only real changes are reported
+    if filepath.exists() and filepath.read_text() != content:
+        print(f"Warning: The file '{filepath.name}' already exists. Overwriting with new settings.")
 
     # Ensure parent directory exists
     filepath.parent.mkdir(parents=True, exist_ok=True)
 
     # Write variables
-    with filepath.open('w') as f:
-        for key, value in variables.items():
-            if comments and key in comments:
-                f.write(f"# {comments[key]}\n")
-            f.write(f"{key}={value}\n")
+    filepath.write_text(content)
 
     # Set permissions to 600 (owner read/write only)
     filepath.chmod(0o600)
@@ -205,87 +224,2839 @@ class Domain:
         """Check if port is valid (1-65535)."""
         return self._port_is_valid
 
-    def is_valid(self) -> bool:
-        """Check if the entire domain input is valid."""
-        return self._protocol_is_valid and self._domain_is_valid and self._port_is_valid
+    def is_valid(self) -> bool:
+        """Check if the entire domain input is valid."""
+        return self._protocol_is_valid and self._domain_is_valid and self._port_is_valid
+
+    def is_default_port(self) -> bool:
+        """Check if the port is the default for the protocol."""
+        if not self.is_valid():
+            return False
+        if self._protocol == 'http' and self._port == "80":
+            return True
+        if self._protocol == 'https' and self._port == "443":
+            return True
+        return False
+
+    def __str__(self) -> str:
+        """Return the full domain string with protocol and port."""
+        if not self.is_valid():
+            return self._raw_input
+
+        if self._port is None:
+            self._port = "80" if self._protocol == 'http' else "443"
+
+        # Only show port if it's non-standard
+        default_port = "443" if self._protocol == 'https' else "80"
+        result = f"{self._protocol}://{self._domain_name}"
+        if self._port != default_port:
+            result += f":{self._port}"
+
+        return result
+
+def patch_nginx_server_name(nginx_conf_path: Path, server_name: str) -> None:
+    """
+    Replace the server_name directive in the main server block of nginx.conf.
+    Uses the first server_name occurrence (the main block precedes the catch-all).
+    Works both for the initial placeholder (${NGINX_HOST}) and on re-runs where
+    a real domain is already present.
+    """
+    content = nginx_conf_path.read_text()
+    # Check if the pattern exists before attempting substitution
+    pattern = r'^(\s*server_name\s+).*?;\s*$'
+    if not re.search(pattern, content, flags=re.MULTILINE):
+        print(f"Warning: Could not find server_name directive in '{nginx_conf_path}'. nginx may not use the correct hostname.")
+        return
+
+    new_content = re.sub(
+        pattern,
+        rf'\g<1>{server_name};',
+        content,
+        count=1,
+        flags=re.MULTILINE
+    )
+    nginx_conf_path.write_text(new_content)
+
+
+def patch_nginx_directive(nginx_conf_path: Path, directive: str, value: str, block: Optional[str] = None) -> None:
+    """
+    Replace the value of a directive in an nginx config file, like patch_nginx_server_name.
+    Replaces all occurrences, or only those inside the block whose header matches
+    the given block (e.g. 'upstream keycloak-backend').
+    Works on re-runs as the directive itself is kept and only its value replaced.
+    """
+    content = nginx_conf_path.read_text()
+    # whitespace after the name, so 'keepalive' does not match 'keepalive_timeout'
+    pattern = rf'^(\s*{re.escape(directive)}\s+)[^;#\n]*;'
+    if block is None:
+        new_content, count = re.subn(pattern, rf'\g<1>{value};', content, flags=re.MULTILINE)
+    else:
+        block_match = re.search(rf'^\s*{re.escape(block)}\s*\{{.*?^\}}', content, flags=re.MULTILINE | re.DOTALL)
+        count = 0
+        new_content = content
+        if block_match:
+            new_block, count = re.subn(pattern, rf'\g<1>{value};', block_match.group(0), flags=re.MULTILINE)
+            new_content = content[:block_match.start()] + new_block + content[block_match.end():]
+    if count == 0:
+        location = f" in block '{block}'" if block else ""
+        print(f"Warning: Could not find {directive} directive{location} in '{nginx_conf_path}'. Keeping the current nginx settings.")
+        return
+    nginx_conf_path.write_text(new_content)
+
+
+def validate_port(port_str: str) -> bool:
+    """Validate that port is a number between 1 and 65535."""
+    try:
+        port = int(port_str)
+        return 1 <= port <= 65535
+    except ValueError:
+        return False
+
+def validate_ip_address(ip: str) -> bool:
+    """Validate IPv4 address format."""
+    pattern = re.compile(r'^(((?!25?[6-9])[12]\d|[1-9])?\d\.?\b){4}$')
+        # https://stackoverflow.com/questions/5284147/validating-ipv4-addresses-with-regexp
+        # smelly nerds and their smelly regexes
+    if not pattern.match(ip):
+        return False
+    parts = ip.split('.')
+    for part in parts:
+        if not 0 <= int(part) <= 255:
+            return False
+    return True
+
+def render_yaml(data, indent: int = 0) -> str:
+    """
+    Render nested dicts/lists of scalars as YAML, sufficient for docker compose files.
+    Strings are always double quoted (JSON strings are valid YAML), so values like
+    'no', '0' or '${VAR}' keep their meaning.
+    """
+    def scalar(value) -> str:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if value is None:
+            return "null"
+        if isinstance(value, (int, float)):
+            return str(value)
+        return json.dumps(str(value))
+
+    pad = "  " * indent
+    lines = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, (dict, list)) and value:
+                lines.append(f"{pad}{key}:")
+                lines.append(render_yaml(value, indent + 1))
+            elif isinstance(value, (dict, list)):
+                lines.append(f"{pad}{key}: {'{}' if isinstance(value, dict) else '[]'}")
+            else:
+                lines.append(f"{pad}{key}: {scalar(value)}")
+    else:
+        for value in data:
+            if isinstance(value, (dict, list)) and value:
+                nested = render_yaml(value, indent + 1).lstrip()
+                lines.append(f"{pad}- {nested}")
+            else:
+                lines.append(f"{pad}- {scalar(value)}")
+    return "\n".join(lines)
+
+def ask_yes_no(prompt: str, default: Optional[bool] = None) -> bool:
+    """Ask a y/n question until answered, an empty answer returns the default if given."""
+    while True:
+        answer = input(prompt).strip().lower()
+        if answer in ('y', 'yes'):
+            return True
+        if answer in ('n', 'no'):
+            return False
+        if not answer and default is not None:
+            return default
+        print("Please answer with 'y' or 'n'.")
+
+def read_env_file(filepath: Path) -> dict:
+    """
+    Read a file written by write_env_file back into a dict.
+    Comments and empty lines are ignored. Returns an empty dict if the file does not exist.
+    """
+    variables = {}
+    if not filepath.exists():
+        return variables
+    for line in filepath.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        variables[key.strip()] = value.strip()
+    return variables
+
+def patch_nginx_block(nginx_conf_path: Path, name: str, content: str) -> None:
+    """
+    Replace the content of a generated block in an nginx config file.
+    Generated blocks are delimited by the marker comments
+        # >>> generated by client_installer.py: <name> >>>
+        # <<< generated by client_installer.py: <name> <<<
+    The content is indented like the markers. An empty content disables the block,
+    the markers are kept, so re-runs of the installer can enable it again.
+    """
+    config = nginx_conf_path.read_text()
+    pattern = (rf'^([ \t]*)(# >>> generated by client_installer.py: {re.escape(name)} >>>\n)'
+               rf'.*?'
+               rf'^([ \t]*# <<< generated by client_installer.py: {re.escape(name)} <<<)$')
+    match = re.search(pattern, config, flags=re.MULTILINE | re.DOTALL)
+    if not match:
+        print(f"Warning: Could not find the generated block '{name}' in '{nginx_conf_path}'. Keeping the current nginx settings.")
+        return
+    indent = match.group(1)
+    body = "".join(f"{indent}{line}\n" if line else "\n" for line in content.splitlines())
+    new_config = config[:match.start()] + indent + match.group(2) + body + match.group(3) + config[match.end():]
+    nginx_conf_path.write_text(new_config)
+
+# ============================================================================
+# Host Sizing
+# ============================================================================
+# Folder of the docker volumes, its disk backs the databases
+DOCKER_DATA_ROOT = Path('/var/lib/docker')
+
+class HostResources:
+    """CPU cores, memory and disk type of the host the deployment is sized for."""
+    def __init__(self, cores: int, memory_mb: int, ssd: bool = True):
+        self.cores = cores
+        self.memory_mb = memory_mb
+        self.ssd = ssd
+
+    def __str__(self) -> str:
+        return f"{self.cores} cores, {self.memory_mb / 1024:.1f} GB RAM, {'SSD' if self.ssd else 'HDD'}"
+
+
+def detect_rotational_disk(path: Path) -> Optional[bool]:
+    """
+    Check if the disk holding path is a rotational disk (HDD) via sysfs.
+    Returns None if unknown, e.g. not on Linux or for network/overlay filesystems.
+    """
+    try:
+        device = os.stat(path).st_dev
+        block_dir = Path(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}").resolve()
+        # partitions have no queue folder, their parent device has
+        for candidate in (block_dir, block_dir.parent):
+            rotational_file = candidate / 'queue' / 'rotational'
+            if rotational_file.exists():
+                return rotational_file.read_text().strip() == "1"
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def detect_host_resources() -> HostResources:
+    """Detect the CPU cores available to this process and the physical memory of this machine."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        cores = os.cpu_count() or 1
+    try:
+        memory_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        memory_mb = 4096
+        print(f"Warning: Could not detect the memory of this machine. Assuming {memory_mb} MB.")
+    rotational = detect_rotational_disk(DOCKER_DATA_ROOT if DOCKER_DATA_ROOT.exists() else Path('/'))
+    return HostResources(cores, memory_mb, ssd=not rotational)
+
+
+class SizingProfile:
+    """
+    Performance settings for a class of hosts.
+    Each instance is one of the profiles the user can choose, 'auto' selects
+    the largest profile the host satisfies (see select_sizing_profile).
+    The cores/memory are the minimum host of the profile, and the host that is
+    assumed when the profile is chosen without knowing the actual host.
+    """
+    def __init__(self, name: str, cores: int, memory_gb: int,
+                 nginx_max_worker_processes: int, nginx_worker_connections: int,
+                 nginx_upstream_keepalive: int, nginx_upstream_keepalive_requests: int,
+                 nginx_proxy_buffers: int):
+        self.name = name
+        self.cores = cores
+        self.memory_gb = memory_gb
+        self.nginx_max_worker_processes = nginx_max_worker_processes
+        self.nginx_worker_connections = nginx_worker_connections
+        # every proxied connection uses two file descriptors, plus some headroom for logs/cache files
+        self.nginx_worker_rlimit_nofile = 2 * nginx_worker_connections + 1024
+        self.nginx_upstream_keepalive = nginx_upstream_keepalive
+        self.nginx_upstream_keepalive_requests = nginx_upstream_keepalive_requests
+        self.nginx_upstream_keepalive_timeout = "60s"
+        self.nginx_proxy_buffers = nginx_proxy_buffers
+
+    def reference_host(self) -> HostResources:
+        """The host assumed for this profile if the actual host is unknown."""
+        return HostResources(self.cores, self.memory_gb * 1024)
+
+SMALL_PROFILE = SizingProfile(
+    name="small", cores=2, memory_gb=4,
+    nginx_max_worker_processes=2, nginx_worker_connections=1024,
+    nginx_upstream_keepalive=16, nginx_upstream_keepalive_requests=1000,
+    nginx_proxy_buffers=4,
+)
+
+MEDIUM_PROFILE = SizingProfile(
+    name="medium", cores=4, memory_gb=16,
+    nginx_max_worker_processes=4, nginx_worker_connections=4096,
+    nginx_upstream_keepalive=32, nginx_upstream_keepalive_requests=5000,
+    nginx_proxy_buffers=8,
+)
+
+LARGE_PROFILE = SizingProfile(
+    name="large", cores=16, memory_gb=64,
+    nginx_max_worker_processes=8, nginx_worker_connections=8192,
+    nginx_upstream_keepalive=64, nginx_upstream_keepalive_requests=10000,
+    nginx_proxy_buffers=16,
+)
+
+SIZING_PROFILES = {profile.name: profile for profile in (SMALL_PROFILE, MEDIUM_PROFILE, LARGE_PROFILE)}
+NGINX_UPSTREAMS = ('dataimporter-backend', 'local-learning-backend', 'local-learning-websocket-backend', 'frontend-backend',
+                   'keycloak-backend')
+NGINX_PROXY_BUFFER_SIZE = "256k"
+
+
+def select_sizing_profile(host: HostResources) -> SizingProfile:
+    """Select the largest profile whose minimum host is satisfied, falling back to the smallest."""
+    selected = SMALL_PROFILE
+    for profile in SIZING_PROFILES.values():
+        if host.cores >= profile.cores and host.memory_mb >= profile.memory_gb * 1024:
+            selected = profile
+    return selected
+
+
+def patch_nginx_performance(client_dir: Path, profile: SizingProfile, host: HostResources) -> None:
+    """Render the worker, upstream keepalive and buffer settings of the profile into the nginx files."""
+    nginx_server_conf_path = client_dir / 'nginx_server.conf'
+    worker_processes = min(host.cores, profile.nginx_max_worker_processes)
+    patch_nginx_directive(nginx_server_conf_path, 'worker_processes', str(worker_processes))
+    patch_nginx_directive(nginx_server_conf_path, 'worker_rlimit_nofile', str(profile.nginx_worker_rlimit_nofile))
+    patch_nginx_directive(nginx_server_conf_path, 'worker_connections', str(profile.nginx_worker_connections))
+
+    nginx_conf_path = client_dir / 'nginx.conf'
+    for upstream in NGINX_UPSTREAMS:
+        block = f'upstream {upstream}'
+        patch_nginx_directive(nginx_conf_path, 'keepalive', str(profile.nginx_upstream_keepalive), block)
+        patch_nginx_directive(nginx_conf_path, 'keepalive_requests', str(profile.nginx_upstream_keepalive_requests), block)
+        patch_nginx_directive(nginx_conf_path, 'keepalive_timeout', profile.nginx_upstream_keepalive_timeout, block)
+    patch_nginx_directive(nginx_conf_path, 'proxy_buffers', f"{profile.nginx_proxy_buffers} {NGINX_PROXY_BUFFER_SIZE}")
+    # must be smaller than all buffers minus one, so half of them may be busy sending to the client
+    busy_buffers_kb = max(1, profile.nginx_proxy_buffers // 2) * int(NGINX_PROXY_BUFFER_SIZE[:-1])
+    patch_nginx_directive(nginx_conf_path, 'proxy_busy_buffers_size', f"{busy_buffers_kb}k")
+
+# ============================================================================
+# Static Asset Caching
+# ============================================================================
+# Text types compressed by nginx, text/html is always compressed if gzip is on
+NGINX_COMPRESSED_TYPES = (
+    "text/plain text/css text/xml text/javascript application/javascript application/json "
+    "application/xml application/manifest+json image/svg+xml font/ttf font/otf"
+)
+# Assets with a content hash in their file name, as emitted by the Angular build (e.g. main.3f2a9c1b7d4e5f60.js)
+NGINX_FINGERPRINTED_ASSET_LOCATION = r'~* "^/[^/]+\.[0-9a-f]{16,}\.(?:js|css|woff2?|ttf|otf|svg|png|jpe?g|gif|ico|webp)$"'
+NGINX_BROTLI_MODULES = (
+    "load_module /usr/lib/nginx/modules/ngx_http_brotli_filter_module.so;",
+    "load_module /usr/lib/nginx/modules/ngx_http_brotli_static_module.so;",
+)
+
+def patch_nginx_static_cache(client_dir: Path, enabled: bool, brotli: bool) -> None:
+    """
+    Render the optional caching and compression of static assets into the nginx files.
+    Caches fingerprinted frontend assets and the keycloak theme resources on the
+    nginx-cache-volume and compresses text responses. The X-Cache-Status header
+    (and 'cache=' in the detailed_debug log format) shows HIT/MISS for hit ratio measurements.
+    """
+    nginx_conf_path = client_dir / 'nginx.conf'
+    if not enabled:
+        patch_nginx_block(nginx_conf_path, 'static-cache-http', "")
+        patch_nginx_block(nginx_conf_path, 'static-cache-server', "")
+        patch_nginx_block(client_dir / 'nginx_server.conf', 'modules', "")
+        return
+
+    http_block = f"""proxy_cache_path /var/cache/nginx/static levels=1:2 keys_zone=static_cache:10m
+                 max_size=1g inactive=30d use_temp_path=off;
+    # 10m keys_zone holds ~80k cached files, the files themselves are limited by max_size
+
+gzip on;
+gzip_comp_level 5;
+gzip_min_length 1024;
+gzip_proxied any;
+    # upstream responses are proxied, so they need to be compressed as well
+gzip_vary on;
+gzip_types {NGINX_COMPRESSED_TYPES};
+"""
+    if brotli:
+        http_block += f"""
+brotli on;
+brotli_comp_level 5;
+brotli_min_length 1024;
+brotli_types {NGINX_COMPRESSED_TYPES};
+"""
+    server_block = f"""add_header X-Cache-Status $upstream_cache_status always;
+    # empty for uncached locations, HIT/MISS/EXPIRED/... otherwise
+    # set on server level, as an add_header in a location would drop the security headers of the server
+
+# Frontend assets with a content hash in the name never change, cache them "forever"
+location {NGINX_FINGERPRINTED_ASSET_LOCATION} {{
+    proxy_pass http://$frontend_upstream;
+        # the frontend of the network of the host, see the co-hosted networks
+    proxy_cache static_cache;
+    proxy_cache_key $scheme$host$request_uri;
+        # the frontends of co-hosted networks serve different assets under the same path
+    proxy_cache_valid 200 365d;
+    proxy_cache_lock on;
+    proxy_cache_use_stale error timeout updating http_502 http_503 http_504;
+    expires max;
+}}
+
+# Keycloak theme resources are versioned by path (/auth/resources/<version>/...)
+location /auth/resources/ {{
+    proxy_pass http://keycloak-backend/auth/resources/;
+    proxy_cache static_cache;
+    proxy_cache_valid 200 30d;
+    proxy_cache_lock on;
+    proxy_cache_use_stale error timeout updating http_502 http_503 http_504;
+    expires 30d;
+}}
+"""
+    patch_nginx_block(nginx_conf_path, 'static-cache-http', http_block)
+    patch_nginx_block(nginx_conf_path, 'static-cache-server', server_block)
+    patch_nginx_block(client_dir / 'nginx_server.conf', 'modules', "\n".join(NGINX_BROTLI_MODULES) if brotli else "")
+
+# ============================================================================
+# Uploads to the Importer
+# ============================================================================
+UPLOAD_MODES = ("buffered", "streaming")
+DEFAULT_UPLOAD_TEMP_DIR = "nginx-upload-temp-volume"  # named volume of docker-compose.yml
+NGINX_UPLOAD_TEMP_PATH = "/var/lib/nginx/upload-temp"  # mount point of UPLOAD_TEMP_DIR in the proxy
+NGINX_CONTAINER_UID = 65532  # the nonroot user nginx runs as in cgr.dev/chainguard/nginx
+
+def patch_nginx_upload_mode(client_dir: Path, mode: str, custom_temp_dir: bool = False) -> None:
+    """
+    Render the upload mode of the importer location into nginx.conf.
+    buffered: nginx receives the complete upload into a temp file before passing it on (nginx default).
+    streaming: the upload is passed to the importer while it is received, without touching the proxy's disk.
+    With custom_temp_dir the temp files go to the mounted UPLOAD_TEMP_DIR instead of the default of the image.
+    """
+    content = f"client_body_temp_path {NGINX_UPLOAD_TEMP_PATH} 1 2;\n" if custom_temp_dir else ""
+    if mode == "streaming":
+        content += """proxy_request_buffering off;
+    # pass the body on while receiving it, instead of spooling e.g. 10 GB to disk first
+client_body_timeout 300s;
+proxy_send_timeout 3600s;
+proxy_read_timeout 3600s;
+    # the importer reads the upload at its own pace, so allow long gaps between reads/writes
+"""
+    patch_nginx_block(client_dir / 'nginx.conf', 'importer-upload', content)
+
+
+def prepare_upload_temp_dir(path: Path) -> list[str]:
+    """Hand the upload temp folder to the nginx user of the proxy container, returns a warning if that is not possible."""
+    stat = path.stat()
+    if stat.st_uid == NGINX_CONTAINER_UID or stat.st_mode & 0o002:
+        return []
+    try:
+        os.chown(path, NGINX_CONTAINER_UID, NGINX_CONTAINER_UID)
+        return []
+    except OSError:
+        return [f"The upload folder '{path}' must be writable by the nginx user of the proxy (UID {NGINX_CONTAINER_UID}), "
+                f"uploads fail otherwise. Run: sudo chown {NGINX_CONTAINER_UID}:{NGINX_CONTAINER_UID} '{path}'"]
+
+# ============================================================================
+# Websockets
+# ============================================================================
+# Seconds a websocket may stay silent before the proxy closes it, training rounds can be quiet for a long time
+DEFAULT_WEBSOCKET_IDLE_TIMEOUT = 3600
+MIN_WEBSOCKET_IDLE_TIMEOUT = 60  # the nginx default
+
+def patch_nginx_websocket_timeout(client_dir: Path, idle_timeout: int) -> None:
+    """Render the idle timeout of the websocket locations into nginx.conf."""
+    content = f"""proxy_read_timeout {idle_timeout}s;
+proxy_send_timeout {idle_timeout}s;
+"""
+    patch_nginx_block(client_dir / 'nginx.conf', 'websocket-timeouts', content)
+
+# ============================================================================
+# Rate Limiting
+# ============================================================================
+class RateLimit:
+    """
+    Request rate per client address of a class of locations, in nginx syntax (e.g. 10r/s or 30r/m).
+    Requests within the rate plus burst are passed on without delay, all further ones are
+    rejected at once with 429, so a flooding client never queues up in front of the upstream.
+    """
+    def __init__(self, rate: str, burst: int):
+        self.rate = rate
+        self.burst = burst
+
+# Location classes of nginx.conf, each with its own zone and generated block named rate-limit-<class>.
+# login: the keycloak login pages, password checks and token (refresh) requests within /auth/.
+DEFAULT_RATE_LIMITS = {
+    'login': RateLimit('10r/s', burst=20),
+        # keycloak hashes passwords and signs tokens on these, a single script can saturate its JVM
+    'auth': RateLimit('50r/s', burst=100),
+    'importer': RateLimit('20r/s', burst=40),
+    'learning': RateLimit('50r/s', burst=100),
+    'frontend': RateLimit('100r/s', burst=200),
+        # a page load fetches all assets of the single page app at once
+}
+DEFAULT_CONNECTION_LIMIT = 100  # open connections per client address, websockets included
+DEFAULT_UPLOAD_LIMIT = 4  # concurrent uploads to the importer per client address
+RATE_PATTERN = re.compile(r'^[1-9]\d*r/[sm]$')
+RATE_LIMIT_ZONE_SIZE = "10m"  # ~160k client addresses per zone
+
+
+def parse_rate_limits(value) -> Optional[dict]:
+    """
+    The rate limits of the answers key 'rate_limits': true for the defaults, false (or null) for none, or a dict
+    overriding single limits, e.g. {"login": "5r/s", "importer": {"rate": "10r/s", "burst": 10}, "uploads": 2}.
+    Returns {'requests': {class: RateLimit}, 'connections': int, 'uploads': int}, None if disabled.
+    Raises ValueError if invalid.
+    """
+    if value is False or value is None:
+        return None
+    limits = {'requests': dict(DEFAULT_RATE_LIMITS), 'connections': DEFAULT_CONNECTION_LIMIT, 'uploads': DEFAULT_UPLOAD_LIMIT}
+    if value is True:
+        return limits
+    if not isinstance(value, dict):
+        raise ValueError("'rate_limits' must be true, false or a dict of limits.")
+    for name, limit in value.items():
+        if name in ('connections', 'uploads'):
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+                raise ValueError(f"'rate_limits.{name}' must be a positive number of connections.")
+            limits[name] = limit
+            continue
+        if name not in DEFAULT_RATE_LIMITS:
+            raise ValueError(f"Unknown rate limit '{name}', known: {', '.join([*DEFAULT_RATE_LIMITS, 'connections', 'uploads'])}.")
+        rate, burst = (limit.get('rate', DEFAULT_RATE_LIMITS[name].rate), limit.get('burst', DEFAULT_RATE_LIMITS[name].burst)) \
+            if isinstance(limit, dict) else (limit, DEFAULT_RATE_LIMITS[name].burst)
+        if not isinstance(rate, str) or not RATE_PATTERN.match(rate):
+            raise ValueError(f"The rate of 'rate_limits.{name}' must look like 10r/s or 30r/m.")
+        if not isinstance(burst, int) or isinstance(burst, bool) or burst < 0:
+            raise ValueError(f"The burst of 'rate_limits.{name}' must be a number of requests.")
+        limits['requests'][name] = RateLimit(rate, burst)
+    return limits
+
+
+def patch_nginx_rate_limits(client_dir: Path, limits: Optional[dict]) -> None:
+    """
+    Render the request rate and connection limits per client address into nginx.conf, or remove them (limits None).
+    Uploads (POST/PUT/PATCH to the importer) count against a separate connection budget. Cached static
+    assets (see the static cache) are served by their own locations and not rate limited.
+    """
+    nginx_conf_path = client_dir / 'nginx.conf'
+    if limits is None:
+        for block in ('rate-limit-zones', 'rate-limit-server', *(f'rate-limit-{name}' for name in DEFAULT_RATE_LIMITS)):
+            patch_nginx_block(nginx_conf_path, block, "")
+        return
+
+    zones = "".join(f"limit_req_zone $binary_remote_addr zone=flnet_{name}:{RATE_LIMIT_ZONE_SIZE} rate={limit.rate};\n"
+                    for name, limit in limits['requests'].items())
+    zones += f"""limit_conn_zone $binary_remote_addr zone=flnet_connections:{RATE_LIMIT_ZONE_SIZE};
+limit_conn_zone $importer_upload_key zone=flnet_uploads:{RATE_LIMIT_ZONE_SIZE};
+    # requests with an empty key (all but uploads) are not counted
+limit_req_status 429;
+limit_conn_status 429;
+limit_req_log_level warn;
+limit_conn_log_level warn;
+
+map $https $rate_limited_hsts {{
+    on "max-age=31536000";
+        # must match the Strict-Transport-Security header of nginx_conf_HTTPS.conf
+    default "";
+        # an empty value is not sent, plain HTTP deployments get no HSTS header
+}}
+
+map $request_method $importer_upload_key {{
+    default "";
+    POST $binary_remote_addr;
+    PUT $binary_remote_addr;
+    PATCH $binary_remote_addr;
+}}
+"""
+    server = f"""limit_conn flnet_connections {limits['connections']};
+error_page 429 @rate_limited;
+
+location @rate_limited {{
+    default_type application/json;
+    add_header Retry-After 1 always;
+    add_header X-Content-Type-Options "nosniff" always;
+    add_header X-Frame-Options "SAMEORIGIN" always;
+    add_header Strict-Transport-Security $rate_limited_hsts always;
+        # an add_header in a location drops the headers of the server and of ssl-config.conf, all are repeated
+    return 429 '{{"error": "too_many_requests"}}\\n';
+}}
+"""
+    patch_nginx_block(nginx_conf_path, 'rate-limit-zones', zones)
+    patch_nginx_block(nginx_conf_path, 'rate-limit-server', server)
+    for name, limit in limits['requests'].items():
+        content = f"limit_req zone=flnet_{name} burst={limit.burst} nodelay;\n"
+        if name == 'importer':
+            # a limit_conn of the location replaces the ones of the server, so the connection limit is repeated
+            content += f"limit_conn flnet_connections {limits['connections']};\nlimit_conn flnet_uploads {limits['uploads']};\n"
+        patch_nginx_block(nginx_conf_path, f'rate-limit-{name}', content)
+
+# ============================================================================
+# Access Log
+# ============================================================================
+# combined: the nginx default. detailed_debug: adds request/upstream timings, read by access_log_analyzer.py
+ACCESS_LOG_FORMATS = ("combined", "detailed_debug")
+
+def patch_nginx_access_log(client_dir: Path, log_format: str) -> None:
+    """Render the format of the proxy's access log into nginx_server.conf."""
+    content = "access_log /dev/stdout;\n" if log_format == "combined" else f"access_log /dev/stdout {log_format};\n"
+    patch_nginx_block(client_dir / 'nginx_server.conf', 'access-log', content)
+
+# ============================================================================
+# TLS
+# ============================================================================
+TLS_OVERLAY = 'docker-compose.tls.yml'
+# Optional ECDSA certificate next to fullchain.pem/privkey.pem, served in addition to it
+ECDSA_FULLCHAIN_FILE = 'fullchain-ecdsa.pem'
+ECDSA_PRIVKEY_FILE = 'privkey-ecdsa.pem'
+# Smaller TLS records let the browser start parsing before a full 16k record arrived
+TLS_BUFFER_SIZE = '4k'
+
+
+def certificate_chain_length(fullchain_file: Path) -> int:
+    """Number of certificates in a PEM file, more than one if the intermediate certificates are included."""
+    return fullchain_file.read_text(errors="replace").count("-----BEGIN CERTIFICATE-----")
+
+
+def certificate_has_ocsp_responder(fullchain_file: Path) -> Optional[bool]:
+    """Whether the certificate names an OCSP responder (None if the openssl CLI is not available)."""
+    if shutil.which("openssl") is None:
+        return None
+    result = subprocess.run(["openssl", "x509", "-noout", "-ocsp_uri", "-in", str(fullchain_file)],
+                            capture_output=True, text=True)
+    return result.returncode == 0 and bool(result.stdout.strip())
+
+
+def certificate_domain_names(fullchain_file: Path) -> Optional[list]:
+    """The DNS names of the subject alternative names of the certificate (None if the openssl CLI is not available)."""
+    if shutil.which("openssl") is None:
+        return None
+    result = subprocess.run(["openssl", "x509", "-noout", "-ext", "subjectAltName", "-in", str(fullchain_file)],
+                            capture_output=True, text=True)
+    return re.findall(r'DNS:([^,\s]+)', result.stdout) if result.returncode == 0 else []
+
+
+def certificate_covers(domain_names: list, domain_name: str) -> bool:
+    """Whether one of the certificate's domain names matches domain_name, a wildcard covers exactly one label."""
+    domain_name = domain_name.lower()
+    for name in domain_names:
+        name = name.lower()
+        if name == domain_name or (name.startswith("*.") and domain_name.partition(".")[2] == name[2:]):
+            return True
+    return False
+
+
+def detect_ecdsa_certificate(ssl_path: Path) -> Optional[tuple[Path, Path]]:
+    """
+    The ECDSA certificate files in ssl_path, None if there are none.
+    Raises ValueError if only one of the two files exists.
+    """
+    fullchain_file, privkey_file = ssl_path / ECDSA_FULLCHAIN_FILE, ssl_path / ECDSA_PRIVKEY_FILE
+    if fullchain_file.exists() != privkey_file.exists():
+        raise ValueError(f"Both {ECDSA_FULLCHAIN_FILE} and {ECDSA_PRIVKEY_FILE} are required for an ECDSA certificate in '{ssl_path}'.")
+    return (fullchain_file, privkey_file) if fullchain_file.exists() else None
+
+
+def tls_stapling_warnings(fullchain_file: Path) -> list[str]:
+    """Why OCSP stapling of the TLS fast path stays off for this certificate, if it does."""
+    if certificate_chain_length(fullchain_file) < 2:
+        return [f"'{fullchain_file}' contains no intermediate certificate, OCSP stapling stays off."]
+    if certificate_has_ocsp_responder(fullchain_file) is False:
+        return [f"The certificate in '{fullchain_file}' names no OCSP responder, OCSP stapling stays off."]
+    return []
+
+
+def patch_nginx_tls(client_dir: Path, fast_path: bool, stapling: bool, ecdsa: bool) -> None:
+    """
+    Render the TLS settings of the encrypted reverse proxy: the optional ECDSA certificate and the fast path
+    (HTTP/2, session tickets, small TLS records, OCSP stapling, rejecting unknown server names).
+    """
+    https_conf_path = client_dir / 'nginx_conf_HTTPS.conf'
+    ecdsa_content = ""
+    if ecdsa:
+        ecdsa_content = "ssl_certificate /etc/nginx/ssl/public-ecdsa.crt;\nssl_certificate_key /etc/nginx/ssl/private-ecdsa.key;\n"
+    patch_nginx_block(https_conf_path, 'tls-ecdsa-certificate', ecdsa_content)
+
+    patch_nginx_directive(https_conf_path, 'ssl_session_tickets', "on" if fast_path else "off")
+    fast_path_content = ""
+    default_server_content = ""
+    if fast_path:
+        fast_path_content = f"http2 on;\nssl_buffer_size {TLS_BUFFER_SIZE};\n"
+        if stapling:
+            fast_path_content += (
+                "ssl_stapling on;\n"
+                "ssl_stapling_verify on;\n"
+                "ssl_trusted_certificate /etc/nginx/ssl/public.crt;\n"
+                "    # the intermediate certificates of fullchain.pem verify the OCSP response\n"
+            )
+        default_server_content = """server {
+    listen 443 ssl default_server;
+    listen [::]:443 ssl default_server;
+    ssl_reject_handshake on;
+        # unknown server names (SNI) are rejected before any certificate work
+}
+"""
+    patch_nginx_block(https_conf_path, 'tls-fast-path', fast_path_content)
+    patch_nginx_block(client_dir / 'nginx.conf', 'tls-default-server', default_server_content)
+
+
+def write_tls_overlay(client_dir: Path, ecdsa_files: tuple) -> None:
+    """Mount the ECDSA certificate into the encrypted reverse proxy."""
+    fullchain_file, privkey_file = ecdsa_files
+    services = {'reverse-proxy-encrypted': {'volumes': [
+        f"{fullchain_file}:/etc/nginx/ssl/public-ecdsa.crt:ro",
+        f"{privkey_file}:/etc/nginx/ssl/private-ecdsa.key:ro",
+    ]}}
+    (client_dir / TLS_OVERLAY).write_text(
+        "# Generated by client_installer.py: the ECDSA certificate of the encrypted reverse proxy.\n"
+        + render_yaml({'services': services}) + "\n"
+    )
+
+# ============================================================================
+# Observability
+# ============================================================================
+NGINX_STATUS_PORT = 8081  # not published, only reachable inside the docker network
+PROMETHEUS_SCRAPE_INTERVAL = "15s"
+
+def patch_nginx_observability(client_dir: Path, enabled: bool) -> None:
+    """Render the internal stub_status server of the nginx-exporter into nginx.conf."""
+    content = ""
+    if enabled:
+        content = f"""server {{
+    listen {NGINX_STATUS_PORT};
+        # not published, only reachable inside the docker network
+    location = /nginx_status {{
+        stub_status;
+        access_log off;
+        allow 127.0.0.1;
+        allow 10.0.0.0/8;
+        allow 172.16.0.0/12;
+        allow 192.168.0.0/16;
+        deny all;
+    }}
+}}
+"""
+    patch_nginx_block(client_dir / 'nginx.conf', 'observability-server', content)
+
+
+def write_exporter_secrets(env_dir: Path, database_mode: str) -> None:
+    """
+    Write the credentials of the database exporters, derived from the generated database secrets.
+    The files are rewritten on every run, so they follow the secrets they are derived from.
+    """
+    passwords = {
+        'dataimport-db': ('MYSQLD_EXPORTER_PASSWORD', read_env_file(env_dir / 'dataimport-secrets.env')['MYSQL_ROOT_PASSWORD']),
+    }
+    if database_mode == "shared":
+        passwords['postgres'] = ('DATA_SOURCE_PASS', read_env_file(env_dir / 'postgres-shared-secrets.env')['POSTGRES_PASSWORD'])
+    else:
+        passwords['orch-api-db'] = ('DATA_SOURCE_PASS', read_env_file(env_dir / 'orch-secrets.env')['POSTGRES_PASSWORD'])
+        passwords['local-learning-api-db'] = ('DATA_SOURCE_PASS', read_env_file(env_dir / 'local-learning-secrets.env')['POSTGRES_PASSWORD'])
+        passwords['keycloak-postgres'] = ('DATA_SOURCE_PASS', read_env_file(env_dir / 'keycloak-secrets.env')['POSTGRES_PASSWORD'])
+    for service, (variable, password) in passwords.items():
+        path = env_dir / f'exporter-{service}.env'
+        if read_env_file(path).get(variable) == password:
+            continue
+        if not write_env_file(path, **{variable: password}):
+            sys.exit(1)
+
+
+def write_prometheus_config(client_dir: Path, database_mode: str) -> None:
+    """Write prometheus/prometheus.yml with the scrape targets of the observability profile."""
+    if database_mode == "shared":
+        postgres_targets = ['postgres-exporter:9187']
+    else:
+        postgres_targets = [f'{service.name}-exporter:9187' for service in POSTGRES_SERVICES]
+    config = {
+        'global': {'scrape_interval': PROMETHEUS_SCRAPE_INTERVAL, 'evaluation_interval': PROMETHEUS_SCRAPE_INTERVAL},
+        'scrape_configs': [
+            {'job_name': 'prometheus', 'static_configs': [{'targets': ['localhost:9090']}]},
+            {'job_name': 'nginx', 'static_configs': [{'targets': ['nginx-exporter:9113']}]},
+            {'job_name': 'postgres', 'static_configs': [{'targets': postgres_targets}]},
+            {'job_name': 'mariadb', 'static_configs': [{'targets': ['dataimport-db-exporter:9104']}]},
+            {'job_name': 'keycloak', 'metrics_path': '/auth/metrics', 'static_configs': [{'targets': ['keycloak:9000']}]},
+        ],
+    }
+    config_dir = client_dir / 'prometheus'
+    config_dir.mkdir(parents=True, exist_ok=True)
+    (config_dir / 'prometheus.yml').write_text("# Generated by client_installer.py, re-running the installer overwrites this file.\n"
+                                               + render_yaml(config) + "\n")
+
+# ============================================================================
+# Database Tuning
+# ============================================================================
+# Share of the host memory for all databases together. The rest is left to the
+# JVMs, nginx, the learning containers and the page cache of the host.
+DATABASE_MEMORY_SHARE = 0.25
+MIN_DATABASE_MEMORY_MB = 128
+
+class DatabaseService:
+    """
+    A database container of the compose file.
+    The memory budget of all databases is divided by the memory weights of the services,
+    so services with more load (e.g. learning run bookkeeping) get a larger share.
+    """
+    def __init__(self, name: str, memory_weight: int, max_connections: int):
+        self.name = name
+        self.memory_weight = memory_weight
+        self.max_connections = max_connections
+
+POSTGRES_SERVICES = (
+    DatabaseService('local-learning-api-db', memory_weight=3, max_connections=60),
+        # learning run bookkeeping, the latency critical database
+    DatabaseService('orch-api-db', memory_weight=2, max_connections=60),
+    DatabaseService('keycloak-postgres', memory_weight=1, max_connections=120),
+        # keycloak's connection pool allows up to 100 connections by default
+)
+MARIADB_SERVICES = (
+    DatabaseService('dataimport-db', memory_weight=3, max_connections=100),
+        # holds the imported tabular data, bulk inserts benefit most from a large buffer pool
+)
+DATABASE_SERVICES = POSTGRES_SERVICES + MARIADB_SERVICES
+# the shared postgres server of the shared database mode hosts the databases of all postgres services
+SHARED_POSTGRES_SERVICE = DatabaseService(
+    'postgres',
+    memory_weight=sum(service.memory_weight for service in POSTGRES_SERVICES),
+    max_connections=sum(service.max_connections for service in POSTGRES_SERVICES),
+)
+DATABASE_MODES = ("separate", "shared")
+SHARED_POSTGRES_OVERLAY = 'docker-compose.shared-postgres.yml'
+
+
+def database_memory_mb(service: DatabaseService, host: HostResources) -> int:
+    """The memory budget of a database service on the given host."""
+    total_weight = sum(database.memory_weight for database in DATABASE_SERVICES)
+    budget = host.memory_mb * DATABASE_MEMORY_SHARE * service.memory_weight / total_weight
+    return max(MIN_DATABASE_MEMORY_MB, int(budget))
+
+
+def clamp(value: int, lower: int, upper: int) -> int:
+    return max(lower, min(upper, value))
+
+
+def render_postgres_config(service: DatabaseService, host: HostResources) -> str:
+    """
+    Render the postgresql.conf of a postgres service, sized from its memory budget and the host.
+    Replaces the image's postgresql.conf, so the settings initdb writes are repeated.
+    """
+    memory_mb = database_memory_mb(service, host)
+    shared_buffers_mb = max(128, memory_mb // 4)  # never below the postgres default
+    wal_buffers = "16MB" if shared_buffers_mb >= 512 else "-1"  # -1: 1/32 of shared_buffers
+    # a complex query may use several work_mem sized sorts/hashes at once
+    work_mem_mb = clamp((memory_mb - shared_buffers_mb) // (service.max_connections * 3), 4, 64)
+    parallel_workers = max(1, host.cores // 2)
+    return f"""# Generated by client_installer.py for a {memory_mb} MB budget on a host with {host}.
+# Re-running the installer overwrites this file, put your own settings into override.conf next to it.
+
+# --- settings of the postgres image / initdb ---
+listen_addresses = '*'
+dynamic_shared_memory_type = posix
+datestyle = 'iso, mdy'
+timezone = 'Etc/UTC'
+log_timezone = 'Etc/UTC'
+lc_messages = 'en_US.utf8'
+lc_monetary = 'en_US.utf8'
+lc_numeric = 'en_US.utf8'
+lc_time = 'en_US.utf8'
+default_text_search_config = 'pg_catalog.english'
+
+# --- connections and memory ---
+max_connections = {service.max_connections}
+shared_buffers = {shared_buffers_mb}MB
+effective_cache_size = {memory_mb * 3 // 4}MB
+work_mem = {work_mem_mb}MB
+maintenance_work_mem = {clamp(memory_mb // 16, 64, 1024)}MB
+
+# --- write ahead log ---
+wal_buffers = {wal_buffers}
+min_wal_size = {clamp(memory_mb // 8, 80, 1024)}MB
+max_wal_size = {clamp(memory_mb, 1024, 8192)}MB
+checkpoint_completion_target = 0.9
+
+# --- disk ({'SSD' if host.ssd else 'HDD'}) ---
+random_page_cost = {1.1 if host.ssd else 4.0}
+effective_io_concurrency = {200 if host.ssd else 2}
+
+# --- parallelism ---
+max_worker_processes = {max(8, host.cores)}
+max_parallel_workers = {host.cores}
+max_parallel_workers_per_gather = {min(4, parallel_workers)}
+max_parallel_maintenance_workers = {min(4, parallel_workers)}
+
+include_if_exists = 'override.conf'
+"""
+
+
+def write_postgres_configs(client_dir: Path, host: HostResources) -> None:
+    """Write the postgresql.conf of every postgres service (and the shared server) to postgres/<service>/ in client_dir."""
+    for service in POSTGRES_SERVICES + (SHARED_POSTGRES_SERVICE,):
+        config_dir = client_dir / 'postgres' / service.name
+        config_dir.mkdir(parents=True, exist_ok=True)
+        (config_dir / 'postgresql.conf').write_text(render_postgres_config(service, host))
+
+def render_mariadb_config(service: DatabaseService, host: HostResources) -> str:
+    """Render the server config of a MariaDB service, sized from its memory budget and the host."""
+    memory_mb = database_memory_mb(service, host)
+    # InnoDB bypasses the page cache (O_DIRECT), so the buffer pool is the cache
+    buffer_pool_mb = max(128, memory_mb * 3 // 4)
+    return f"""# Generated by client_installer.py for a {memory_mb} MB budget on a host with {host}.
+# Re-running the installer overwrites this file, put your own settings into a separate *.cnf file next to it.
+[mariadb]
+# --- connections and memory ---
+max_connections = {service.max_connections}
+innodb_buffer_pool_size = {buffer_pool_mb}M
+tmp_table_size = {clamp(memory_mb // 32, 16, 256)}M
+max_heap_table_size = {clamp(memory_mb // 32, 16, 256)}M
+max_allowed_packet = 64M
+
+# --- redo log ---
+innodb_log_file_size = {clamp(buffer_pool_mb // 4, 96, 2048)}M
+innodb_log_buffer_size = {32 if memory_mb >= 1024 else 16}M
+
+# --- disk ({'SSD' if host.ssd else 'HDD'}) ---
+innodb_io_capacity = {2000 if host.ssd else 200}
+innodb_io_capacity_max = {4000 if host.ssd else 400}
+innodb_flush_neighbors = {0 if host.ssd else 1}
+"""
+
+
+def render_mariadb_bulk_import_config(service: DatabaseService, host: HostResources) -> str:
+    """
+    Render the bulk-import profile of a MariaDB service, loaded after the sized config.
+    Trades durability on a host crash for insert throughput, meant for initial data loads only.
+    """
+    buffer_pool_mb = max(128, database_memory_mb(service, host) * 3 // 4)
+    return f"""# Generated by client_installer.py: bulk-import profile of {service.name}.
+# Active while this file ends in .cnf, disabled while it ends in .cnf.off. Restart {service.name} after renaming.
+# WARNING: With this profile a crash of the HOST (not just the container) may lose the last second of
+# committed transactions. Switch it off once the initial data load is done.
+[mariadb]
+# write the redo log on every commit, but flush it to disk only once per second
+innodb_flush_log_at_trx_commit = 2
+# no fsync of the binary log (only relevant if log_bin is enabled)
+sync_binlog = 0
+# a larger redo log means fewer checkpoints during long running inserts
+innodb_log_file_size = {clamp(buffer_pool_mb // 2, 512, 4096)}M
+innodb_log_buffer_size = 128M
+# batched multi-row inserts of wide tables
+max_allowed_packet = 1G
+"""
+
+
+def write_mariadb_configs(client_dir: Path, host: HostResources, bulk_import: bool) -> None:
+    """
+    Write the config of every MariaDB service to mariadb/<service>/ in client_dir, mounted as /etc/mysql/conf.d.
+    The bulk-import profile is written as 90-bulk-import.cnf when enabled and as 90-bulk-import.cnf.off otherwise,
+    so operators can switch it by renaming the file.
+    """
+    for service in MARIADB_SERVICES:
+        config_dir = client_dir / 'mariadb' / service.name
+        config_dir.mkdir(parents=True, exist_ok=True)
+        (config_dir / '50-flnet.cnf').write_text(render_mariadb_config(service, host))
+        enabled, disabled = config_dir / '90-bulk-import.cnf', config_dir / '90-bulk-import.cnf.off'
+        if not bulk_import:
+            enabled, disabled = disabled, enabled
+        disabled.unlink(missing_ok=True)
+        enabled.write_text(render_mariadb_bulk_import_config(service, host))
+
+
+def write_shared_postgres_secrets(env_dir: Path) -> None:
+    """
+    Write the secrets of the shared postgres server.
+    The roles of the services reuse the database passwords of their secret files,
+    so the services connect with the same credentials in both database modes.
+    """
+    write_env_file(
+        env_dir / 'postgres-shared-secrets.env',
+        skip_when_exists=True,
+        POSTGRES_PASSWORD=gen_secret(),
+        ORCH_API_DB_PASSWORD=read_env_file(env_dir / 'orch-secrets.env')['QUARKUS_DATASOURCE_PASSWORD'],
+        LOCAL_LEARNING_API_DB_PASSWORD=read_env_file(env_dir / 'local-learning-secrets.env')['QUARKUS_DATASOURCE_PASSWORD'],
+        KEYCLOAK_DB_PASSWORD=read_env_file(env_dir / 'keycloak-secrets.env')['KC_DB_PASSWORD'],
+    )
+
+# ============================================================================
+# Replicas
+# ============================================================================
+REPLICAS_OVERLAY = 'docker-compose.replicas.yml'
+# Stateless API services that can run as several containers behind the reverse proxy,
+# with the generated block of their nginx upstream
+REPLICATED_SERVICES = {'dataimporter-api': 'dataimporter-balancing', 'local-learning-api': 'local-learning-balancing'}
+# Reached directly by the learning containers under the host name in the given variable, so every
+# replica is a numbered service with its own name instead of a deploy.replicas copy
+NUMBERED_REPLICA_SERVICES = {'dataimporter-api': 'REMOTE_APP_EXECUTION_WS_PUBLIC_HOST'}
+MAX_REPLICAS = 8
+
+
+def replica_names(service: str, replicas: int) -> list:
+    """Compose services of the numbered replicas of service, the first one is the service itself."""
+    return [service] + [f"{service}-{index}" for index in range(2, replicas + 1)]
+
+
+def replica_host_name(service: str, index: int) -> str:
+    """Host name of one numbered replica (1-based), the service name itself resolves to all of them."""
+    return f"{service}-{index}"
+
+
+def validate_replicas(replicas: dict, host: HostResources) -> list[str]:
+    """Check the replica count per service, returns warnings. Raises ValueError if invalid."""
+    for service, count in replicas.items():
+        if service not in REPLICATED_SERVICES:
+            raise ValueError(f"'{service}' cannot have replicas, only {', '.join(REPLICATED_SERVICES)}.")
+        if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_REPLICAS:
+            raise ValueError(f"The replicas of '{service}' must be a number from 1 to {MAX_REPLICAS}.")
+    additional = sum(replicas.values()) - len(replicas)
+    if additional and additional >= host.cores:
+        return [f"{additional} additional API containers on {host.cores} cores will mostly compete for the same CPUs."]
+    return []
+
+
+def write_replicas_overlay(client_dir: Path, replicas: dict) -> None:
+    """
+    Write the replicas of the API services as compose overlay. Numbered replicas extend the service of
+    docker-compose.yml and share the network alias of the first one, which the nginx upstream resolves.
+    """
+    services = {}
+    for service, count in replicas.items():
+        if count < 2:
+            continue
+        if service not in NUMBERED_REPLICA_SERVICES:
+            services[service] = {'deploy': {'replicas': count}}
+            continue
+        for index, name in enumerate(replica_names(service, count), start=1):
+            host_name = replica_host_name(service, index)
+            services[name] = {
+                'environment': [f"{NUMBERED_REPLICA_SERVICES[service]}={host_name}"],
+                'networks': {'local-learning-network': {'aliases': [host_name] if name == service else [service]}},
+            }
+            if name != service:
+                services[name] = {'extends': {'file': 'docker-compose.yml', 'service': service}, **services[name]}
+    (client_dir / REPLICAS_OVERLAY).write_text(
+        "# Generated by client_installer.py: replicas of the API services, balanced by the reverse proxy.\n"
+        + render_yaml({'services': services}) + "\n"
+    )
+
+
+def patch_nginx_replicas(client_dir: Path, replicas: dict) -> None:
+    """Balance the nginx upstream of every replicated service by the least number of active connections."""
+    for service, block in REPLICATED_SERVICES.items():
+        patch_nginx_block(client_dir / 'nginx.conf', block, "least_conn;\n" if replicas.get(service, 1) > 1 else "")
+
+# ============================================================================
+# Co-hosted Networks
+# ============================================================================
+COHOSTED_OVERLAY = 'docker-compose.networks.yml'
+# Services that exist once per network, everything else (proxy, keycloak, databases, orch-api,
+# importer) is shared by all networks of the client
+COHOSTED_SERVICES = ('local-learning-api', 'controller', 'instance-manager-frontend')
+# One-shot service creating the learning databases of the co-hosted networks in the existing postgres server
+COHOSTED_DATABASES_SERVICE = 'cohosted-databases'
+COHOSTED_DATABASES_IMAGE = 'postgres:17.5'
+MAX_COHOSTED_NETWORKS = 2
+# Runs in the postgres image, creates every database of COHOSTED_DATABASES that does not exist yet.
+# POSTGRES_PASSWORD comes from the env_file of the service, $$ defers the expansion to the container.
+COHOSTED_DATABASES_SCRIPT = """set -eu
+export PGPASSWORD="$$POSTGRES_PASSWORD"
+for database in $$COHOSTED_DATABASES; do
+  if [ -z "$$(psql -tAc "SELECT 1 FROM pg_database WHERE datname = '$$database'")" ]; then
+    echo "Creating database '$$database' owned by '$$DATABASE_OWNER'"
+    psql -v ON_ERROR_STOP=1 -c "CREATE DATABASE \\"$$database\\" OWNER \\"$$DATABASE_OWNER\\""
+  fi
+done
+"""
+
+
+def cohosted_service_name(service: str, network: str) -> str:
+    """Compose service (and host name) of the copy of service for a co-hosted network."""
+    return f"{service}-{network}"
+
+
+def cohosted_service_copies(cohosted: dict) -> dict:
+    """The compose services of all co-hosted networks, {copy: service of docker-compose.yml it extends}."""
+    return {cohosted_service_name(service, network): service for network in cohosted for service in COHOSTED_SERVICES}
+
+
+def cohosted_database_name(network: str, database_mode: str) -> str:
+    """Learning database of a co-hosted network, next to the one of the primary network."""
+    return f"local-learning-management-{network}" if database_mode == "separate" else f"local-learning-api-{network}"
+
+
+def validate_cohosted_networks(cohosted: dict, domain_obj: Optional[Domain], global_domain_obj: Domain,
+                               fullchain_file: Optional[Path]) -> list[str]:
+    """
+    Check the co-hosted networks ({network: Domain}) against the primary network, returns warnings.
+    Raises ValueError if invalid.
+    """
+    if not cohosted:
+        return []
+    if domain_obj is None:
+        raise ValueError("Co-hosted networks are told apart by their domain, a 'domain' is required.")
+    if len(cohosted) > MAX_COHOSTED_NETWORKS:
+        raise ValueError(f"At most {MAX_COHOSTED_NETWORKS} networks can be co-hosted next to the primary one.")
+    domain_names = {domain_obj.domain_name().lower()}
+    for network, network_domain in cohosted.items():
+        config = PREDEFINED_CONFIGURATIONS.get(network)
+        if config is None:
+            raise ValueError(f"Unknown network '{network}', co-host one of {', '.join(repr(name) for name in PREDEFINED_CONFIGURATIONS)}.")
+        if str(global_domain_obj) in config.candidate_domains:
+            raise ValueError(f"'{network}' is already the primary network of the client.")
+        if not network_domain.is_valid():
+            raise ValueError(f"The domain '{network_domain}' of '{network}' is not a valid domain with protocol.")
+        if network_domain.protocol() != domain_obj.protocol() or network_domain.port() != domain_obj.port():
+            raise ValueError(f"The domain of '{network}' must use the protocol and port of '{domain_obj}', "
+                             "all networks share one reverse proxy.")
+        if network_domain.domain_name().lower() in domain_names:
+            raise ValueError(f"The domain of '{network}' must differ from the domains of the other networks.")
+        domain_names.add(network_domain.domain_name().lower())
+
+    warnings = []
+    certificate_names = certificate_domain_names(fullchain_file) if fullchain_file else None
+    if certificate_names is not None:
+        for network, network_domain in cohosted.items():
+            if not certificate_covers(certificate_names, network_domain.domain_name()):
+                warnings.append(f"The certificate in '{fullchain_file}' does not cover '{network_domain.domain_name()}' of '{network}'.")
+    warnings.append("Keycloak imports the redirect URIs of the co-hosted frontends only into a new realm. For an existing "
+                    "realm, add them to the 'frontend' client in the admin console: "
+                    + ", ".join(f"{network_domain}/*" for network_domain in cohosted.values()))
+    return warnings
+
+
+def write_cohosted_overlay(client_dir: Path, cohosted: dict, endpoints: dict, database_mode: str, replicas: dict,
+                           image_lock: Optional[dict]) -> None:
+    """
+    Write the services of the co-hosted networks as compose overlay. Their local-learning-api, controller
+    and frontend extend the services of docker-compose.yml with the GLOBAL_* settings of their network
+    (for the platform domain selected in endpoints, see resolve_cohosted_endpoints),
+    the reverse proxy, keycloak, orch-api, the importer and the database servers are shared.
+    """
+    separate = database_mode == "separate"
+    database_host = 'local-learning-api-db' if separate else 'postgres'
+    services = {}
+    for network, network_domain in cohosted.items():
+        config = PREDEFINED_CONFIGURATIONS[network]
+        settings = global_settings(endpoints[network], config.global_tcp_port)
+        learning_api = cohosted_service_name('local-learning-api', network)
+        depends_on = {COHOSTED_DATABASES_SERVICE: {'condition': 'service_completed_successfully'}}
+        if not separate:
+            # extends only copies docker-compose.yml, so the shared mode of the overlay is repeated here
+            depends_on.update({'local-learning-api-db': {'condition': 'service_healthy', 'required': False},
+                               'postgres': {'condition': 'service_healthy'}})
+        services[learning_api] = {
+            'extends': {'file': 'docker-compose.yml', 'service': 'local-learning-api'},
+            'environment': [
+                f"QUARKUS_HTTP_CORS_ORIGINS={network_domain}",
+                f"QUARKUS_DATASOURCE_JDBC_URL=jdbc:postgresql://{database_host}:5432/{cohosted_database_name(network, database_mode)}",
+                f"QUARKUS_DATASOURCE_USERNAME={'user' if separate else 'local_learning_api'}",
+                f"QUARKUS_REST_CLIENT_CONTROLLER_API_URL=http://{cohosted_service_name('controller', network)}:8000",
+                f"QUARKUS_REST_CLIENT_GLOBAL_SCHEMA_API_URL={settings['GLOBAL_SCHEMA_API_URL']}",
+                f"QUARKUS_REST_CLIENT_GLOBAL_API_URL={settings['GLOBAL_LEARNING_API_URL']}",
+                f"GLOBAL_SOCKET_URI={settings['GLOBAL_LEARNING_API_WEBSOCKET_URL']}",
+            ],
+            'depends_on': depends_on,
+        }
+        if replicas.get('local-learning-api', 1) > 1:
+            services[learning_api]['deploy'] = {'replicas': replicas['local-learning-api']}
+        services[cohosted_service_name('controller', network)] = {
+            'extends': {'file': 'docker-compose.yml', 'service': 'controller'},
+            'environment': [
+                f"RELAY_ADDRESS_TCP={settings['GLOBAL_RELAY_TCP_ADDRESS']}",
+                f"RELAY_URI_HTTP={settings['GLOBAL_RELAY_HTTP_URL']}",
+                f"WORKFLOW_LEARNING_API_WS_ADDRESS=ws://{learning_api}:8080",
+            ],
+        }
+        services[cohosted_service_name('instance-manager-frontend', network)] = {
+            'extends': {'file': 'docker-compose.yml', 'service': 'instance-manager-frontend'},
+            'image': pinned_image(image_lock, config.frontend_image) if image_lock else config.frontend_image,
+            'depends_on': {learning_api: {'condition': 'service_started'}},
+        }
+
+    services[COHOSTED_DATABASES_SERVICE] = {
+        'image': pinned_image(image_lock, COHOSTED_DATABASES_IMAGE) if image_lock else COHOSTED_DATABASES_IMAGE,
+        'entrypoint': ["bash", "-c", COHOSTED_DATABASES_SCRIPT],
+        'restart': "no",
+        'env_file': ['env/local-learning-secrets.env' if separate else 'env/postgres-shared-secrets.env'],
+        'environment': [
+            f"PGHOST={database_host}",
+            f"PGUSER={'user' if separate else 'postgres'}",
+            f"PGDATABASE={'local-learning-management' if separate else 'postgres'}",
+            f"DATABASE_OWNER={'user' if separate else 'local_learning_api'}",
+            "COHOSTED_DATABASES=" + " ".join(cohosted_database_name(network, database_mode) for network in cohosted),
+        ],
+        'depends_on': {database_host: {'condition': 'service_healthy'}},
+        'networks': ['local-learning-network'],
+    }
+    # the shared services accept the requests of all domains
+    domain_names = ",".join(network_domain.domain_name() for network_domain in cohosted.values())
+    for name in replica_names('dataimporter-api', replicas.get('dataimporter-api', 1)):
+        services[name] = {'environment': [
+            f"ALLOWED_HOSTS=dataimporter-api,${{DEPLOYED_ON_DOMAIN}},{domain_names},dataimporter-api:8000"]}
+    services['keycloak'] = {'environment': [
+        f"COHOSTED_FRONTEND_REDIRECT_URI_{index}={network_domain}/*"
+        for index, network_domain in enumerate(cohosted.values(), start=1)
+    ]}
+    (client_dir / COHOSTED_OVERLAY).write_text(
+        "# Generated by client_installer.py: the per-network services of the co-hosted networks "
+        + ", ".join(f"{network} ({network_domain})" for network, network_domain in cohosted.items()) + ".\n"
+        + render_yaml({'services': services}) + "\n"
+    )
+
+
+def patch_nginx_cohosted(client_dir: Path, cohosted: dict, profile: SizingProfile, replicas: dict) -> None:
+    """
+    Render an upstream per co-hosted network and service and route the requests by their host to them,
+    the primary network stays the default of the maps.
+    """
+    nginx_conf_path = client_dir / 'nginx.conf'
+    keepalive = (f"    keepalive {profile.nginx_upstream_keepalive};\n"
+                 f"    keepalive_requests {profile.nginx_upstream_keepalive_requests};\n"
+                 f"    keepalive_timeout {profile.nginx_upstream_keepalive_timeout};\n")
+    upstreams = ""
+    hosts = {'cohosted-learning-hosts': "", 'cohosted-websocket-hosts': "", 'cohosted-frontend-hosts': ""}
+    for network, network_domain in cohosted.items():
+        learning_api = cohosted_service_name('local-learning-api', network)
+        balancing = "    least_conn;\n" if replicas.get('local-learning-api', 1) > 1 else ""
+        upstreams += (
+            f"upstream local-learning-backend-{network} {{\n{balancing}"
+            f"    server {learning_api}:8080 resolve;\n{keepalive}"
+            f"    zone local_learning_{network}_zone 64k;\n}}\n"
+            f"upstream local-learning-websocket-backend-{network} {{\n"
+            f"    hash $remote_addr consistent;\n"
+            f"    server {learning_api}:8080 resolve;\n{keepalive}"
+            f"    zone local_learning_websocket_{network}_zone 64k;\n}}\n"
+            f"upstream frontend-backend-{network} {{\n"
+            f"    server {cohosted_service_name('instance-manager-frontend', network)}:80 resolve;\n{keepalive}"
+            f"    zone frontend_{network}_zone 64k;\n}}\n"
+        )
+        domain_name = network_domain.domain_name().lower()
+        hosts['cohosted-learning-hosts'] += f"{domain_name} local-learning-backend-{network};\n"
+        hosts['cohosted-websocket-hosts'] += f"{domain_name} local-learning-websocket-backend-{network};\n"
+        hosts['cohosted-frontend-hosts'] += f"{domain_name} frontend-backend-{network};\n"
+    patch_nginx_block(nginx_conf_path, 'cohosted-upstreams', upstreams)
+    for block, content in hosts.items():
+        patch_nginx_block(nginx_conf_path, block, content)
+
+# ============================================================================
+# Resource Limits
+# ============================================================================
+RESOURCES_OVERLAY = 'docker-compose.resources.yml'
+# cpu_shares only matter while the CPUs are contended: the interactive paths (proxy, frontend,
+# keycloak) then get twice the default weight, batch work (imports) half of it
+INTERACTIVE_CPU_SHARES = 2048
+BATCH_CPU_SHARES = 512
+
+class ServiceResources:
+    """
+    The resource limits of a non-database service of the compose file.
+    The memory limit is a share of the host memory within [min_memory_mb, max_memory_mb],
+    cpu_fraction limits the service to a fraction of the host cores (1.0: no limit).
+    """
+    def __init__(self, name: str, memory_share: float, min_memory_mb: int, max_memory_mb: int, reservation_mb: int,
+                 cpu_fraction: float = 1.0, cpu_shares: Optional[int] = None, pids_limit: int = 1024):
+        self.name = name
+        self.memory_share = memory_share
+        self.min_memory_mb = min_memory_mb
+        self.max_memory_mb = max_memory_mb
+        self.reservation_mb = reservation_mb
+        self.cpu_fraction = cpu_fraction
+        self.cpu_shares = cpu_shares
+        self.pids_limit = pids_limit
+
+RESOURCE_SERVICES = (
+    ServiceResources('keycloak', 0.10, 768, 2048, 512, cpu_shares=INTERACTIVE_CPU_SHARES),
+    ServiceResources('orch-api', 0.08, 512, 2048, 256),
+        # launches the learning containers, which are not limited here and get the remaining memory
+    ServiceResources('local-learning-api', 0.10, 512, 3072, 256),
+    ServiceResources('dataimporter-api', 0.15, 512, 8192, 256, cpu_fraction=0.5, cpu_shares=BATCH_CPU_SHARES),
+        # a heavy import must not starve the learning containers and the interactive paths
+    ServiceResources('controller', 0.05, 256, 1024, 128),
+    ServiceResources('instance-manager-frontend', 0.01, 64, 256, 32, cpu_shares=INTERACTIVE_CPU_SHARES, pids_limit=256),
+    ServiceResources('reverse-proxy-unencrypted', 0.02, 128, 1024, 64, cpu_shares=INTERACTIVE_CPU_SHARES, pids_limit=256),
+    ServiceResources('reverse-proxy-encrypted', 0.02, 128, 1024, 64, cpu_shares=INTERACTIVE_CPU_SHARES, pids_limit=256),
+    # observability profile
+    ServiceResources('nginx-exporter', 0.0, 64, 64, 16, pids_limit=64),
+    ServiceResources('dataimport-db-exporter', 0.0, 64, 64, 16, pids_limit=64),
+    ServiceResources('prometheus', 0.05, 256, 2048, 128, pids_limit=256),
+)
+POSTGRES_EXPORTER_RESOURCES = ServiceResources('postgres-exporter', 0.0, 64, 64, 16, pids_limit=64)
+# Databases: their memory budget (see database_memory_mb) plus room for connections and sorts
+DATABASE_CPU_FRACTION = 0.5
+DATABASE_BATCH_SERVICES = ('dataimport-db',)
+
+
+def format_cpus(cores: float) -> float:
+    return round(max(0.5, cores), 1)
+
+
+def service_limits(resources: ServiceResources, host: HostResources) -> dict:
+    memory_mb = clamp(int(host.memory_mb * resources.memory_share), resources.min_memory_mb, resources.max_memory_mb)
+    limits = {
+        'mem_limit': f"{memory_mb}m",
+        'mem_reservation': f"{min(memory_mb // 2, resources.reservation_mb)}m",
+        'pids_limit': resources.pids_limit,
+    }
+    if resources.cpu_fraction < 1.0:
+        limits['cpus'] = format_cpus(host.cores * resources.cpu_fraction)
+    if resources.cpu_shares:
+        limits['cpu_shares'] = resources.cpu_shares
+    return limits
+
+
+def database_limits(service: DatabaseService, host: HostResources) -> dict:
+    memory_mb = database_memory_mb(service, host)
+    limits = {
+        'mem_limit': f"{2 * memory_mb + 256}m",
+        'mem_reservation': f"{memory_mb}m",
+        'pids_limit': service.max_connections + 64,  # postgres forks a process per connection
+    }
+    if service.name in DATABASE_BATCH_SERVICES:
+        limits['cpus'] = format_cpus(host.cores * DATABASE_CPU_FRACTION)
+        limits['cpu_shares'] = BATCH_CPU_SHARES
+    return limits
+
+
+def write_resources_overlay(client_dir: Path, host: HostResources, profile: SizingProfile, database_mode: str,
+                            replicas: Optional[dict] = None, cohosted: Optional[dict] = None) -> None:
+    """
+    Write the CPU, memory and process limits of every service as compose overlay, per container
+    (also per replica and co-hosted network). The operator's docker-compose.override.yml is merged after it,
+    so limits set there win.
+    """
+    services = {resources.name: service_limits(resources, host) for resources in RESOURCE_SERVICES}
+    for service, count in (replicas or {}).items():
+        if service in NUMBERED_REPLICA_SERVICES:
+            for name in replica_names(service, count)[1:]:
+                services[name] = services[service]
+    for name, service in cohosted_service_copies(cohosted or {}).items():
+        services[name] = services[service]
+    databases = MARIADB_SERVICES + ((SHARED_POSTGRES_SERVICE,) if database_mode == "shared" else POSTGRES_SERVICES)
+    for database in databases:
+        services[database.name] = database_limits(database, host)
+        if database not in MARIADB_SERVICES:
+            services[f"{database.name}-exporter"] = service_limits(POSTGRES_EXPORTER_RESOURCES, host)
+    (client_dir / RESOURCES_OVERLAY).write_text(
+        f"# Generated by client_installer.py for the '{profile.name}' sizing profile on a host with {host}.\n"
+        "# Re-running the installer overwrites this file, change limits in docker-compose.override.yml instead.\n"
+        + render_yaml({'services': services}) + "\n"
+    )
+
+# ============================================================================
+# Storage Placement
+# ============================================================================
+STORAGE_OVERLAY = 'docker-compose.storage.yml'
+
+class VolumeClass:
+    """A group of named volumes of the compose file that is placed into one data directory."""
+    def __init__(self, name: str, description: str, volumes: tuple, min_free_gb: int):
+        self.name = name
+        self.description = description
+        self.volumes = volumes
+        self.min_free_gb = min_free_gb
+
+DATABASE_VOLUMES = VolumeClass(
+    'databases', "the databases",
+    ('orch-api-db-volume', 'local-learning-api-db-volume', 'keycloak_postgres_volume', 'dataimport-db-volume'),
+    min_free_gb=20,
+)
+IMPORTED_FILES_VOLUMES = VolumeClass('imported_files', "the imported files", ('dataimport-files-volume',), min_free_gb=50)
+ORCH_DATA_VOLUMES = VolumeClass('orch_data', "the file transfer to the learning containers (orch-data)", ('orch-data-volume',), min_free_gb=10)
+VOLUME_CLASSES = {volume_class.name: volume_class for volume_class in (DATABASE_VOLUMES, IMPORTED_FILES_VOLUMES, ORCH_DATA_VOLUMES)}
+# volumes of the shared database mode, placed with the databases
+SHARED_DATABASE_VOLUMES = ('shared-postgres-volume',)
+# the named volumes whose name is not prefixed by compose, e.g. because orch-api mounts it into the learning containers
+FIXED_VOLUME_NAMES = {'orch-data-volume': '${COMPOSE_PROJECT_NAME}_orch-data'}
+TMPFS_SIZE_PATTERN = re.compile(r'^\d+[mg]$')
+# file systems that never hold a data directory
+PSEUDO_FILESYSTEMS = ('proc', 'sysfs', 'tmpfs', 'devtmpfs', 'devpts', 'cgroup', 'cgroup2', 'overlay', 'squashfs',
+                      'mqueue', 'debugfs', 'tracefs', 'securityfs', 'pstore', 'bpf', 'autofs', 'hugetlbfs', 'fusectl',
+                      'configfs', 'binfmt_misc', 'nsfs', 'ramfs', 'rpc_pipefs', 'nfsd')
+
+
+def free_space_gb(path: Path) -> float:
+    """Free space of the file system holding path (or its closest existing parent)."""
+    while not path.exists():
+        path = path.parent
+    return shutil.disk_usage(path).free / 1024 ** 3
+
+
+def detect_data_dir_candidates() -> list:
+    """
+    Mount points of local disks with their free space, largest first, to suggest data directories.
+    Returns a list of (mount point, free GB, rotational or None). Empty if /proc/mounts is not available.
+    """
+    candidates = {}
+    try:
+        mounts = Path('/proc/mounts').read_text().splitlines()
+    except OSError:
+        return []
+    for line in mounts:
+        fields = line.split()
+        if len(fields) < 3 or fields[2] in PSEUDO_FILESYSTEMS or not fields[0].startswith('/dev/'):
+            continue
+        mount_point = Path(fields[1].replace('\\040', ' '))
+        if mount_point.parts[1:2] in (('boot',), ('snap',)):
+            continue
+        try:
+            candidates[fields[0]] = (mount_point, free_space_gb(mount_point), detect_rotational_disk(mount_point))
+        except OSError:
+            continue
+    return sorted(candidates.values(), key=lambda candidate: candidate[1], reverse=True)
+
+
+def validate_data_dir(path: Path, volume_class: VolumeClass) -> list[str]:
+    """
+    Check that the data directory can be created and written, returns warnings (e.g. little free space).
+    Raises ValueError if the directory is not usable.
+    """
+    if not path.is_absolute():
+        raise ValueError(f"The data directory '{path}' for {volume_class.description} must be an absolute path.")
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path):
+            pass
+    except OSError as e:
+        raise ValueError(f"The data directory '{path}' for {volume_class.description} is not writable: {e}")
+    warnings = []
+    free_gb = free_space_gb(path)
+    if free_gb < volume_class.min_free_gb:
+        warnings.append(f"Only {free_gb:.0f} GB are free in '{path}', at least {volume_class.min_free_gb} GB are recommended for {volume_class.description}.")
+    if detect_rotational_disk(path):
+        warnings.append(f"'{path}' is on a rotational disk (HDD), {volume_class.description} are faster on an SSD.")
+    return warnings
+
+
+def validate_tmpfs_size(size: str, host: HostResources) -> list[str]:
+    """Check the size of the orch-data tmpfs (e.g. 4g or 512m), returns warnings. Raises ValueError if invalid."""
+    if not TMPFS_SIZE_PATTERN.match(size):
+        raise ValueError(f"The tmpfs size '{size}' must be a number followed by m or g, e.g. 4g.")
+    size_mb = int(size[:-1]) * (1024 if size.endswith('g') else 1)
+    if size_mb > host.memory_mb // 2:
+        return [f"The orch-data tmpfs of {size} may use more than half of the memory ({host.memory_mb} MB)."]
+    return []
+
+
+def write_storage_overlay(client_dir: Path, client_name: str, data_dirs: dict, orch_data_tmpfs_size: Optional[str],
+                          database_mode: str) -> None:
+    """
+    Write the volume placement as compose overlay: the volumes of each class with a data directory are
+    bind mounted from <data dir>/<client_name>/<volume>, orch-data optionally is a tmpfs.
+    client_name is the name of the deployed client directory, client_dir may be its staging copy.
+    The named volumes are kept (only their driver options change), e.g. orch-api mounts orch-data by name.
+    """
+    volumes = {}
+    for class_name, data_dir in data_dirs.items():
+        volume_names = VOLUME_CLASSES[class_name].volumes
+        if class_name == DATABASE_VOLUMES.name and database_mode == "shared":
+            volume_names += SHARED_DATABASE_VOLUMES
+        for volume in volume_names:
+            device = data_dir / client_name / volume
+            device.mkdir(parents=True, exist_ok=True)
+            volumes[volume] = {'driver': 'local', 'driver_opts': {'type': 'none', 'o': 'bind', 'device': str(device)}}
+    if orch_data_tmpfs_size:
+        volumes['orch-data-volume'] = {
+            'driver': 'local',
+            'driver_opts': {'type': 'tmpfs', 'device': 'tmpfs', 'o': f'size={orch_data_tmpfs_size},mode=1777'},
+        }
+    for volume, name in FIXED_VOLUME_NAMES.items():
+        if volume in volumes:
+            volumes[volume] = {'name': name, **volumes[volume]}
+    (client_dir / STORAGE_OVERLAY).write_text(
+        "# Generated by client_installer.py: placement of the named volumes on the data directories.\n"
+        "# WARNING: docker does not move existing volumes, remove them (after copying the data) to apply a change.\n"
+        + render_yaml({'volumes': volumes}) + "\n"
+    )
+
+# ============================================================================
+# Preflight
+# ============================================================================
+# A short measurement of the host before deploying the stack (three JVMs, up to three postgres servers
+# and a mariadb). The thresholds are rough lines between "works" and "the databases will be the bottleneck".
+PREFLIGHT_PROBE_SIZE_MB = 64
+PREFLIGHT_BLOCK_SIZE = 8192  # the page size of postgres
+PREFLIGHT_FSYNC_WRITES = 100
+PREFLIGHT_RANDOM_READS = 2000
+PREFLIGHT_PROBE_SECONDS = 3.0  # upper bound per disk probe, slow disks stop early
+PREFLIGHT_TCP_ATTEMPTS = 5
+PREFLIGHT_TCP_TIMEOUT_SECONDS = 3.0
+# Disk space of the images of all services, on top of the minimum of every volume class
+PREFLIGHT_IMAGES_GB = 10
+# Every commit of the databases waits for one fsync, an HDD needs ~10 ms, an SSD well below 1 ms
+PREFLIGHT_MAX_FSYNC_MS = 10.0
+PREFLIGHT_MIN_RANDOM_READ_IOPS = 1000
+PREFLIGHT_MIN_SEQUENTIAL_MBPS = 50
+PREFLIGHT_MAX_CONNECT_MS = 250.0
+
+
+def percentile(values: list, fraction: float) -> float:
+    """The value below which the given fraction of values lies (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def drop_page_cache(fd: int) -> None:
+    """Ask the kernel to forget the cached pages of the file, so the next reads hit the disk."""
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def probe_disk(directory: Path, size_mb: int = PREFLIGHT_PROBE_SIZE_MB) -> dict:
+    """
+    Measure the disk holding directory with a temporary file: sequential write (incl. fsync) and read
+    throughput, random reads of single pages and the latency of small writes each followed by an fsync,
+    the pattern of a database commit. Raises OSError if the directory is not writable.
+    """
+    block = os.urandom(1024 * 1024)
+    fd, probe_path = tempfile.mkstemp(prefix='flnet-preflight-', dir=directory)
+    try:
+        started = time.monotonic()
+        for _ in range(size_mb):
+            os.write(fd, block)
+        os.fsync(fd)
+        sequential_write_seconds = time.monotonic() - started
+
+        drop_page_cache(fd)
+        started = time.monotonic()
+        os.lseek(fd, 0, os.SEEK_SET)
+        while os.read(fd, len(block)):
+            pass
+        sequential_read_seconds = time.monotonic() - started
+
+        drop_page_cache(fd)
+        pages = size_mb * 1024 * 1024 // PREFLIGHT_BLOCK_SIZE
+        reads = 0
+        started = time.monotonic()
+        while reads < PREFLIGHT_RANDOM_READS and time.monotonic() - started < PREFLIGHT_PROBE_SECONDS:
+            os.pread(fd, PREFLIGHT_BLOCK_SIZE, random.randrange(pages) * PREFLIGHT_BLOCK_SIZE)
+            reads += 1
+        random_read_seconds = time.monotonic() - started
+
+        fsync_latencies = []
+        page = block[:PREFLIGHT_BLOCK_SIZE]
+        started = time.monotonic()
+        while len(fsync_latencies) < PREFLIGHT_FSYNC_WRITES and time.monotonic() - started < PREFLIGHT_PROBE_SECONDS:
+            write_started = time.monotonic()
+            os.pwrite(fd, page, len(fsync_latencies) * PREFLIGHT_BLOCK_SIZE)
+            os.fsync(fd)
+            fsync_latencies.append((time.monotonic() - write_started) * 1000)
+    finally:
+        os.close(fd)
+        os.unlink(probe_path)
+    return {
+        "directory": str(directory),
+        "sequential_write_mbps": size_mb / max(sequential_write_seconds, 1e-6),
+        "sequential_read_mbps": size_mb / max(sequential_read_seconds, 1e-6),
+        "random_read_iops": reads / max(random_read_seconds, 1e-6),
+        "fsync_p50_ms": percentile(fsync_latencies, 0.5),
+        "fsync_p99_ms": percentile(fsync_latencies, 0.99),
+    }
+
+
+def probe_tcp_connect(host: str, port: int, attempts: int = PREFLIGHT_TCP_ATTEMPTS,
+                      timeout: float = PREFLIGHT_TCP_TIMEOUT_SECONDS) -> dict:
+    """TCP connect latency to host:port over several attempts, 'error' is set if no attempt succeeded."""
+    latencies = []
+    error = None
+    for _ in range(attempts):
+        started = time.monotonic()
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                latencies.append((time.monotonic() - started) * 1000)
+        except OSError as e:
+            error = str(e) or type(e).__name__
+    result = {"address": f"{host}:{port}", "connected": len(latencies), "attempts": attempts}
+    if latencies:
+        result.update({"median_ms": percentile(latencies, 0.5), "max_ms": max(latencies)})
+    else:
+        result["error"] = error
+    return result
+
+
+def probe_directory(data_root: Path) -> Path:
+    """The directory the disk probe writes to: data_root, or the closest existing parent if it does not exist yet."""
+    while not data_root.exists():
+        data_root = data_root.parent
+    return data_root
+
+
+def run_preflight(relay_address: tuple, platform_address: Optional[tuple], data_root: Path = DOCKER_DATA_ROOT) -> dict:
+    """
+    Measure this host: cores, memory, free space and disk speed of data_root (the docker root by default)
+    and the connect latency to the relay (host, port) and the platform (host, port) of the network.
+    Falls back to the temporary directory for the disk probe if data_root is not writable (e.g. not root).
+    """
+    host = detect_host_resources()
+    directory = probe_directory(data_root)
+    report = {"host": host, "data_root": str(directory), "free_gb": free_space_gb(directory)}
+    try:
+        report["disk"] = probe_disk(directory)
+    except OSError:
+        # docker's root is usually only writable by root, the temporary directory is often on the same disk
+        report["disk"] = probe_disk(Path(tempfile.gettempdir()))
+    report["relay"] = probe_tcp_connect(*relay_address)
+    if platform_address is not None:
+        report["platform"] = probe_tcp_connect(*platform_address)
+    # the disk type stays the one sysfs reports, a single probe of a few seconds is too noisy to
+    # decide the database tuning, slow results are only reported by preflight_warnings
+    report["sizing_profile"] = select_sizing_profile(host)
+    report["database_mode"] = "shared" if report["sizing_profile"] is SMALL_PROFILE else "separate"
+    return report
+
+
+def preflight_warnings(report: dict) -> list[str]:
+    """Everything the preflight measured that the stack cannot sustain or that will slow it down."""
+    warnings = []
+    host = report["host"]
+    if host.cores < SMALL_PROFILE.cores or host.memory_mb < SMALL_PROFILE.memory_gb * 1024:
+        warnings.append(f"This host ({host.cores} cores, {host.memory_mb / 1024:.1f} GB RAM) is below the minimum of {SMALL_PROFILE.cores} cores and "
+                        f"{SMALL_PROFILE.memory_gb} GB RAM. The JVM services and databases will compete for memory "
+                        "and the learning containers may not start, use the shared database mode at least.")
+    required_gb = sum(volume_class.min_free_gb for volume_class in VOLUME_CLASSES.values()) + PREFLIGHT_IMAGES_GB
+    if report["free_gb"] < required_gb:
+        warnings.append(f"Only {report['free_gb']:.0f} GB are free in '{report['data_root']}', {required_gb} GB are "
+                        "recommended for the images and volumes, or place the volumes into data directories.")
+    disk = report["disk"]
+    if disk["fsync_p50_ms"] > PREFLIGHT_MAX_FSYNC_MS:
+        warnings.append(f"An fsync takes {disk['fsync_p50_ms']:.1f} ms (median) in '{disk['directory']}', every database "
+                        f"commit waits for one. More than {PREFLIGHT_MAX_FSYNC_MS:.0f} ms usually means an HDD or a slow "
+                        "network disk.")
+    if disk["random_read_iops"] < PREFLIGHT_MIN_RANDOM_READ_IOPS:
+        warnings.append(f"Only {disk['random_read_iops']:.0f} random reads per second in '{disk['directory']}', queries "
+                        "that do not fit in memory will be slow.")
+    if disk["sequential_write_mbps"] < PREFLIGHT_MIN_SEQUENTIAL_MBPS:
+        warnings.append(f"Writing to '{disk['directory']}' reaches only {disk['sequential_write_mbps']:.0f} MB/s, "
+                        "imports and the file transfer to the learning containers will be slow.")
+    for name in ("relay", "platform"):
+        connect = report.get(name)
+        if connect is None:
+            continue
+        if not connect["connected"]:
+            warnings.append(f"The {name} of the network ({connect['address']}) cannot be reached: {connect['error']}.")
+        elif connect["connected"] < connect["attempts"]:
+            warnings.append(f"Only {connect['connected']} of {connect['attempts']} connections to the {name} "
+                            f"({connect['address']}) succeeded.")
+        elif connect["median_ms"] > PREFLIGHT_MAX_CONNECT_MS:
+            warnings.append(f"Connecting to the {name} ({connect['address']}) takes {connect['median_ms']:.0f} ms, "
+                            "learning rounds with many messages will be slow.")
+    return warnings
+
+
+def print_preflight_report(report: dict) -> None:
+    """Print the measurements of run_preflight."""
+    disk = report["disk"]
+    print(f"Host:    {report['host']}, {report['free_gb']:.0f} GB free in '{report['data_root']}'")
+    print(f"Disk:    '{disk['directory']}': write {disk['sequential_write_mbps']:.0f} MB/s, "
+          f"read {disk['sequential_read_mbps']:.0f} MB/s, {disk['random_read_iops']:.0f} random reads/s, "
+          f"fsync {disk['fsync_p50_ms']:.2f} ms (p50) / {disk['fsync_p99_ms']:.2f} ms (p99)")
+    for name in ("relay", "platform"):
+        connect = report.get(name)
+        if connect is None:
+            continue
+        if connect["connected"]:
+            print(f"{name.capitalize() + ':':<8} {connect['address']}: connect {connect['median_ms']:.1f} ms (median), "
+                  f"{connect['max_ms']:.1f} ms (max), {connect['connected']}/{connect['attempts']} succeeded")
+        else:
+            print(f"{name.capitalize() + ':':<8} {connect['address']}: not reachable ({connect['error']})")
+    print(f"Recommended: the '{report['sizing_profile'].name}' sizing profile with the {report['database_mode']} database mode.")
+
+
+def network_addresses(global_domain_obj: Domain, global_tcp_port: str) -> tuple[tuple, tuple]:
+    """The (host, port) of the relay (GLOBAL_RELAY_TCP_ADDRESS) and of the platform domain of a network."""
+    return ((global_domain_obj.domain_name(), int(global_tcp_port)),
+            (global_domain_obj.domain_name(), int(global_domain_obj.port())))
+
+
+def parse_host_port(address: str) -> tuple:
+    """Split host:port, e.g. of --relay-address. Raises ValueError if the port is missing or invalid."""
+    host, _, port = address.rpartition(':')
+    if not host or not validate_port(port):
+        raise ValueError(f"'{address}' is not a valid host:port address.")
+    return host.strip('[]'), int(port)
+
+# ============================================================================
+# Global Endpoint Selection
+# ============================================================================
+# Several domains of GLOBAL_DOMAIN_TO_IMAGE lead to the same platform. The client connects to the
+# one with the lowest latency, for sites far away the relay round-trips dominate a learning round.
+ENDPOINT_PROBE_ATTEMPTS = 3
+ENDPOINT_PROBE_TIMEOUT_SECONDS = 3.0
+# Variables of the .env file recording the selection, kept on re-runs until a re-probe is requested.
+# GLOBAL_ENDPOINT* for the network of the client, <NETWORK>_GLOBAL_ENDPOINT* for each co-hosted network.
+ENDPOINT_VARIABLE_SUFFIXES = ('', '_CANDIDATES', '_PROBE', '_PROBED_AT')
+
+
+def probe_global_endpoint(domain: Domain, tcp_port: str, context: Optional[ssl.SSLContext] = None,
+                          attempts: int = ENDPOINT_PROBE_ATTEMPTS,
+                          timeout: float = ENDPOINT_PROBE_TIMEOUT_SECONDS) -> dict:
+    """
+    Latency of one platform endpoint: the TCP connect to its relay, the TLS handshake (https only) and the
+    round-trip of a HEAD request, each the median over the attempts. 'latency_ms' (relay connect plus
+    HTTP round-trip) is only set if the relay and the web server are reachable, 'error' otherwise.
+    """
+    host, port = domain.domain_name(), int(domain.port())
+    if domain.protocol() == "https" and context is None:
+        context = ssl.create_default_context()
+    result = {"domain": str(domain), "relay": probe_tcp_connect(host, int(tcp_port), attempts, timeout)}
+    handshakes, round_trips, error = [], [], result["relay"].get("error")
+    for _ in range(attempts):
+        try:
+            connection = socket.create_connection((host, port), timeout=timeout)
+            try:
+                if domain.protocol() == "https":
+                    started = time.monotonic()
+                    connection = context.wrap_socket(connection, server_hostname=host)
+                    handshakes.append((time.monotonic() - started) * 1000)
+                started = time.monotonic()
+                connection.sendall(f"HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+                if not connection.recv(5).startswith(b"HTTP/"):
+                    raise OSError("no HTTP response")
+                round_trips.append((time.monotonic() - started) * 1000)
+            finally:
+                connection.close()
+        except OSError as e:
+            error = str(e) or type(e).__name__
+    if handshakes:
+        result["tls_ms"] = percentile(handshakes, 0.5)
+    if round_trips:
+        result["http_ms"] = percentile(round_trips, 0.5)
+    if round_trips and result["relay"]["connected"]:
+        result["latency_ms"] = result["relay"]["median_ms"] + result["http_ms"]
+    else:
+        result["error"] = error
+    return result
+
+
+def select_global_endpoint(candidates: list, tcp_port: str) -> tuple[Domain, list]:
+    """
+    Probe all candidate domains in parallel and return the fastest reachable one with all probes.
+    Falls back to the first candidate if none is reachable, e.g. on a host without internet access yet.
+    """
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        probes = list(executor.map(lambda candidate: probe_global_endpoint(candidate, tcp_port), candidates))
+    reachable = [(probe["latency_ms"], index) for index, probe in enumerate(probes) if "latency_ms" in probe]
+    return candidates[min(reachable)[1] if reachable else 0], probes
+
+
+def format_endpoint_probe(probe: dict) -> str:
+    """One probe as compact text without spaces for the .env file, e.g. example.com:relay=12.1ms/tls=30.5ms/http=48.0ms."""
+    measurements = [f"{name}={probe[key]:.1f}ms" for name, key in (("tls", "tls_ms"), ("http", "http_ms")) if key in probe]
+    if probe["relay"]["connected"]:
+        measurements.insert(0, f"relay={probe['relay']['median_ms']:.1f}ms")
+    if "latency_ms" not in probe:
+        measurements.append("unreachable")
+    return f"{Domain(probe['domain']).domain_name()}:{'/'.join(measurements)}"
+
+
+# ============================================================================
+# Pinned Images
+# ============================================================================
+# Written by image_bundle.py: the digest of every image, the installer pins the services to them
+IMAGES_LOCK_FILE = 'images.lock.json'
+IMAGES_OVERLAY = 'docker-compose.images.yml'
+# Services whose image is built locally by an overlay and therefore not pinned
+LOCALLY_BUILT_SERVICES = {'docker-compose.keycloak-optimized.yml': ('keycloak',)}
+
+
+def image_repository(image: str) -> str:
+    """Repository of an image reference without tag and digest, e.g. postgres for postgres:17.5."""
+    image = image.split('@')[0]
+    name, _, tag = image.rpartition(':')
+    return name if name and '/' not in tag else image
+
+
+def read_image_lock(path: Path) -> dict:
+    """Read an images.lock.json written by image_bundle.py. Raises ValueError if it is missing or invalid."""
+    try:
+        lock = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cannot read the image lock file '{path}': {e}")
+    if not isinstance(lock.get('images'), dict) or not isinstance(lock.get('services'), dict):
+        raise ValueError(f"The image lock file '{path}' has no 'images' and 'services', re-create it with image_bundle.py lock.")
+    return lock
+
+
+def pinned_image(lock: dict, image: str) -> str:
+    """The digest reference of image from the lock file, the image itself if it is not locked."""
+    return lock['images'].get(image, {}).get('digest', image)
+
+
+def write_images_overlay(client_dir: Path, lock: dict, overlays: list, replicas: Optional[dict] = None,
+                         cohosted: Optional[dict] = None) -> None:
+    """
+    Write the locked digests of the services as compose overlay with pull_policy: missing,
+    so starting the client never contacts the registry once the images are present.
+    Only services of docker-compose.yml and of the chosen overlays (and their numbered replicas
+    and co-hosted copies) are pinned.
+    """
+    compose_files = ('docker-compose.yml', *overlays)
+    skipped = {service for overlay in overlays for service in LOCALLY_BUILT_SERVICES.get(overlay, ())}
+    services = {}
+    for service, entry in sorted(lock['services'].items()):
+        if entry.get('compose_file') not in compose_files or service in skipped:
+            continue
+        services[service] = {'pull_policy': 'missing'}
+        if '${' not in entry['image']:
+            # an interpolated image (FRONTEND_IMAGE) is pinned in .env
+            services[service] = {'image': pinned_image(lock, entry['image']), **services[service]}
+    for service, count in (replicas or {}).items():
+        if service in NUMBERED_REPLICA_SERVICES and service in services:
+            for name in replica_names(service, count)[1:]:
+                services[name] = services[service]
+    for name, service in cohosted_service_copies(cohosted or {}).items():
+        if service in services:
+            # the frontend images of the co-hosted networks are pinned in their overlay
+            services[name] = {'pull_policy': 'missing'} if service == 'instance-manager-frontend' else services[service]
+    (client_dir / IMAGES_OVERLAY).write_text(
+        f"# Generated by client_installer.py from {IMAGES_LOCK_FILE} ({lock.get('generated_at', 'unknown date')}).\n"
+        "# The frontend image is pinned via FRONTEND_IMAGE in .env. Re-create the lock with image_bundle.py lock to update.\n"
+        + render_yaml({'services': services}) + "\n"
+    )
+
+# ============================================================================
+# Image Pre-fetch
+# ============================================================================
+DEFAULT_PULL_JOBS = 4
+PULL_ATTEMPTS = 3
+PULL_RETRY_DELAY_SECONDS = 5
+
+
+def client_images(docker: str, client_dir: Path) -> list:
+    """
+    Images the rendered client_dir starts, as resolved by compose from .env (COMPOSE_FILE,
+    COMPOSE_PROFILES, FRONTEND_IMAGE). Locally built images are left out.
+    """
+    output = subprocess.run(
+        [docker, "compose", "config", "--format", "json"],
+        cwd=client_dir, check=True, capture_output=True, text=True,
+    ).stdout
+    services = json.loads(output).get("services", {})
+    return sorted({service["image"] for service in services.values() if service.get("image") and "build" not in service})
+
+
+def pull_image(docker: str, image: str, attempts: int) -> tuple[str, int, float, Optional[str]]:
+    """
+    Pull image, retrying with a growing delay. Layers downloaded by a failed attempt are kept by docker,
+    so a retry (or a re-run) only fetches the rest. An image pinned to a digest is skipped when present.
+    Returns (status, attempts used, seconds, error) with status pulled, present or failed.
+    """
+    start = time.monotonic()
+    if '@' in image and subprocess.run([docker, "image", "inspect", image], capture_output=True).returncode == 0:
+        return "present", 0, time.monotonic() - start, None
+    error = None
+    for attempt in range(1, attempts + 1):
+        result = subprocess.run([docker, "pull", "--quiet", image], capture_output=True, text=True)
+        if result.returncode == 0:
+            return "pulled", attempt, time.monotonic() - start, None
+        error = (result.stderr.strip().splitlines() or [f"exit code {result.returncode}"])[-1]
+        if attempt < attempts:
+            time.sleep(PULL_RETRY_DELAY_SECONDS * attempt)
+    return "failed", attempts, time.monotonic() - start, error
+
+
+def prefetch_images(docker: str, images: list, jobs: int, attempts: int = PULL_ATTEMPTS) -> dict:
+    """Pull images concurrently with jobs parallel pulls, printing one progress line per finished image."""
+    start = time.monotonic()
+    print(f"Pre-fetching {len(images)} images with {jobs} parallel pulls...")
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {executor.submit(pull_image, docker, image, attempts): image for image in images}
+        for done, future in enumerate(as_completed(futures), start=1):
+            image = futures[future]
+            status, used_attempts, seconds, error = future.result()
+            retried = f", {used_attempts} attempts" if used_attempts > 1 else ""
+            print(f"  [{done}/{len(images)}] {status} {image} ({seconds:.1f} s{retried})")
+            if error:
+                failed[image] = error
+    for image, error in failed.items():
+        print(f"ERROR: Pulling '{image}' failed: {error}")
+    return {"images": len(images), "failed": sorted(failed), "elapsed_seconds": round(time.monotonic() - start, 3)}
+
+
+def prefetch_client_images(docker: str, client_dirs: list, jobs: int) -> dict:
+    """Pre-fetch the images of all client_dirs (each image once). The result contains 'error' if docker is not usable."""
+    try:
+        images = sorted({image for client_dir in client_dirs for image in client_images(docker, client_dir)})
+    except (subprocess.CalledProcessError, OSError) as e:
+        stderr = getattr(e, 'stderr', None)
+        print(f"ERROR: Cannot read the images of the compose project: {stderr.strip() if stderr else e}")
+        return {"images": 0, "failed": [], "error": str(e)}
+    return prefetch_images(docker, images, jobs)
+
+# ============================================================================
+# Incremental Re-runs
+# ============================================================================
+# A re-run renders into a copy of the client directory and only writes back the files whose content
+# changed, so unchanged services keep running and compose recreates only what is really affected.
+# Services running nginx, a change of their mounted config is applied by 'nginx -s reload'
+NGINX_SERVICES = ('reverse-proxy-unencrypted', 'reverse-proxy-encrypted')
+
+
+def content_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def stage_client_dir(client_dir: Path) -> Path:
+    """
+    Temporary copy of client_dir to render into. Client directories other than FLNET_CLIENT_DIR
+    additionally get the client template (compose file, nginx and keycloak config) copied over it.
+    """
+    staging_dir = Path(tempfile.mkdtemp(prefix=f"{client_dir.name}-"))
+    if client_dir.exists():
+        shutil.copytree(client_dir, staging_dir, symlinks=True, dirs_exist_ok=True)
+    if client_dir.resolve() != FLNET_CLIENT_DIR.resolve():
+        shutil.copytree(FLNET_CLIENT_DIR, staging_dir, ignore=CLIENT_TEMPLATE_IGNORE, dirs_exist_ok=True)
+    return staging_dir
+
+
+def client_files(directory: Path) -> set:
+    """Relative paths of all files below directory."""
+    if not directory.exists():
+        return set()
+    return {path.relative_to(directory).as_posix() for path in directory.rglob('*') if path.is_file()}
+
+
+def changed_client_files(staging_dir: Path, client_dir: Path) -> list:
+    """Files that differ between the rendered staging_dir and client_dir by content hash, including added and removed ones."""
+    staged, existing = client_files(staging_dir), client_files(client_dir)
+    changed = existing ^ staged
+    changed.update(name for name in staged & existing
+                   if content_hash(staging_dir / name) != content_hash(client_dir / name))
+    return sorted(changed)
+
+
+def sync_client_dir(staging_dir: Path, client_dir: Path, changed_files: list) -> None:
+    """Write the changed files from staging_dir into client_dir (keeping their permissions) and remove the dropped ones."""
+    for name in changed_files:
+        source, target = staging_dir / name, client_dir / name
+        if source.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+        else:
+            target.unlink(missing_ok=True)
+
+
+# Top-level sections of a compose file whose entries are compared one by one
+COMPOSE_ENTRY_SECTIONS = ('services', 'volumes', 'networks')
+
+
+def compose_blocks(compose_file: Path) -> dict:
+    """
+    Text of every entry of the top-level sections of a compose file by section and name, e.g.
+    blocks['services']['keycloak'] or blocks['volumes']['orch-data-volume']. Any other top-level
+    key (e.g. name or an x- extension) is kept as a whole in blocks[''][key].
+    """
+    blocks = {}
+    if not compose_file.exists():
+        return blocks
+    section, entry = None, None
+    for line in compose_file.read_text().splitlines():
+        if line and not line[0].isspace() and not line.startswith('#'):
+            key = line.split(':', 1)[0].strip()
+            section, entry = (key, None) if key in COMPOSE_ENTRY_SECTIONS else ('', key)
+            if entry:
+                blocks.setdefault('', {})[entry] = line + "\n"
+            continue
+        match = re.match(r'^  ([\w.-]+):(\s|$)', line) if section else None
+        if match:
+            entry = match.group(1)
+            inline = line[match.end():].strip()
+            blocks.setdefault(section, {})[entry] = f"{inline}\n" if inline else ""
+        elif entry:
+            blocks[section][entry] += line + "\n"
+    return blocks
+
+
+def compose_service_blocks(compose_file: Path) -> dict:
+    """Text of every service defined in a compose file by name, enough to find what the service depends on."""
+    return compose_blocks(compose_file).get('services', {})
+
+
+def compose_top_level_blocks(client_dir: Path, env: dict) -> dict:
+    """Everything but the services of the COMPOSE_FILE of env by (section, name), the blocks of all compose files joined."""
+    blocks = {}
+    for compose_file in env.get('COMPOSE_FILE', 'docker-compose.yml').split(os.pathsep):
+        for section, entries in compose_blocks(client_dir / compose_file).items():
+            if section == 'services':
+                continue
+            for name, block in entries.items():
+                blocks[(section, name)] = blocks.get((section, name), "") + block
+    return blocks
+
+
+def uses_compose_entry(block: str, section: str, name: str) -> bool:
+    """Check if a service block mounts the named volume or joins the named network."""
+    if section == 'networks' and name == 'default' and not re.search(r'^\s*networks:', block, flags=re.MULTILINE):
+        return True
+    return re.search(rf'(?<![\w.-]){re.escape(name)}(?![\w.-])', block) is not None
+
+
+def service_profiles(block: str) -> set:
+    """Compose profiles a service block is limited to, empty if it always runs."""
+    profiles, in_profiles = set(), False
+    for line in block.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('profiles:'):
+            inline = stripped[len('profiles:'):].strip()
+            profiles.update(re.findall(r'[\w.-]+', inline))
+            in_profiles = not inline
+        elif in_profiles and stripped.startswith('- '):
+            profiles.add(stripped[2:].strip().strip('"\''))
+        elif in_profiles and stripped and not stripped.startswith('#'):
+            in_profiles = False
+    return profiles
+
+
+def active_compose_services(client_dir: Path, env: dict) -> dict:
+    """
+    Services started with the COMPOSE_FILE and COMPOSE_PROFILES of env, each with the blocks of all its compose files.
+    Like compose, the profiles of a later compose file replace the ones of the earlier files
+    (e.g. the shared postgres overlay moves the separate database exporters out of the observability profile).
+    """
+    services, profiles = {}, {}
+    for compose_file in env.get('COMPOSE_FILE', 'docker-compose.yml').split(os.pathsep):
+        for service, block in compose_service_blocks(client_dir / compose_file).items():
+            services[service] = services.get(service, "") + block
+            if re.search(r'^\s*profiles:', block, flags=re.MULTILINE):
+                profiles[service] = service_profiles(block)
+    active_profiles = set(filter(None, env.get('COMPOSE_PROFILES', '').split(',')))
+    return {service: block for service, block in services.items()
+            if not profiles.get(service) or profiles[service] & active_profiles}
+
+
+def affected_services(old_dir: Path, new_dir: Path, changed_files: list) -> dict:
+    """
+    What applying the changed files means for every affected service of the client:
+        start/stop: the service is added/removed by a changed COMPOSE_FILE or COMPOSE_PROFILES
+        recreate: its compose config, a variable it uses, one of its env files or a top-level volume or network
+            it uses changed ('docker compose up -d'), any other top-level change recreates all services
+        restart: a config file mounted into the service changed
+        reload: a config file mounted into an nginx service changed, applied without downtime
+    Unaffected services are left out, so compose keeps them running.
+    """
+    old_env, new_env = read_env_file(old_dir / '.env'), read_env_file(new_dir / '.env')
+    new_services = active_compose_services(new_dir, new_env)
+    if not old_env:
+        return {service: "start" for service in sorted(new_services)}
+    old_services = active_compose_services(old_dir, old_env)
+    changed_variables = {name for name in old_env.keys() | new_env.keys() if old_env.get(name) != new_env.get(name)}
+    old_top_level, new_top_level = compose_top_level_blocks(old_dir, old_env), compose_top_level_blocks(new_dir, new_env)
+    changed_entries = {key for key in old_top_level.keys() | new_top_level.keys()
+                       if old_top_level.get(key) != new_top_level.get(key)
+                       or set(re.findall(r'\$\{?(\w+)', new_top_level.get(key, ""))) & changed_variables}
+    # a changed top-level key other than a volume or network cannot be attributed to single services
+    recreate_all = any(section == '' for section, _ in changed_entries)
+    actions = {service: "stop" for service in old_services.keys() - new_services.keys()}
+    for service, block in new_services.items():
+        if service not in old_services:
+            actions[service] = "start"
+            continue
+        variables = set(re.findall(r'\$\{?(\w+)', block))
+        env_files = set(re.findall(r'^\s*-\s*(env/[\w.-]+)', block, flags=re.MULTILINE))
+        mounts = [mount.rstrip('/') for mount in re.findall(r'^\s*-\s*"?\./([^:"]+):', block, flags=re.MULTILINE)]
+        if (block != old_services[service] or variables & changed_variables or env_files & set(changed_files)
+                or recreate_all or any(uses_compose_entry(block, *entry) for entry in changed_entries)):
+            actions[service] = "recreate"
+        elif any(name == mount or name.startswith(mount + '/') for name in changed_files for mount in mounts):
+            actions[service] = "reload" if service in NGINX_SERVICES else "restart"
+    # services extending a recreated one, e.g. the numbered replicas, get its new config as well
+    for service, block in new_services.items():
+        extended = re.search(r'^\s*extends:\s*\n\s*service:\s*"?([\w.-]+)', block, flags=re.MULTILINE)
+        if extended and actions.get(extended.group(1)) == "recreate" and actions.get(service) != "start":
+            actions[service] = "recreate"
+    return dict(sorted(actions.items()))
+
+
+def apply_commands(affected: dict) -> list:
+    """The docker compose commands applying the changes, to run in the client directory."""
+    commands = []
+    if any(action in ("start", "recreate") for action in affected.values()):
+        commands.append("docker compose up -d")
+    restart = [service for service, action in affected.items() if action == "restart"]
+    if restart:
+        commands.append(f"docker compose restart {' '.join(restart)}")
+    for service in (service for service, action in affected.items() if action == "reload"):
+        commands.append(f"docker compose exec {service} nginx -s reload")
+    stop = [service for service, action in affected.items() if action == "stop"]
+    if stop:
+        commands.append(f"docker compose rm --stop --force {' '.join(stop)}")
+    return commands
+
+# ============================================================================
+# Rendering of a Client Directory
+# ============================================================================
+# Compose overlays merged on top of docker-compose.yml when present in the client directory.
+# docker-compose.override.yml has to be listed as compose only loads it implicitly without COMPOSE_FILE.
+OPTIONAL_COMPOSE_OVERLAYS = (
+    'docker-compose.healthcheck.yml',  # written by startup_analyzer.py
+    'docker-compose.override.yml',  # manual changes of the operator
+)
+# Locally built keycloak image started with --optimized, imports the realm on the first boot only
+KEYCLOAK_OPTIMIZED_OVERLAY = 'docker-compose.keycloak-optimized.yml'
+
+def compose_files(client_dir: Path, overlays: tuple = ()) -> str:
+    """Value of COMPOSE_FILE: the main compose file, the overlays of the chosen options and all present optional overlays."""
+    files = ['docker-compose.yml', *overlays]
+    files += [overlay for overlay in OPTIONAL_COMPOSE_OVERLAYS if (client_dir / overlay).exists()]
+    return os.pathsep.join(files)
+
+PREDEFINED_CONFIGURATIONS = {
+    config.name.lower(): config for config in (FLNET_CONFIG, DAIBETES_CONFIG, MICROBAIOME_CONFIG)
+}
+
+class InstallerAnswers:
+    """
+    All parameters collected by the installer, either interactively via main()
+    or from an answers file via answers_from_dict().
+    A complete instance is everything render_client() needs to initialize a client directory.
+    """
+    def __init__(self):
+        self.exposed_address = None
+        self.exposed_ip_address = None
+        self.client_port = None
+        self.domain_obj = None
+        self.fullchain_file = None
+        self.privkey_file = None
+        self.ecdsa_files = None
+        self.global_domain_obj = None
+        self.global_domain_candidates = []
+        self.reprobe_global_endpoints = False
+        self.global_tcp_port = None
+        self.host = None
+        self.sizing_profile = None
+        self.static_cache = False
+        self.static_cache_brotli = False
+        self.upload_mode = "buffered"
+        self.upload_temp_dir = None
+        self.websocket_idle_timeout = DEFAULT_WEBSOCKET_IDLE_TIMEOUT
+        self.rate_limits = None
+        self.access_log_format = "combined"
+        self.observability = False
+        self.tls_fast_path = False
+        self.resource_limits = True
+        self.replicas = {}
+        self.cohosted_networks = {}
+        self.data_dirs = {}
+        self.orch_data_tmpfs_size = None
+        self.pinned_images = False
+        self.database_mode = "separate"
+        self.database_bulk_import = False
+        self.keycloak_optimized = False
+
+    def ssl_enabled(self) -> bool:
+        """Check if the client does the SSL termination itself."""
+        return self.fullchain_file is not None
+
+
+def write_secret_env_files(env_dir: Path) -> None:
+    """
+    Generate the secrets of all services and write them to env_dir.
+    Existing secret files are kept, as the databases are already initialized with them.
+    """
+    # --- dataimport-secrets ---
+    importer_db_password = gen_secret()
+    importer_db_root_password = gen_secret()
+    importer_secret_key = gen_secret()
+    importer_api_client_secret = gen_secret()
+
+    dataimport_secrets_file = env_dir / 'dataimport-secrets.env'
+    if not write_env_file(
+        dataimport_secrets_file,
+        skip_when_exists=True,
+        MYSQL_PASSWORD=importer_db_password,
+        MYSQL_ROOT_PASSWORD=importer_db_root_password,
+        SQL_PASSWORD=importer_db_password,
+        KEYCLOAK_CLIENT_SECRET_KEY=importer_api_client_secret,
+        SECRET_KEY=importer_secret_key,
+    ):
+        sys.exit(1)
+
+    # --- orch-secrets ---
+    orch_db_password = gen_secret()
+
+    orch_api_secrets_file = env_dir / 'orch-secrets.env'
+    if not write_env_file(
+        orch_api_secrets_file,
+        skip_when_exists=True,
+        POSTGRES_PASSWORD=orch_db_password,
+        QUARKUS_DATASOURCE_PASSWORD=orch_db_password
+    ):
+        sys.exit(1)
+
+    # --- learning-secrets ---
+    learning_db_password = gen_secret()
+    learning_api_client_secret = gen_secret()
+
+    learning_api_secrets_file = env_dir / 'local-learning-secrets.env'
+    if not write_env_file(
+        learning_api_secrets_file,
+        skip_when_exists=True,
+        POSTGRES_PASSWORD=learning_db_password,
+        QUARKUS_DATASOURCE_PASSWORD=learning_db_password,
+        QUARKUS_OIDC_CREDENTIALS_SECRET=learning_api_client_secret,
+        QUARKUS_KEYCLOAK_ADMIN_CLIENT_CLIENT_SECRET=learning_api_client_secret,
+      # see env/local-learning-secrets.env
+    ):
+        sys.exit(1)
+
+    # --- keycloak-secrets ---
+    keycloak_db_password = gen_secret()
+    keycloak_bootstrap_admin_password = gen_secret(16)
+        # Needs to be used by the admin, so we make it a bit shorter and easier to handle
+        # We advise the user to change it after first login anyways!
+
+    keycloak_secrets_file = env_dir / 'keycloak-secrets.env'
+    if not write_env_file(
+        keycloak_secrets_file,
+        skip_when_exists=True,
+        KC_BOOTSTRAP_ADMIN_USERNAME=DEFAULT_KEYCLOAK_BOOTSTRAP_ADMIN_USERNAME,
+        POSTGRES_PASSWORD=keycloak_db_password,
+        KC_DB_PASSWORD=keycloak_db_password,
+        KC_BOOTSTRAP_ADMIN_PASSWORD=keycloak_bootstrap_admin_password,
+        LOCAL_LEARNING_SECRET=learning_api_client_secret,
+        DATA_IMPORTER_SECRET=importer_api_client_secret,
+    ):
+        sys.exit(1)
+
+
+def resolve_endpoint(candidates: list, tcp_port: str, previous_env: dict, reprobe: bool,
+                     prefix: str = 'GLOBAL_ENDPOINT') -> tuple[Domain, dict]:
+    """
+    The fastest of the candidate domains of a platform and the <prefix>* variables of the .env file recording it.
+    The selection of the previous run is kept (so re-runs stay unchanged) unless the candidates changed or reprobe is set.
+    """
+    candidate_list = ",".join(str(candidate) for candidate in candidates)
+    if (not reprobe and previous_env.get(f'{prefix}_CANDIDATES') == candidate_list
+            and previous_env.get(prefix) in candidate_list.split(",")):
+        return Domain(previous_env[prefix]), {prefix + suffix: previous_env.get(prefix + suffix, "")
+                                              for suffix in ENDPOINT_VARIABLE_SUFFIXES}
+    selected, probes = select_global_endpoint(candidates, tcp_port)
+    return selected, {
+        prefix: str(selected),
+        f'{prefix}_CANDIDATES': candidate_list,
+        f'{prefix}_PROBE': ",".join(format_endpoint_probe(probe) for probe in probes),
+        f'{prefix}_PROBED_AT': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def resolve_global_endpoint(answers: InstallerAnswers, previous_env: dict) -> tuple[Domain, dict]:
+    """The platform domain the client connects to and the GLOBAL_ENDPOINT* variables of the .env file (see resolve_endpoint)."""
+    candidates = answers.global_domain_candidates
+    if len(candidates) < 2:
+        return answers.global_domain_obj, {}
+    return resolve_endpoint(candidates, answers.global_tcp_port, previous_env, answers.reprobe_global_endpoints)
+
+
+def resolve_cohosted_endpoints(answers: InstallerAnswers, previous_env: dict) -> tuple[dict, dict]:
+    """
+    The platform domain of every co-hosted network, selected like the one of the client's network, and the
+    <NETWORK>_GLOBAL_ENDPOINT* variables of the .env file. Returns ({network: Domain}, variables).
+    """
+    endpoints, variables = {}, {}
+    for network in answers.cohosted_networks:
+        config = PREDEFINED_CONFIGURATIONS[network]
+        candidates = [Domain(candidate) for candidate in config.candidate_domains]
+        if len(candidates) < 2:
+            endpoints[network] = candidates[0]
+            continue
+        endpoints[network], network_variables = resolve_endpoint(
+            candidates, config.global_tcp_port, previous_env, answers.reprobe_global_endpoints,
+            f"{network.upper()}_GLOBAL_ENDPOINT")
+        variables.update(network_variables)
+    return endpoints, variables
+
+
+def global_settings(global_domain_obj: Domain, global_tcp_port: str) -> dict:
+    """The GLOBAL_* variables of the .env file: the URLs of the global platform of a network."""
+    global_protocol = global_domain_obj.protocol()
+    global_ws_protocol = "wss" if global_protocol == "https" else "ws"
+    global_domain_name = global_domain_obj.domain_name()
+    global_port = global_domain_obj.port()
+
+    # Include port in URLs only if it's non-standard for the protocol
+    global_port_suffix = ""
+    if (global_protocol == "https" and global_port != "443") or (global_protocol == "http" and global_port != "80"):
+        global_port_suffix = f":{global_port}"
+
+    global_base_with_port = f"{global_domain_name}{global_port_suffix}"
+    return {
+        'GLOBAL_BASE_ADDRESS': global_domain_name,
+        'GLOBAL_LEARNING_API_URL': f"{global_protocol}://{global_base_with_port}/api",
+        'GLOBAL_LEARNING_API_WEBSOCKET_URL': f"{global_ws_protocol}://{global_base_with_port}/api",
+        'GLOBAL_SCHEMA_API_URL': f"{global_protocol}://{global_base_with_port}/data-modeler",
+        'GLOBAL_RELAY_HTTP_URL': f"{global_protocol}://{global_base_with_port}/relay",
+        'GLOBAL_RELAY_TCP_ADDRESS': f"{global_domain_name}:{global_tcp_port}",
+    }
+
 
-    def is_default_port(self) -> bool:
-        """Check if the port is the default for the protocol."""
-        if not self.is_valid():
-            return False
-        if self._protocol == 'http' and self._port == "80":
-            return True
-        if self._protocol == 'https' and self._port == "443":
-            return True
-        return False
+def render_client(answers: InstallerAnswers, client_dir: Path) -> dict:
+    """
+    Initialize or update client_dir from the given answers. Everything is rendered into a
+    staging copy first and only the files whose content changed are written back.
 
-    def __str__(self) -> str:
-        """Return the full domain string with protocol and port."""
-        if not self.is_valid():
-            return self._raw_input
+    Returns:
+        A dict describing the rendered deployment (used for the installation summary), including
+        the changed files, the affected services and the commands applying the changes
+    """
+    staging_dir = stage_client_dir(client_dir)
+    try:
+        rendered = render_client_files(answers, staging_dir, client_dir.resolve().name)
+        changed_files = changed_client_files(staging_dir, client_dir)
+        affected = affected_services(client_dir, staging_dir, changed_files)
+        sync_client_dir(staging_dir, client_dir, changed_files)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    rendered.update({
+        "client_dir": str(client_dir),
+        "changed_files": changed_files,
+        "affected_services": affected,
+        "apply_commands": apply_commands(affected),
+    })
+    return rendered
+
+
+def render_client_files(answers: InstallerAnswers, client_dir: Path, client_name: str) -> dict:
+    """
+    Render all files of client_dir from the given answers: generates the secrets in env/,
+    patches the nginx config, writes the database configs, compose overlays and the final .env file.
+    client_name is the name of the deployed client directory, client_dir is the staging copy rendered into.
+    """
+    assert answers.global_domain_obj is not None, "Global domain object should be set at this point. Script error."
+    previous_env = read_env_file(client_dir / '.env')
+    global_domain_obj, endpoint_variables = resolve_global_endpoint(answers, previous_env)
+    cohosted_endpoints, cohosted_endpoint_variables = resolve_cohosted_endpoints(answers, previous_env)
+    env_dir = client_dir / 'env'
+    write_secret_env_files(env_dir)
+    overlays = []
+    if answers.database_mode == "shared":
+        write_shared_postgres_secrets(env_dir)
+        overlays.append(SHARED_POSTGRES_OVERLAY)
+    if answers.keycloak_optimized:
+        overlays.append(KEYCLOAK_OPTIMIZED_OVERLAY)
+    if answers.ssl_enabled() and answers.ecdsa_files:
+        write_tls_overlay(client_dir, answers.ecdsa_files)
+        overlays.append(TLS_OVERLAY)
+    else:
+        (client_dir / TLS_OVERLAY).unlink(missing_ok=True)
+    if any(count > 1 for count in answers.replicas.values()):
+        write_replicas_overlay(client_dir, answers.replicas)
+        overlays.append(REPLICAS_OVERLAY)
+    else:
+        (client_dir / REPLICAS_OVERLAY).unlink(missing_ok=True)
+    image_lock = read_image_lock(client_dir / IMAGES_LOCK_FILE) if answers.pinned_images else None
+    if answers.cohosted_networks:
+        write_cohosted_overlay(client_dir, answers.cohosted_networks, cohosted_endpoints, answers.database_mode,
+                               answers.replicas, image_lock)
+        overlays.append(COHOSTED_OVERLAY)
+    else:
+        (client_dir / COHOSTED_OVERLAY).unlink(missing_ok=True)
+    if answers.resource_limits:
+        write_resources_overlay(client_dir, answers.host, answers.sizing_profile, answers.database_mode, answers.replicas,
+                                answers.cohosted_networks)
+        overlays.append(RESOURCES_OVERLAY)
+    else:
+        (client_dir / RESOURCES_OVERLAY).unlink(missing_ok=True)
+    if answers.data_dirs or answers.orch_data_tmpfs_size:
+        write_storage_overlay(client_dir, client_name, answers.data_dirs, answers.orch_data_tmpfs_size, answers.database_mode)
+        overlays.append(STORAGE_OVERLAY)
+    else:
+        (client_dir / STORAGE_OVERLAY).unlink(missing_ok=True)
+    frontend_image = GLOBAL_DOMAIN_TO_IMAGE.get(str(global_domain_obj), DEFAULT_FRONTEND_IMAGE)
+    if answers.pinned_images:
+        frontend_image = pinned_image(image_lock, frontend_image)
+        write_images_overlay(client_dir, image_lock, overlays, answers.replicas, answers.cohosted_networks)
+        # last, so the pinned digests win over the images of the other overlays
+        overlays.append(IMAGES_OVERLAY)
+    else:
+        (client_dir / IMAGES_OVERLAY).unlink(missing_ok=True)
 
-        if self._port is None:
-            self._port = "80" if self._protocol == 'http' else "443"
+    # Set the complete domain with protocol and port as well as the bare domain
+    # bare domain is required as ALLOWED_HOSTS in Django
+    # as well as server_name in nginx
+    # we set this in nginx via patching the nginx.conf
+    if answers.domain_obj is not None:
+        deployed_on_address = str(answers.domain_obj)
+        deployed_on_domain = answers.domain_obj.domain_name()
+    else:
+        # No domain - use exposed address with http
+        port_suffix = f":{answers.client_port}" if answers.client_port != "80" else ""
+        deployed_on_address = f"http://{answers.exposed_address}{port_suffix}"
+        deployed_on_domain = answers.exposed_address
+
+    compose_profiles = "ssl" if answers.ssl_enabled() else "no-ssl"
+    if answers.observability:
+        compose_profiles += ",observability"
+        write_exporter_secrets(env_dir, answers.database_mode)
+        write_prometheus_config(client_dir, answers.database_mode)
+    nginx_conf_path = client_dir / 'nginx.conf'
+    patch_nginx_server_name(nginx_conf_path, " ".join(
+        [str(deployed_on_domain)] + [network_domain.domain_name() for network_domain in answers.cohosted_networks.values()]))
+    patch_nginx_performance(client_dir, answers.sizing_profile, answers.host)
+    patch_nginx_replicas(client_dir, answers.replicas)
+    patch_nginx_cohosted(client_dir, answers.cohosted_networks, answers.sizing_profile, answers.replicas)
+    patch_nginx_static_cache(client_dir, answers.static_cache, answers.static_cache_brotli)
+    patch_nginx_upload_mode(client_dir, answers.upload_mode, answers.upload_temp_dir is not None)
+    patch_nginx_websocket_timeout(client_dir, answers.websocket_idle_timeout)
+    patch_nginx_rate_limits(client_dir, answers.rate_limits)
+    patch_nginx_access_log(client_dir, answers.access_log_format)
+    patch_nginx_observability(client_dir, answers.observability)
+    tls_fast_path = answers.tls_fast_path and answers.ssl_enabled()
+    patch_nginx_tls(client_dir, tls_fast_path, tls_fast_path and not tls_stapling_warnings(answers.fullchain_file),
+                    answers.ssl_enabled() and answers.ecdsa_files is not None)
+    write_postgres_configs(client_dir, answers.host)
+    write_mariadb_configs(client_dir, answers.host, answers.database_bulk_import)
+    if not write_env_file(
+        client_dir / '.env',
+        comments={
+            'DEPLOYED_ON_ADDRESS': 'WARNING: Changing DEPLOYED_ON_ADDRESS or DEPLOYED_ON_DOMAIN here will NOT update the nginx server_name. Re-run the installer to regenerate nginx.conf with the new domain.',
+        },
+        skip_when_exists=False,
+        EXPOSED_IP_ADDRESS=answers.exposed_ip_address,
+            # IP address for docker binding (docker doesn't understand 'localhost')
+        EXPOSED_PORT=answers.client_port,
+        DEPLOYED_ON_ADDRESS=deployed_on_address,
+        DEPLOYED_ON_DOMAIN=deployed_on_domain,
+        **global_settings(global_domain_obj, answers.global_tcp_port),
+        **endpoint_variables,
+            # the measurements of the equivalent platform endpoints, the fastest is GLOBAL_ENDPOINT
+        **cohosted_endpoint_variables,
+            # the same for the co-hosted networks, rendered into docker-compose.networks.yml
+        COMPOSE_PROFILES=compose_profiles,
+        COMPOSE_FILE=compose_files(client_dir, tuple(overlays)),
+        SSL_CERT_PUBLIC_KEY=str(answers.fullchain_file) if answers.fullchain_file else "dummyfile",
+        SSL_CERT_PRIVATE_KEY=str(answers.privkey_file) if answers.privkey_file else "dummyfile",
+        FRONTEND_IMAGE=frontend_image,
+        UPLOAD_TEMP_DIR=str(answers.upload_temp_dir) if answers.upload_temp_dir else DEFAULT_UPLOAD_TEMP_DIR,
+            # host folder for temporary files of buffered uploads, the docker volume is unused by default
+        KEYCLOAK_METRICS_ENABLED="true" if answers.observability else "false",
+            # part of the observability profile, a build option of the optimized keycloak image
+        SIZING_PROFILE=answers.sizing_profile.name,
+            # informational, the profile is rendered into the config files by the installer
+    ):
+        sys.exit(1)
 
-        # Only show port if it's non-standard
-        default_port = "443" if self._protocol == 'https' else "80"
-        result = f"{self._protocol}://{self._domain_name}"
-        if self._port != default_port:
-            result += f":{self._port}"
+    # Read back the admin password, the secrets file might stem from a previous run
+    keycloak_secrets = read_env_file(env_dir / 'keycloak-secrets.env')
+    return {
+        "client_dir": str(client_dir),
+        "deployed_on_address": deployed_on_address,
+        "deployed_on_domain": deployed_on_domain,
+        "compose_profiles": compose_profiles,
+        "sizing_profile": answers.sizing_profile.name,
+        "global_endpoint": str(global_domain_obj),
+        "global_endpoint_probe": endpoint_variables.get('GLOBAL_ENDPOINT_PROBE'),
+        "database_mode": answers.database_mode,
+        "database_bulk_import": answers.database_bulk_import,
+        "keycloak_optimized": answers.keycloak_optimized,
+        "tls_fast_path": answers.tls_fast_path,
+        "replicas": {service: answers.replicas.get(service, 1) for service in REPLICATED_SERVICES},
+        "cohosted_networks": {network: str(network_domain) for network, network_domain in answers.cohosted_networks.items()},
+        "cohosted_global_endpoints": {network: str(endpoint) for network, endpoint in cohosted_endpoints.items()},
+        "pinned_images": answers.pinned_images,
+        "keycloak_admin_username": keycloak_secrets.get('KC_BOOTSTRAP_ADMIN_USERNAME', DEFAULT_KEYCLOAK_BOOTSTRAP_ADMIN_USERNAME),
+        "keycloak_admin_password": keycloak_secrets.get('KC_BOOTSTRAP_ADMIN_PASSWORD'),
+    }
 
-        return result
+# ============================================================================
+# Headless (Answers File) Mode
+# ============================================================================
+# Files and folders of FLNET_CLIENT_DIR that are copied to a new client directory (see stage_client_dir).
+# The deployment specific files (env/, .env) are generated by render_client.
+CLIENT_TEMPLATE_IGNORE = shutil.ignore_patterns('env', '.env')
 
-def patch_nginx_server_name(nginx_conf_path: Path, server_name: str) -> None:
+
+def answers_from_dict(data: dict, base_dir: Path) -> tuple[InstallerAnswers, list[str]]:
     """
-    Replace the server_name directive in the main server block of nginx.conf.
-    Uses the first server_name occurrence (the main block precedes the catch-all).
-    Works both for the initial placeholder (${NGINX_HOST}) and on re-runs where
-    a real domain is already present.
+    Build and validate InstallerAnswers from one site of an answers file.
+    Applies the same defaults and checks as the interactive installer. Interactive
+    confirmations become errors unless explicitly allowed, "Press Enter" warnings
+    are returned as a list of strings.
+
+    Keys:
+        network: flnet, daibetes, microbaiome or own
+        global_domain, global_tcp_port: only for network 'own' (optional, defaults as in the interactive mode)
+        reprobe_global_endpoints: measure the equivalent platform domains of the network again on a re-run and
+            switch to the fastest (default false, the first run selects one and re-runs keep it)
+        exposed_address: IPv4 address or localhost (default 127.0.0.1)
+        port: port to listen on (default 80 on localhost, otherwise 443)
+        domain: optional domain with protocol, e.g. https://example.com
+        ssl_folder: optional folder containing fullchain.pem and privkey.pem, relative paths are relative to the answers file,
+            and optionally an ECDSA certificate as fullchain-ecdsa.pem and privkey-ecdsa.pem
+        allow_unencrypted: must be true to deploy an http:// domain
+        sizing_profile: auto (default), small, medium or large
+        host_cores, host_memory_gb: the host the site is sized for (default: detected on this machine for 'auto',
+            the minimum host of the profile otherwise)
+        host_storage: ssd (default) or hdd, the disk of the databases on the host given by host_cores/host_memory_gb
+        preflight: measure this machine first (disk speed of the docker root, connect latency to the relay and
+            platform of the network), the measured cores and memory are used for 'auto' and recommend the database_mode,
+            the disk measurements only produce warnings (default false)
+        static_cache: cache and compress static assets in the reverse proxy (default false)
+        static_cache_brotli: additionally compress with brotli, the nginx image must ship the brotli module (default false)
+        upload_mode: buffered (default) or streaming uploads to the importer
+        upload_temp_dir: optional host folder for temporary upload files, handed to the nginx user (UID 65532) of the
+            proxy (default: inside the proxy container)
+        websocket_idle_timeout: seconds a websocket of the learning API may stay silent (default 3600, at least 60)
+        rate_limits: limit requests and connections per client address, rejected requests get a 429 (default false),
+            true enables the defaults, a dict enables them with single limits overridden, e.g. {"login": "5r/s", "uploads": 2},
+            classes: login, auth, importer, learning, frontend (a rate or {"rate": ..., "burst": ...}), connections, uploads
+        access_log_format: combined (default) or detailed_debug (request/upstream timings for access_log_analyzer.py)
+        observability: enable the observability compose profile (exporters and a local prometheus, default false)
+        tls_fast_path: HTTP/2, session tickets, small TLS records and OCSP stapling for an ssl_folder (default false)
+        database_mode: separate (default, one postgres server per service) or shared (one postgres server for all),
+            the default follows the preflight recommendation if 'preflight' is set
+        database_bulk_import: enable the bulk-import profile of dataimport-db for initial data loads (default false)
+        keycloak_optimized: use a locally built keycloak image started with --optimized (default false)
+        resource_limits: limit CPU, memory and processes of every service for the host (default true)
+        replicas: optional number of containers per API service, e.g. {"dataimporter-api": 2},
+            services: dataimporter-api, local-learning-api (default 1 each)
+        cohosted_networks: optional further predefined networks joined by this client with their own domain,
+            e.g. {"daibetes": "https://daibetes.example.com"} (requires 'domain', same protocol and port)
+        data_dirs: optional data directory per volume class, e.g. {"databases": "/nvme/flnet"},
+            classes: databases, imported_files, orch_data (relative paths are relative to the answers file)
+        orch_data_tmpfs_size: optional size of an in-memory orch-data, e.g. 4g (excludes data_dirs.orch_data)
+        pinned_images: pin the images to the digests of FLNet_client/images.lock.json with pull_policy: missing
+            (default true if the lock file exists)
+
+    Raises:
+        ValueError: if the answers are invalid
     """
-    content = nginx_conf_path.read_text()
-    # Check if the pattern exists before attempting substitution
-    pattern = r'^(\s*server_name\s+).*?;\s*$'
-    if not re.search(pattern, content, flags=re.MULTILINE):
-        print(f"Warning: Could not find server_name directive in '{nginx_conf_path}'. nginx may not use the correct hostname.")
-        return
+    answers = InstallerAnswers()
+    warnings = []
+
+    # network
+    network = str(data.get("network", "")).strip().lower()
+    if network not in ("flnet", "daibetes", "microbaiome", "own"):
+        raise ValueError("'network' must be one of 'flnet', 'daibetes', 'microbaiome' or 'own'.")
+    if network == "own":
+        global_domain_obj = Domain(str(data.get("global_domain", DEFAULT_FULL_GLOBAL_ADDRESS)))
+        if not global_domain_obj.is_valid():
+            raise ValueError(f"'global_domain' '{data.get('global_domain')}' is not a valid domain with protocol.")
+        global_tcp_port = str(data.get("global_tcp_port", DEFAULT_PLATFORM_TCP_PORT))
+        if not validate_port(global_tcp_port):
+            raise ValueError(f"'global_tcp_port' '{global_tcp_port}' is not a valid port.")
+        answers.global_domain_obj = global_domain_obj
+        answers.global_tcp_port = global_tcp_port
+    else:
+        config = PREDEFINED_CONFIGURATIONS[network]
+        answers.global_domain_obj = Domain(config.global_domain)
+        answers.global_domain_candidates = [Domain(candidate) for candidate in config.candidate_domains]
+        answers.global_tcp_port = config.global_tcp_port
+    answers.reprobe_global_endpoints = bool(data.get("reprobe_global_endpoints", False))
+
+    # exposed address and port
+    exposed_address = str(data.get("exposed_address", "")).strip().lower()
+    if not exposed_address or exposed_address == "127.0.0.1":
+        exposed_address = "localhost"
+    if not (validate_ip_address(exposed_address) or exposed_address == "localhost"):
+        raise ValueError(f"'exposed_address' '{exposed_address}' is not a valid IPv4 address.")
+    answers.exposed_address = exposed_address
+    answers.exposed_ip_address = "127.0.0.1" if exposed_address == "localhost" else exposed_address
+    client_port = str(data.get("port", "80" if exposed_address == "localhost" else "443")).strip()
+    if not validate_port(client_port):
+        raise ValueError(f"'port' '{client_port}' is not valid. Please use a number between 1 and 65535.")
+    answers.client_port = client_port
+
+    # domain and ssl
+    domain_input = str(data.get("domain") or "").strip()
+    if domain_input:
+        domain_obj = Domain(domain_input)
+        if not domain_obj.protocol_is_valid():
+            raise ValueError("'domain' must specify a protocol (http:// or https://).")
+        if not domain_obj.domain_is_valid():
+            raise ValueError(f"'domain' '{domain_input}' is not a valid domain name.")
+        if not domain_obj.port_is_valid():
+            raise ValueError(f"The port '{domain_obj.port()}' of 'domain' is not valid.")
+        answers.domain_obj = domain_obj
+
+    ssl_folder = data.get("ssl_folder")
+    if ssl_folder:
+        if answers.domain_obj is None:
+            raise ValueError("'ssl_folder' requires a 'domain'.")
+        ssl_path = (base_dir / ssl_folder).resolve()
+        if not ssl_path.is_dir():
+            raise ValueError(f"The ssl_folder '{ssl_folder}' does not exist.")
+        fullchain_file = ssl_path / 'fullchain.pem'
+        privkey_file = ssl_path / 'privkey.pem'
+        if not fullchain_file.exists() or not privkey_file.exists():
+            raise ValueError(f"Required files fullchain.pem and privkey.pem not found in '{ssl_folder}'.")
+        answers.fullchain_file = fullchain_file
+        answers.privkey_file = privkey_file
+        answers.ecdsa_files = detect_ecdsa_certificate(ssl_path)
+
+    # sizing
+    sizing_profile = str(data.get("sizing_profile", "auto")).strip().lower()
+    if sizing_profile != "auto" and sizing_profile not in SIZING_PROFILES:
+        raise ValueError(f"'sizing_profile' must be one of 'auto', {', '.join(repr(name) for name in SIZING_PROFILES)}.")
+    if "host_cores" in data or "host_memory_gb" in data:
+        try:
+            answers.host = HostResources(int(data["host_cores"]), int(float(data["host_memory_gb"]) * 1024))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("'host_cores' and 'host_memory_gb' must both be given as numbers.")
+        host_storage = str(data.get("host_storage", "ssd")).strip().lower()
+        if host_storage not in ("ssd", "hdd"):
+            raise ValueError("'host_storage' must be 'ssd' or 'hdd'.")
+        answers.host.ssd = host_storage == "ssd"
+    preflight_report = None
+    if data.get("preflight", False):
+        if answers.host is not None:
+            raise ValueError("'preflight' measures this machine, it excludes 'host_cores' and 'host_memory_gb'.")
+        preflight_report = run_preflight(*network_addresses(answers.global_domain_obj, answers.global_tcp_port))
+        warnings += preflight_warnings(preflight_report)
+        answers.host = preflight_report["host"]
+    if sizing_profile == "auto":
+        answers.host = answers.host or detect_host_resources()
+        answers.sizing_profile = select_sizing_profile(answers.host)
+    else:
+        answers.sizing_profile = SIZING_PROFILES[sizing_profile]
+        answers.host = answers.host or answers.sizing_profile.reference_host()
+
+    default_database_mode = preflight_report["database_mode"] if preflight_report else "separate"
+    answers.database_mode = str(data.get("database_mode", default_database_mode)).strip().lower()
+    if answers.database_mode not in DATABASE_MODES:
+        raise ValueError(f"'database_mode' must be one of {', '.join(repr(mode) for mode in DATABASE_MODES)}.")
+    answers.database_bulk_import = bool(data.get("database_bulk_import", False))
+    answers.keycloak_optimized = bool(data.get("keycloak_optimized", False))
+    answers.resource_limits = bool(data.get("resource_limits", True))
+    replicas = data.get("replicas") or {}
+    if not isinstance(replicas, dict):
+        raise ValueError("'replicas' must map service names to replica counts.")
+    warnings += validate_replicas(replicas, answers.host)
+    answers.replicas = dict(replicas)
+
+    # storage placement
+    data_dirs = data.get("data_dirs") or {}
+    if not isinstance(data_dirs, dict):
+        raise ValueError("'data_dirs' must map volume classes to directories.")
+    for class_name, data_dir in data_dirs.items():
+        if class_name not in VOLUME_CLASSES:
+            raise ValueError(f"Unknown volume class '{class_name}' in 'data_dirs', use {', '.join(repr(name) for name in VOLUME_CLASSES)}.")
+        answers.data_dirs[class_name] = (base_dir / Path(data_dir).expanduser()).resolve()
+        warnings += validate_data_dir(answers.data_dirs[class_name], VOLUME_CLASSES[class_name])
+    if data.get("orch_data_tmpfs_size"):
+        if ORCH_DATA_VOLUMES.name in answers.data_dirs:
+            raise ValueError("'orch_data_tmpfs_size' and a data directory for 'orch_data' exclude each other.")
+        answers.orch_data_tmpfs_size = str(data["orch_data_tmpfs_size"]).strip().lower()
+        warnings += validate_tmpfs_size(answers.orch_data_tmpfs_size, answers.host)
+
+    # pinned images
+    image_lock_exists = (FLNET_CLIENT_DIR / IMAGES_LOCK_FILE).exists()
+    answers.pinned_images = bool(data.get("pinned_images", image_lock_exists))
+    if answers.pinned_images and not image_lock_exists:
+        raise ValueError(f"'pinned_images' requires {FLNET_CLIENT_DIR / IMAGES_LOCK_FILE}, create it with image_bundle.py lock.")
+
+    # reverse proxy features
+    answers.static_cache = bool(data.get("static_cache", False))
+    answers.static_cache_brotli = bool(data.get("static_cache_brotli", False))
+    if answers.static_cache_brotli and not answers.static_cache:
+        raise ValueError("'static_cache_brotli' requires 'static_cache'.")
+    answers.upload_mode = str(data.get("upload_mode", "buffered")).strip().lower()
+    if answers.upload_mode not in UPLOAD_MODES:
+        raise ValueError(f"'upload_mode' must be one of {', '.join(repr(mode) for mode in UPLOAD_MODES)}.")
+    if data.get("upload_temp_dir"):
+        upload_temp_dir = (base_dir / data["upload_temp_dir"]).resolve()
+        if not upload_temp_dir.is_dir():
+            raise ValueError(f"The upload_temp_dir '{data['upload_temp_dir']}' does not exist.")
+        answers.upload_temp_dir = upload_temp_dir
+        warnings += prepare_upload_temp_dir(upload_temp_dir)
+    try:
+        answers.websocket_idle_timeout = int(data.get("websocket_idle_timeout", DEFAULT_WEBSOCKET_IDLE_TIMEOUT))
+    except (TypeError, ValueError):
+        raise ValueError("'websocket_idle_timeout' must be a number of seconds.")
+    if answers.websocket_idle_timeout < MIN_WEBSOCKET_IDLE_TIMEOUT:
+        raise ValueError(f"'websocket_idle_timeout' must be at least {MIN_WEBSOCKET_IDLE_TIMEOUT} seconds.")
+    answers.rate_limits = parse_rate_limits(data.get("rate_limits", False))
+    answers.access_log_format = str(data.get("access_log_format", "combined")).strip().lower()
+    if answers.access_log_format not in ACCESS_LOG_FORMATS:
+        raise ValueError(f"'access_log_format' must be one of {', '.join(repr(name) for name in ACCESS_LOG_FORMATS)}.")
+    answers.observability = bool(data.get("observability", False))
+    answers.tls_fast_path = bool(data.get("tls_fast_path", False))
+    if answers.tls_fast_path and not answers.ssl_enabled():
+        warnings.append("'tls_fast_path' only applies with an 'ssl_folder', ignoring it.")
+        answers.tls_fast_path = False
+    if answers.tls_fast_path:
+        warnings += tls_stapling_warnings(answers.fullchain_file)
+
+    # the same checks as the warnings of the interactive mode
+    domain_obj = answers.domain_obj
+    if domain_obj is not None and domain_obj.protocol() != 'https' and not data.get("allow_unencrypted", False):
+        raise ValueError("'domain' uses HTTP, communication would be unencrypted. Set 'allow_unencrypted' to true to deploy anyways.")
+    if exposed_address != "localhost" and not answers.ssl_enabled():
+        warnings.append("The client is exposed to a non localhost IP without SSL encryption.")
+    if domain_obj is not None and domain_obj.protocol() == 'https' and not answers.ssl_enabled():
+        warnings.append("HTTPS domain without SSL certificates, an external reverse proxy must do the SSL termination.")
+    if domain_obj is not None and exposed_address == "localhost":
+        warnings.append(f"A domain is set but the client only listens on localhost, traffic from {domain_obj} must be forwarded to localhost:{client_port}.")
+    if domain_obj is not None and domain_obj.port() != client_port:
+        warnings.append(f"Port mismatch, the domain receives traffic on port {domain_obj.port()} but the client listens on port {client_port}.")
+
+    # co-hosted networks
+    cohosted_networks = data.get("cohosted_networks") or {}
+    if not isinstance(cohosted_networks, dict):
+        raise ValueError("'cohosted_networks' must map network names to domains.")
+    answers.cohosted_networks = {str(network).strip().lower(): Domain(str(network_domain))
+                                 for network, network_domain in cohosted_networks.items()}
+    warnings += validate_cohosted_networks(answers.cohosted_networks, domain_obj, answers.global_domain_obj,
+                                           answers.fullchain_file)
+    return answers, warnings
+
+
+def load_answers(answers_path: Path) -> list[tuple[str, dict, Path]]:
+    """
+    Load the sites of an answers file or folder.
+    A file contains either one site (JSON object) or a list of sites, a folder
+    contains one site per *.json file.
 
-    new_content = re.sub(
-        pattern,
-        rf'\g<1>{server_name};',
-        content,
-        count=1,
-        flags=re.MULTILINE
-    )
-    nginx_conf_path.write_text(new_content)
+    Returns:
+        List of (site name, site answers, folder relative paths are resolved against)
+    """
+    if answers_path.is_dir():
+        files = sorted(answers_path.glob('*.json'))
+    else:
+        files = [answers_path]
+
+    sites = []
+    for file in files:
+        data = json.loads(file.read_text())
+        entries = data if isinstance(data, list) else [data]
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                raise ValueError(f"Every site in '{file}' must be a JSON object.")
+            default_name = file.stem if len(entries) == 1 else f"{file.stem}-{index + 1}"
+            sites.append((str(entry.get("name", default_name)), entry, file.parent.resolve()))
+    return sites
+
+
+def provision_site(name: str, data: dict, base_dir: Path, output_root: Optional[Path], single_site: bool) -> dict:
+    """Validate and render a single site of an answers file. Never raises, errors are part of the result."""
+    result = {"name": name, "status": "error", "warnings": []}
+    try:
+        answers, result["warnings"] = answers_from_dict(data, base_dir)
+        if data.get("output_dir"):
+            client_dir = base_dir / data["output_dir"]
+        elif output_root is not None:
+            client_dir = output_root / name
+        elif single_site:
+            client_dir = FLNET_CLIENT_DIR
+        else:
+            raise ValueError("Provisioning several sites requires 'output_dir' per site or --output-root.")
+        rendered = render_client(answers, client_dir.resolve())
+        # the summary may end up in logs, the password stays in the secrets file
+        rendered.pop("keycloak_admin_password")
+        result.update(rendered)
+        result["status"] = "ok"
+    except (ValueError, OSError) as e:
+        result["error"] = str(e)
+    except Exception as e:
+        # e.g. a KeyError of an incomplete env/ folder or a failed docker command, one site must not abort the others
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
 
 
-def validate_port(port_str: str) -> bool:
-    """Validate that port is a number between 1 and 65535."""
-    try:
-        port = int(port_str)
-        return 1 <= port <= 65535
-    except ValueError:
-        return False
+def run_headless(answers_path: Path, output_root: Optional[Path], jobs: Optional[int],
+                 prefetch: bool = False, pull_jobs: int = DEFAULT_PULL_JOBS, docker: str = "docker") -> int:
+    """
+    Provision all sites of an answers file/folder concurrently without any prompts,
+    optionally pre-fetching the images of all provisioned sites afterwards.
+    Progress messages go to stderr, a JSON summary is printed to stdout.
 
-def validate_ip_address(ip: str) -> bool:
-    """Validate IPv4 address format."""
-    pattern = re.compile(r'^(((?!25?[6-9])[12]\d|[1-9])?\d\.?\b){4}$')
-        # https://stackoverflow.com/questions/5284147/validating-ipv4-addresses-with-regexp
-        # smelly nerds and their smelly regexes
-    if not pattern.match(ip):
-        return False
-    parts = ip.split('.')
-    for part in parts:
-        if not 0 <= int(part) <= 255:
-            return False
-    return True
+    Returns:
+        The exit code: 0 if all sites were provisioned, 1 otherwise
+    """
+    start = time.monotonic()
+    sites = load_answers(answers_path)
+    names = [name for name, _, _ in sites]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Site names must be unique, duplicates: {', '.join(duplicates)}")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(
+                lambda site: provision_site(*site, output_root=output_root, single_site=len(sites) == 1),
+                sites,
+            ))
+
+        prefetched = None
+        client_dirs = [Path(result["client_dir"]) for result in results if result["status"] == "ok"]
+        if prefetch and client_dirs:
+            prefetched = prefetch_client_images(docker, client_dirs, pull_jobs)
+
+    failed = sum(1 for result in results if result["status"] != "ok")
+    summary = {
+        "sites": results,
+        "provisioned": len(results) - failed,
+        "failed": failed,
+        "elapsed_seconds": round(time.monotonic() - start, 3),
+    }
+    if prefetched is not None:
+        summary["prefetch"] = prefetched
+    print(json.dumps(summary, indent=2))
+    return 1 if failed or (prefetched and (prefetched["failed"] or "error" in prefetched)) else 0
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """Parse the command line arguments of the installer."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=Path,
+                        help="Run without prompts using a JSON answers file, or a folder with one JSON file per site.")
+    parser.add_argument("--output-root", type=Path,
+                        help="Headless mode: create each site's client directory as <output-root>/<site name>.")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Headless mode: number of sites rendered concurrently.")
+    parser.add_argument("--prefetch-images", action="store_true",
+                        help="Pull all images of the configured client(s) after rendering, without asking.")
+    parser.add_argument("--prefetch-only", action="store_true",
+                        help=f"Only pull the images of the already initialized {FLNET_CLIENT_DIR.name}, "
+                             "e.g. to resume an interrupted pre-fetch.")
+    parser.add_argument("--pull-jobs", type=int, default=DEFAULT_PULL_JOBS,
+                        help=f"Number of concurrent image pulls (default {DEFAULT_PULL_JOBS}).")
+    parser.add_argument("--docker", default="docker", help="docker CLI to use, e.g. a stand-in script for testing.")
+    parser.add_argument("--reprobe-endpoints", action="store_true",
+                        help="Interactive mode: measure the equivalent platform domains of the network again and switch "
+                             "to the fastest, a re-run keeps the previous selection otherwise (answers files: "
+                             "reprobe_global_endpoints).")
+    parser.add_argument("--preflight", action="store_true",
+                        help="Only measure this host (cores, memory, disk, network) and recommend a sizing profile. "
+                             "Exits with 1 if the host has problems.")
+    parser.add_argument("--relay-address", metavar="HOST:PORT",
+                        help="Preflight: relay to measure the connect latency to (default: GLOBAL_RELAY_TCP_ADDRESS of "
+                             f"the initialized {FLNET_CLIENT_DIR.name}, otherwise the FLNet relay).")
+    parser.add_argument("--data-root", type=Path, default=DOCKER_DATA_ROOT,
+                        help=f"Preflight: folder whose disk is measured (default {DOCKER_DATA_ROOT}).")
+    return parser.parse_args(argv)
+
+
+def run_preflight_only(relay_address: Optional[str], data_root: Path) -> int:
+    """The --preflight mode: measure this host against the relay of the initialized client, print the report."""
+    platform_address = None
+    if relay_address is None:
+        env = read_env_file(FLNET_CLIENT_DIR / '.env') if (FLNET_CLIENT_DIR / '.env').exists() else {}
+        relay_address = env.get('GLOBAL_RELAY_TCP_ADDRESS', f"{DEFAULT_PLATFORM_ADDRESS}:{DEFAULT_PLATFORM_TCP_PORT}")
+        platform_address = (env.get('GLOBAL_BASE_ADDRESS', DEFAULT_PLATFORM_ADDRESS), 443)
+    print("Measuring this host, this takes a few seconds...\n")
+    report = run_preflight(parse_host_port(relay_address), platform_address, data_root)
+    print_preflight_report(report)
+    warnings = preflight_warnings(report)
+    for warning in warnings:
+        print(f"WARNING: {warning}")
+    return 1 if warnings else 0
 
 # ============================================================================
 # Main Installation Logic
 # ============================================================================
 
-def main():
+def main(argv: Optional[list] = None):
     """Main installation/initialization workflow."""
+    args = parse_args(argv)
+    if args.answers:
+        sys.exit(run_headless(args.answers, args.output_root, args.jobs, args.prefetch_images, args.pull_jobs, args.docker))
+    if args.prefetch_only:
+        prefetched = prefetch_client_images(args.docker, [FLNET_CLIENT_DIR], args.pull_jobs)
+        sys.exit(1 if prefetched["failed"] or "error" in prefetched else 0)
+    if args.preflight:
+        sys.exit(run_preflight_only(args.relay_address, args.data_root))
+
     print("Starting the initialization of a FLNet Client...\n")
     # All variables that will be set
     exposed_address = None
@@ -297,12 +3068,14 @@ def main():
     ssl_path = None
     fullchain_file = None
     privkey_file = None
+    ecdsa_files = None
     global_domain_obj = None
+    global_domain_candidates = []
     global_tcp_port = None
     # ========================================================================
     # 0. Preconfiguration: Ask if user wants to use an already defined
     # configuration or do a fresh setup.
-    # vars: global_domain_obj, global_tcp_port (indirectly frontend image)
+    # vars: global_domain_obj, global_domain_candidates, global_tcp_port (indirectly frontend image)
     # ========================================================================
     print("An FLNet Client is part of a network allowing privacy preserving federated learning across multiple organizations.")
     print("Do you want to join a preexisting network?")
@@ -319,8 +3092,11 @@ def main():
             for config in (FLNET_CONFIG, DAIBETES_CONFIG, MICROBAIOME_CONFIG):
                 if normalized_input == config.name.lower():
                     global_domain_obj = Domain(config.global_domain)
+                    global_domain_candidates = [Domain(candidate) for candidate in config.candidate_domains]
                     global_tcp_port = config.global_tcp_port
                     print(f"Joining the '{config.name}' network with global domain '{config.global_domain}' and TCP port '{config.global_tcp_port}'.")
+                    if len(config.candidate_domains) > 1:
+                        print(f"The fastest of its equivalent domains ({', '.join(config.candidate_domains)}) is selected when the client is rendered.")
                     print(f"The installer will use the predefined frontend image '{config.frontend_image}' for this configuration.")
                     break
             break # predefined config selected
@@ -362,7 +3138,7 @@ def main():
 
     # ========================================================================
     # 2. Domain configuration including SSL
-    # vars: domain_name, host_port, ssl_folder, fullchain_file, privkey_file
+    # vars: domain_name, host_port, ssl_folder, fullchain_file, privkey_file, ecdsa_files
     # ========================================================================
     # Domain Name and host port retrieval loop
     print("You can optionally set the domain you are using for your FLNet Client.")
@@ -424,8 +3200,15 @@ def main():
         if not fullchain_file.exists() or not privkey_file.exists():
             print(f"ERROR: Required files fullchain.pem and privkey.pem not found in '{ssl_folder}'.")
             continue
+        try:
+            ecdsa_files = detect_ecdsa_certificate(ssl_path)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            continue
         # success
         print(f"SSL certificate files found in '{ssl_folder}'.")
+        if ecdsa_files:
+            print(f"The ECDSA certificate {ECDSA_FULLCHAIN_FILE} is served in addition to fullchain.pem.")
         print("✓ SSL configuration completed.")
         print("WARNING:")
         print("  The deployment does NOT take care of certification renewal and does NOT automatically reload the certificates on renewal.")
@@ -522,7 +3305,7 @@ def main():
         while True:
             global_domain_input = input(f"Enter the FLNet platform address with protocol (e.g., 'https://platform.example.com'). Press Enter for default ({DEFAULT_FULL_GLOBAL_ADDRESS}): ").strip()
             if not global_domain_input:
-                global_domain_input = DEFAULT_FULL_GLOBAL_ADDRESS
+                global_domain_obj = Domain(DEFAULT_FULL_GLOBAL_ADDRESS)
                 break
 
             temp_global_domain_obj = Domain(global_domain_input)
@@ -553,135 +3336,310 @@ def main():
                 print(f"The port '{global_tcp_port}' is not valid. Please enter a number between 1 and 65535.")
     print()
     assert global_domain_obj is not None, "Global domain object should be set at this point. Script error."
+
     # ========================================================================
-    # 4. Generate Secrets
+    # 3a. Co-hosted networks
+    # vars: cohosted_networks
     # ========================================================================
-    print("Securely generating database secrets...\n")
-    # --- dataimport-secrets ---
-    importer_db_password = gen_secret()
-    importer_db_root_password = gen_secret()
-    importer_secret_key = gen_secret()
-    importer_api_client_secret = gen_secret()
+    cohosted_networks = {}
+    if domain_obj is not None:
+        print("This client can join further predefined networks next to this one. They share the reverse proxy,")
+        print("Keycloak and the database servers, only their learning API, controller and frontend run once per network.")
+        print(f"Each network needs its own domain (e.g. a subdomain) pointing to this host, using {domain_obj.protocol()} and port {domain_obj.port()}.")
+        for network, config in PREDEFINED_CONFIGURATIONS.items():
+            if str(global_domain_obj) in config.candidate_domains or len(cohosted_networks) >= MAX_COHOSTED_NETWORKS:
+                continue
+            if not ask_yes_no(f"Do you also want to join the '{config.name}' network? (y/n, default n): ", default=False):
+                continue
+            while True:
+                network_domain = Domain(input(f"Enter the domain of the '{config.name}' network on this client with protocol (e.g. {domain_obj.protocol()}://{network}.{domain_obj.domain_name()}): ").strip())
+                try:
+                    validate_cohosted_networks({**cohosted_networks, network: network_domain}, domain_obj, global_domain_obj, None)
+                except ValueError as e:
+                    print(f"ERROR: {e}")
+                    continue
+                cohosted_networks[network] = network_domain
+                break
+        for warning in validate_cohosted_networks(cohosted_networks, domain_obj, global_domain_obj, fullchain_file):
+            print(f"WARNING: {warning}")
+        if cohosted_networks:
+            input("Press Enter to continue...")
+        print()
 
-    dataimport_secrets_file = FLNET_CLIENT_ENV_DIR / 'dataimport-secrets.env'
-    if not write_env_file(
-        dataimport_secrets_file,
-        skip_when_exists=True,
-        MYSQL_PASSWORD=importer_db_password,
-        MYSQL_ROOT_PASSWORD=importer_db_root_password,
-        SQL_PASSWORD=importer_db_password,
-        KEYCLOAK_CLIENT_SECRET_KEY=importer_api_client_secret,
-        SECRET_KEY=importer_secret_key,
-    ):
-        sys.exit(1)
+    # ========================================================================
+    # 3b. Sizing of the deployment
+    # vars: host, sizing_profile, resource_limits, replicas, database_mode, database_bulk_import, keycloak_optimized
+    # ========================================================================
+    print("The preflight checks measure the disk of the docker root and the connection to the relay of the network.")
+    if ask_yes_no("Do you want to run the preflight checks? (y/n, default y): ", default=True):
+        print("Measuring this host (disk and network), this takes a few seconds...\n")
+        preflight_report = run_preflight(*network_addresses(global_domain_obj, global_tcp_port), args.data_root)
+        print_preflight_report(preflight_report)
+        preflight_problems = preflight_warnings(preflight_report)
+        for warning in preflight_problems:
+            print(f"WARNING: {warning}")
+        if preflight_problems:
+            input("Press Enter to continue...")
+        host = preflight_report["host"]
+        sizing_profile = preflight_report["sizing_profile"]
+        recommended_database_mode = preflight_report["database_mode"]
+    else:
+        host = detect_host_resources()
+        sizing_profile = select_sizing_profile(host)
+        recommended_database_mode = "separate"
+    print()
+    print(f"Detected {host} on this machine, suggesting the '{sizing_profile.name}' sizing profile.")
+    print("The sizing profile determines the performance settings of the reverse proxy and the databases.")
+    while True:
+        sizing_profile_input = input(f"Enter the sizing profile ({', '.join(SIZING_PROFILES)}) or press Enter to use '{sizing_profile.name}': ").strip().lower()
+        if not sizing_profile_input:
+            break
+        if sizing_profile_input in SIZING_PROFILES:
+            sizing_profile = SIZING_PROFILES[sizing_profile_input]
+            break
+        print(f"Invalid input. Please enter one of {', '.join(SIZING_PROFILES)}.")
+    print()
 
-    # --- orch-secrets ---
-    orch_db_password = gen_secret()
+    print("Resource limits keep e.g. a heavy import from starving keycloak, the frontend and the learning containers.")
+    print("They are written to FLNet_client/docker-compose.resources.yml, own changes go into docker-compose.override.yml.")
+    resource_limits = ask_yes_no("Do you want to limit CPU and memory of the services for this host? (y/n, default y): ", default=True)
+    print()
 
-    orch_api_secrets_file = FLNET_CLIENT_ENV_DIR / 'orch-secrets.env'
-    if not write_env_file(
-        orch_api_secrets_file,
-        skip_when_exists=True,
-        POSTGRES_PASSWORD=orch_db_password,
-        QUARKUS_DATASOURCE_PASSWORD=orch_db_password
-    ):
-        sys.exit(1)
+    print("The API services can run as several containers, so e.g. one busy import does not block other users.")
+    print("Every replica needs its own memory, resource limits apply per replica.")
+    replicas = {}
+    for service in REPLICATED_SERVICES:
+        while True:
+            replicas_input = input(f"Enter the number of {service} replicas (1-{MAX_REPLICAS}) or press Enter for 1: ").strip()
+            if not replicas_input:
+                break
+            try:
+                replicas[service] = int(replicas_input)
+                for warning in validate_replicas(replicas, host):
+                    print(f"WARNING: {warning}")
+                break
+            except ValueError as e:
+                replicas.pop(service, None)
+                print(f"ERROR: {e}" if replicas_input.isdigit() else "Invalid input. Please enter a number.")
+    print()
 
-    # --- learning-secrets ---
-    learning_db_password = gen_secret()
-    learning_api_client_secret = gen_secret()
+    print("By default the client runs a separate postgres server for orch-api, local-learning-api and keycloak.")
+    print("On small hosts one shared postgres server for all of them saves memory and startup time.")
+    print("WARNING: Switching the mode of an existing client starts with empty databases, data is NOT migrated.")
+    shared_default = sizing_profile is SMALL_PROFILE or recommended_database_mode == "shared"
+    shared = ask_yes_no(f"Do you want to use one shared postgres server? (y/n, default {'y' if shared_default else 'n'}): ", default=shared_default)
+    database_mode = "shared" if shared else "separate"
+    print()
 
-    learning_api_secrets_file = FLNET_CLIENT_ENV_DIR / 'local-learning-secrets.env'
-    if not write_env_file(
-        learning_api_secrets_file,
-        skip_when_exists=True,
-        POSTGRES_PASSWORD=learning_db_password,
-        QUARKUS_DATASOURCE_PASSWORD=learning_db_password,
-        QUARKUS_OIDC_CREDENTIALS_SECRET=learning_api_client_secret,
-        QUARKUS_KEYCLOAK_ADMIN_CLIENT_CLIENT_SECRET=learning_api_client_secret,
-      # see env/local-learning-secrets.env
-    ):
-        sys.exit(1)
+    print("The bulk-import profile of dataimport-db speeds up large initial data loads by flushing")
+    print("the redo log only once per second. A crash of the host may lose the last second of imports.")
+    print("It can be switched off later by renaming FLNet_client/mariadb/dataimport-db/90-bulk-import.cnf to *.cnf.off.")
+    database_bulk_import = ask_yes_no("Do you want to enable the bulk-import profile? (y/n, default n): ", default=False)
+    print()
 
-    # --- keycloak-secrets ---
-    keycloak_db_password = gen_secret()
-    keycloak_bootstrap_admin_password = gen_secret(16)
-        # Needs to be used by the admin, so we make it a bit shorter and easier to handle
-        # We advise the user to change it after first login anyways!
+    print("Keycloak gates the startup of most services. A locally built keycloak image with the")
+    print("configuration baked in starts faster and imports the realm on the first boot only.")
+    print("The image is built by 'docker compose up' and has to be rebuilt to get keycloak updates.")
+    keycloak_optimized = ask_yes_no("Do you want to use the optimized keycloak image? (y/n, default n): ", default=False)
+    print()
 
-    keycloak_secrets_file = FLNET_CLIENT_ENV_DIR / 'keycloak-secrets.env'
-    if not write_env_file(
-        keycloak_secrets_file,
-        skip_when_exists=True,
-        KC_BOOTSTRAP_ADMIN_USERNAME=DEFAULT_KEYCLOAK_BOOTSTRAP_ADMIN_USERNAME,
-        POSTGRES_PASSWORD=keycloak_db_password,
-        KC_DB_PASSWORD=keycloak_db_password,
-        KC_BOOTSTRAP_ADMIN_PASSWORD=keycloak_bootstrap_admin_password,
-        LOCAL_LEARNING_SECRET=learning_api_client_secret,
-        DATA_IMPORTER_SECRET=importer_api_client_secret,
-    ):
-        sys.exit(1)
+    # ========================================================================
+    # 3c. Reverse proxy features
+    # vars: static_cache, static_cache_brotli, upload_mode, upload_temp_dir, websocket_idle_timeout, rate_limits,
+    #       access_log_format, observability, tls_fast_path
+    # ========================================================================
+    static_cache = ask_yes_no("Do you want the reverse proxy to cache and compress static assets (recommended for slow networks)? (y/n, default n): ", default=False)
+    static_cache_brotli = False
+    if static_cache:
+        static_cache_brotli = ask_yes_no("Does your nginx image ship the brotli module for additional brotli compression? (y/n, default n): ", default=False)
+    print()
 
-    print("All secrets generated and stored securely.\n")
+    print("Datasets are uploaded to the importer through the reverse proxy.")
+    print("By default the proxy receives the complete upload into a temporary file before passing it on.")
+    print("In streaming mode the upload is passed on while it is received, which avoids writing large uploads twice.")
+    upload_mode = "streaming" if ask_yes_no("Do you want to stream uploads to the importer (recommended for uploads of several GB)? (y/n, default n): ", default=False) else "buffered"
+    upload_temp_dir = None
+    while upload_mode == "buffered":
+        upload_temp_dir_input = input("Enter a folder for the temporary upload files, e.g. on a fast disk, or press Enter to keep them in the proxy container: ").strip()
+        if not upload_temp_dir_input:
+            break
+        upload_temp_dir = Path(upload_temp_dir_input)
+        if not upload_temp_dir.is_dir():
+            print(f"ERROR: The folder '{upload_temp_dir_input}' does not exist.")
+            continue
+        upload_temp_dir = upload_temp_dir.resolve()
+        for warning in prepare_upload_temp_dir(upload_temp_dir):
+            print(f"WARNING: {warning}")
+        break
+    print()
+
+    print("The learning API keeps websockets open for training status updates, which can be silent during long rounds.")
+    while True:
+        websocket_idle_timeout_input = input(f"Enter the idle timeout of websockets in seconds (default {DEFAULT_WEBSOCKET_IDLE_TIMEOUT}): ").strip()
+        if not websocket_idle_timeout_input:
+            websocket_idle_timeout = DEFAULT_WEBSOCKET_IDLE_TIMEOUT
+            break
+        if websocket_idle_timeout_input.isdigit() and int(websocket_idle_timeout_input) >= MIN_WEBSOCKET_IDLE_TIMEOUT:
+            websocket_idle_timeout = int(websocket_idle_timeout_input)
+            break
+        print(f"ERROR: Please enter a number of seconds, at least {MIN_WEBSOCKET_IDLE_TIMEOUT}.")
+    print()
+
+    print("Rate limits reject requests beyond a budget per client address with '429 Too Many Requests', so a single")
+    print("flooding client cannot stall keycloak logins or the APIs for everyone. Adjust them with 'rate_limits' in an answers file.")
+    print("WARNING: Behind a further proxy or load balancer all clients share its address and with it the limits.")
+    rate_limits = parse_rate_limits(ask_yes_no("Do you want to limit the request rate and connections per client address? (y/n, default n): ", default=False))
+    print()
+
+    print("The detailed access log adds request and upstream timings to every request logged by the proxy.")
+    print("It is needed by access_log_analyzer.py to find the source of slow requests.")
+    detailed_log = ask_yes_no("Do you want to enable the detailed access log? (y/n, default n): ", default=False)
+    access_log_format = "detailed_debug" if detailed_log else "combined"
+    print()
+
+    print("The observability profile adds metrics exporters for nginx, the databases and keycloak,")
+    print("and a local prometheus (http://127.0.0.1:9090 on this host) that keeps them for 15 days.")
+    observability = ask_yes_no("Do you want to enable the observability profile? (y/n, default n): ", default=False)
     print()
 
+    tls_fast_path = False
+    if enable_ssl_termination_in_client:
+        print("The TLS fast path enables HTTP/2, session tickets, smaller TLS records and OCSP stapling,")
+        print("and rejects TLS handshakes for unknown server names. Clients must use the domain, not the IP address.")
+        tls_fast_path = ask_yes_no("Do you want to enable the TLS fast path? (y/n, default n): ", default=False)
+        if tls_fast_path:
+            for warning in tls_stapling_warnings(fullchain_file):
+                print(f"WARNING: {warning}")
+        print()
+
     # ========================================================================
-    # 5. Patch nginx.conf and save the final .env file
+    # 3d. Storage placement
+    # vars: data_dirs, orch_data_tmpfs_size
     # ========================================================================
-    # Build global URLs based on global_domain_obj
-    global_protocol = global_domain_obj.protocol()
-    global_ws_protocol = "wss" if global_protocol == "https" else "ws"
-    global_domain_name = global_domain_obj.domain_name()
-    global_port = global_domain_obj.port()
+    print(f"By default all docker volumes are stored on the disk of {DOCKER_DATA_ROOT}.")
+    print("Databases and imported files can be placed on faster or larger disks instead.")
+    print("WARNING: Existing volumes are NOT moved, only use this for new deployments or after copying the data.")
+    candidates = detect_data_dir_candidates()
+    if candidates:
+        print("Disks of this machine:")
+        for mount_point, free_gb, rotational in candidates:
+            disk_type = {True: "HDD", False: "SSD", None: "unknown disk"}[rotational]
+            print(f"  {mount_point}  ({free_gb:.0f} GB free, {disk_type})")
+    data_dirs = {}
+    orch_data_tmpfs_size = None
+    for volume_class in VOLUME_CLASSES.values():
+        if volume_class is ORCH_DATA_VOLUMES:
+            print("The file transfer to the learning containers (orch-data) is transient and can be kept in memory.")
+            while True:
+                size_input = input("Enter a size for an in-memory orch-data (e.g. 4g), or press Enter to store it on disk: ").strip().lower()
+                if not size_input:
+                    break
+                try:
+                    for warning in validate_tmpfs_size(size_input, host):
+                        print(f"WARNING: {warning}")
+                    orch_data_tmpfs_size = size_input
+                    break
+                except ValueError as e:
+                    print(f"ERROR: {e}")
+            if orch_data_tmpfs_size:
+                continue
+        while True:
+            data_dir_input = input(f"Enter a data directory for {volume_class.description}, or press Enter to use a docker volume: ").strip()
+            if not data_dir_input:
+                break
+            try:
+                data_dir = Path(data_dir_input).expanduser()
+                for warning in validate_data_dir(data_dir, volume_class):
+                    print(f"WARNING: {warning}")
+                data_dirs[volume_class.name] = data_dir
+                break
+            except ValueError as e:
+                print(f"ERROR: {e}")
+    print()
 
-    # Include port in URLs only if it's non-standard for the protocol
-    global_port_suffix = ""
-    if (global_protocol == "https" and global_port != "443") or (global_protocol == "http" and global_port != "80"):
-        global_port_suffix = f":{global_port}"
+    # ========================================================================
+    # 3e. Pinned images
+    # vars: pinned_images
+    # ========================================================================
+    pinned_images = False
+    if (FLNET_CLIENT_DIR / IMAGES_LOCK_FILE).exists():
+        print(f"{IMAGES_LOCK_FILE} pins every image to a digest, e.g. for a bundle loaded with image_bundle.py import.")
+        print("Pinned images are never pulled again on a restart, but are not updated automatically (e.g. by watchtower).")
+        pinned_images = ask_yes_no(f"Do you want to use the pinned images of {IMAGES_LOCK_FILE}? (y/n, default y): ", default=True)
+        print()
 
-    global_base_with_port = f"{global_domain_name}{global_port_suffix}"
+    answers = InstallerAnswers()
+    answers.exposed_address = exposed_address
+    answers.exposed_ip_address = exposed_ip_address
+    answers.client_port = client_port
+    answers.domain_obj = domain_obj
+    answers.fullchain_file = fullchain_file
+    answers.privkey_file = privkey_file
+    answers.global_domain_obj = global_domain_obj
+    answers.global_domain_candidates = global_domain_candidates
+    answers.reprobe_global_endpoints = args.reprobe_endpoints
+    answers.global_tcp_port = global_tcp_port
+    answers.host = host
+    answers.sizing_profile = sizing_profile
+    answers.resource_limits = resource_limits
+    answers.replicas = replicas
+    answers.cohosted_networks = cohosted_networks
+    answers.static_cache = static_cache
+    answers.static_cache_brotli = static_cache_brotli
+    answers.upload_mode = upload_mode
+    answers.websocket_idle_timeout = websocket_idle_timeout
+    answers.rate_limits = rate_limits
+    answers.upload_temp_dir = upload_temp_dir
+    answers.access_log_format = access_log_format
+    answers.observability = observability
+    answers.tls_fast_path = tls_fast_path
+    answers.ecdsa_files = ecdsa_files
+    answers.data_dirs = data_dirs
+    answers.orch_data_tmpfs_size = orch_data_tmpfs_size
+    answers.database_mode = database_mode
+    answers.database_bulk_import = database_bulk_import
+    answers.keycloak_optimized = keycloak_optimized
+    answers.pinned_images = pinned_images
 
-    # Set the complete domain with protocol and port as well as the bare domain
-    # bare domain is required as ALLOWED_HOSTS in Django
-    # as well as server_name in nginx
-    # we set this in nginx via patching the nginx.conf
-    if domain_obj is not None:
-        deployed_on_address = str(domain_obj)
-        deployed_on_domain = domain_obj.domain_name()
-    else:
-        # No domain - use exposed address with http
-        port_suffix = f":{client_port}" if client_port != "80" else ""
-        deployed_on_address = f"http://{exposed_address}{port_suffix}"
-        deployed_on_domain = exposed_address
+    # ========================================================================
+    # 4. Generate Secrets, patch nginx.conf and save the final .env file
+    # ========================================================================
+    print("Securely generating database secrets...\n")
+    rendered = render_client(answers, FLNET_CLIENT_DIR)
+    print("All secrets generated and stored securely.\n")
+    print()
+    affected = rendered["affected_services"]
+    if not rendered["changed_files"]:
+        print("Nothing changed, a running client is already up to date.\n")
+    elif any(action != "start" for action in affected.values()):
+        # a re-run on an initialized client, only the affected services need to be touched
+        print(f"Changed files: {', '.join(rendered['changed_files'])}")
+        for service, action in affected.items():
+            print(f"  {service}: {action}")
+        print("If the client is running, apply the changes with:")
+        for command in rendered["apply_commands"]:
+            print(f"  {command}")
+        print()
+    elif not affected:
+        print(f"Changed files: {', '.join(rendered['changed_files'])}, no service is affected.\n")
+    if rendered["global_endpoint_probe"]:
+        print(f"Connecting to the platform at '{rendered['global_endpoint']}', measured: {rendered['global_endpoint_probe']}")
+        print("Re-run the installer with --reprobe-endpoints to measure again, e.g. after moving the host.\n")
+    deployed_on_address = rendered["deployed_on_address"]
+    keycloak_bootstrap_admin_password = rendered["keycloak_admin_password"]
 
-    nginx_conf_path = FLNET_CLIENT_DIR / 'nginx.conf'
-    patch_nginx_server_name(nginx_conf_path, str(deployed_on_domain))
-    if not write_env_file(
-        FLNET_CLIENT_DIR / '.env',
-        comments={
-            'DEPLOYED_ON_ADDRESS': 'WARNING: Changing DEPLOYED_ON_ADDRESS or DEPLOYED_ON_DOMAIN here will NOT update the nginx server_name. Re-run the installer to regenerate nginx.conf with the new domain.',
-        },
-        skip_when_exists=False,
-        EXPOSED_IP_ADDRESS=exposed_ip_address,
-            # IP address for docker binding (docker doesn't understand 'localhost')
-        EXPOSED_PORT=client_port,
-        DEPLOYED_ON_ADDRESS=deployed_on_address,
-        DEPLOYED_ON_DOMAIN=deployed_on_domain,
-        GLOBAL_BASE_ADDRESS=global_domain_name,
-        GLOBAL_LEARNING_API_URL=f"{global_protocol}://{global_base_with_port}/api",
-        GLOBAL_LEARNING_API_WEBSOCKET_URL=f"{global_ws_protocol}://{global_base_with_port}/api",
-        GLOBAL_SCHEMA_API_URL=f"{global_protocol}://{global_base_with_port}/data-modeler",
-        GLOBAL_RELAY_HTTP_URL=f"{global_protocol}://{global_base_with_port}/relay",
-        GLOBAL_RELAY_TCP_ADDRESS=f"{global_domain_name}:{global_tcp_port}",
-        COMPOSE_PROFILES="no-ssl" if not ssl_folder else "ssl",
-        SSL_CERT_PUBLIC_KEY=str(fullchain_file) if fullchain_file else "dummyfile",
-        SSL_CERT_PRIVATE_KEY=str(privkey_file) if privkey_file else "dummyfile",
-        FRONTEND_IMAGE=GLOBAL_DOMAIN_TO_IMAGE.get(str(global_domain_obj), DEFAULT_FRONTEND_IMAGE)
-    ):
-        sys.exit(1)
+    # ========================================================================
+    # 4b. Pre-fetch the images, so the first start begins from a warm cache
+    # ========================================================================
+    print("All images can be downloaded now, in parallel, instead of during the first 'docker compose up'.")
+    if args.prefetch_images or ask_yes_no("Do you want to download the images now? (y/n, default y): ", default=True):
+        prefetched = prefetch_client_images(args.docker, [FLNET_CLIENT_DIR], args.pull_jobs)
+        if prefetched["failed"] or "error" in prefetched:
+            print(f"Re-run 'python3 {Path(__file__).name} --prefetch-only' to resume, already downloaded layers are kept.")
+    print()
 
     # ========================================================================
-    # 6. Installation Summary
+    # 5. Installation Summary
     # ========================================================================
     print("⚠️")
     print("The FLNet Client is not started yet. To start it, please do the following:\n")
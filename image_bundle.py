@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Pins the images of a FLNet Client to digests and carries them to hosts without registry access.
+
+    lock:   pull every image of the compose files (all profiles and the shared postgres overlay) and
+            the frontend images of all networks, resolve them to digests and write images.lock.json.
+    export: save all locked images into one compressed bundle. Layers shared between the images
+            (e.g. the JVM base of the three Java services) are stored only once.
+    import: load a bundle into the local docker daemon and verify it against the lock file.
+
+The installer pins the services to the locked digests with pull_policy: missing as soon as
+FLNet_client/images.lock.json exists, so starts and restarts never contact the registry.
+
+Usage:
+    python3 image_bundle.py lock --compose-dir FLNet_client
+    python3 image_bundle.py export --bundle flnet-images.tar.gz
+    python3 image_bundle.py import --bundle flnet-images.tar.gz
+
+All docker interaction goes through the docker CLI (see --docker), so the tool can
+be run against a stand-in script instead of a real daemon.
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from client_installer import (
+    DEFAULT_FRONTEND_IMAGE, FLNET_CLIENT_DIR, GLOBAL_DOMAIN_TO_IMAGE, IMAGES_LOCK_FILE, SHARED_POSTGRES_OVERLAY,
+    image_repository, read_image_lock,
+)
+
+# Compose files whose services are locked, each overlay is merged on top of the previous files
+LOCKED_COMPOSE_FILES = ('docker-compose.yml', SHARED_POSTGRES_OVERLAY)
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_JOBS = 4
+
+# ============================================================================
+# Lock
+# ============================================================================
+def compose_services(docker: str, compose_dir: Path) -> dict:
+    """
+    Images of the services of LOCKED_COMPOSE_FILES with all profiles enabled, not interpolated.
+    Returns {service: {'image': ..., 'compose_file': file defining the service}}, locally built services are left out.
+    """
+    services = {}
+    for index, compose_file in enumerate(LOCKED_COMPOSE_FILES):
+        files = [argument for name in LOCKED_COMPOSE_FILES[:index + 1] for argument in ("-f", name)]
+        output = subprocess.run(
+            [docker, "compose", *files, "--profile", "*", "config", "--no-interpolate", "--format", "json"],
+            cwd=compose_dir, check=True, capture_output=True, text=True,
+        ).stdout
+        for name, definition in json.loads(output).get("services", {}).items():
+            if name in services or "build" in definition or not definition.get("image"):
+                continue
+            services[name] = {"image": definition["image"], "compose_file": compose_file}
+    return services
+
+
+def images_to_lock(services: dict) -> list:
+    """All images of the services and the frontend images of all networks (interpolated images are left out)."""
+    images = {entry["image"] for entry in services.values() if "${" not in entry["image"]}
+    images.update(GLOBAL_DOMAIN_TO_IMAGE.values())
+    images.add(DEFAULT_FRONTEND_IMAGE)
+    return sorted(images)
+
+
+def inspect_image(docker: str, image: str) -> Optional[dict]:
+    """'docker image inspect' of a local image, None if it is not present."""
+    result = subprocess.run([docker, "image", "inspect", "--format", "{{json .}}", image],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout)
+
+
+def resolve_image(docker: str, image: str) -> dict:
+    """Pull the image and return its digest reference and image ID."""
+    subprocess.run([docker, "pull", "--quiet", image], check=True, capture_output=True, text=True)
+    details = inspect_image(docker, image)
+    if details is None:
+        raise ValueError(f"'{image}' is not present after pulling it.")
+    repository = image_repository(image)
+    digests = [digest for digest in details.get("RepoDigests") or [] if image_repository(digest) == repository]
+    if not digests:
+        raise ValueError(f"'{image}' has no digest of the repository '{repository}', was it pulled from a registry?")
+    return {"digest": digests[0], "id": details["Id"]}
+
+
+def lock_images(docker: str, compose_dir: Path, jobs: int) -> dict:
+    """Resolve all images of the client to digests, the content of images.lock.json."""
+    services = compose_services(docker, compose_dir)
+    images = images_to_lock(services)
+    print(f"Pulling {len(images)} images with {jobs} parallel pulls...")
+    resolved = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for image, entry in zip(images, executor.map(lambda image: resolve_image(docker, image), images)):
+            resolved[image] = entry
+            print(f"  {entry['digest']}")
+    return {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "images": resolved,
+        "services": services,
+    }
+
+# ============================================================================
+# Bundle
+# ============================================================================
+class HashingWriter:
+    """File object wrapper that hashes and counts everything written, e.g. the compressed bundle."""
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+def checksum_path(bundle: Path) -> Path:
+    return bundle.with_name(bundle.name + ".sha256")
+
+
+def file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def export_bundle(docker: str, lock: dict, bundle: Path, compression_level: int) -> dict:
+    """
+    Save all locked images with a single 'docker save' (so shared layers are stored once),
+    gzip it on the fly into bundle and write the checksum next to it.
+    """
+    stale = []
+    for image, entry in lock["images"].items():
+        details = inspect_image(docker, image)
+        if details is None or details["Id"] != entry["id"]:
+            stale.append(image)
+    if stale:
+        raise ValueError("Not present or not the locked version, run 'image_bundle.py lock' again: " + ", ".join(stale))
+    # by tag, so the names are restored on load (the digests are kept by the containerd image store)
+    save = subprocess.Popen([docker, "save", *sorted(lock["images"])], stdout=subprocess.PIPE)
+    uncompressed_size = 0
+    with bundle.open("wb") as file:
+        writer = HashingWriter(file)
+        with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=compression_level, mtime=0) as compressed:
+            while chunk := save.stdout.read(CHUNK_SIZE):
+                uncompressed_size += len(chunk)
+                compressed.write(chunk)
+    if save.wait() != 0:
+        bundle.unlink(missing_ok=True)
+        raise subprocess.CalledProcessError(save.returncode, save.args)
+    checksum_path(bundle).write_text(f"{writer.sha256.hexdigest()}  {bundle.name}\n")
+    return {"images": len(lock["images"]), "uncompressed_bytes": uncompressed_size, "bundle_bytes": writer.size}
+
+
+def import_bundle(docker: str, lock: dict, bundle: Path) -> dict:
+    """Verify the checksum of bundle, stream it into 'docker load' and check every locked image afterwards."""
+    checksum_file = checksum_path(bundle)
+    if checksum_file.exists():
+        expected = checksum_file.read_text().split()[0]
+        if file_sha256(bundle) != expected:
+            raise ValueError(f"The checksum of '{bundle}' does not match '{checksum_file}', the bundle is damaged.")
+    else:
+        print(f"WARNING: '{checksum_file}' not found, the bundle is not verified.")
+    load = subprocess.Popen([docker, "load", "--quiet"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    try:
+        with gzip.open(bundle, "rb") as compressed:
+            while chunk := compressed.read(CHUNK_SIZE):
+                load.stdin.write(chunk)
+    finally:
+        load.stdin.close()
+    if load.wait() != 0:
+        raise subprocess.CalledProcessError(load.returncode, load.args)
+
+    missing, without_digest = [], []
+    for image, entry in sorted(lock["images"].items()):
+        if inspect_image(docker, entry["digest"]) is not None:
+            continue
+        details = inspect_image(docker, image)
+        if details is not None and details["Id"] == entry["id"]:
+            # the classic image store of docker does not keep the digests on load
+            without_digest.append(image)
+        else:
+            missing.append(image)
+    return {"images": len(lock["images"]), "missing": missing, "without_digest": without_digest}
+
+# ============================================================================
+# Main
+# ============================================================================
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("lock", "export", "import"),
+                        help="lock: resolve the images to digests. export: save the locked images as bundle. "
+                             "import: load a bundle.")
+    parser.add_argument("--compose-dir", type=Path, default=FLNET_CLIENT_DIR,
+                        help="lock: initialized client directory with docker-compose.yml and env/")
+    parser.add_argument("--lock-file", type=Path, default=FLNET_CLIENT_DIR / IMAGES_LOCK_FILE, help="Image lock file")
+    parser.add_argument("--bundle", type=Path, default=Path("flnet-images.tar.gz"), help="export/import: the image bundle")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="lock: number of parallel pulls")
+    parser.add_argument("--compression-level", type=int, default=6, choices=range(1, 10), metavar="1-9",
+                        help="export: gzip level, lower is faster")
+    parser.add_argument("--docker", default="docker", help="docker CLI to use, e.g. a stand-in script for testing")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    if args.command == "lock":
+        lock = lock_images(args.docker, args.compose_dir, max(1, args.jobs))
+        args.lock_file.write_text(json.dumps(lock, indent=2) + "\n")
+        print(f"{len(lock['images'])} images locked in '{args.lock_file}' ({time.monotonic() - started:.1f} s).")
+        print("Re-run client_installer.py to pin the services to these digests.")
+        return 0
+
+    lock = read_image_lock(args.lock_file)
+    if args.command == "export":
+        result = export_bundle(args.docker, lock, args.bundle, args.compression_level)
+        print(f"{result['images']} images saved to '{args.bundle}': {result['uncompressed_bytes'] / 2**20:.0f} MiB "
+              f"compressed to {result['bundle_bytes'] / 2**20:.0f} MiB in {time.monotonic() - started:.1f} s.")
+        print(f"Copy '{args.bundle}', '{checksum_path(args.bundle)}' and '{args.lock_file}' to the target host.")
+        return 0
+
+    result = import_bundle(args.docker, lock, args.bundle)
+    print(f"'{args.bundle}' loaded in {time.monotonic() - started:.1f} s.")
+    if result["missing"]:
+        print("ERROR: Not contained in the bundle (or a different version): " + ", ".join(result["missing"]))
+    if result["without_digest"]:
+        print("ERROR: Loaded, but the docker daemon dropped the digests: " + ", ".join(result["without_digest"]))
+        print("The pinned images require the containerd image store, see "
+              "https://docs.docker.com/engine/storage/containerd/")
+    if result["missing"] or result["without_digest"]:
+        return 1
+    print(f"All {result['images']} locked images are present, the client starts without registry access.")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\nCancelled by user.")
+        sys.exit(1)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"\n\nError: {e}", file=sys.stderr)
+        sys.exit(1)
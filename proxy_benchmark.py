@@ -0,0 +1,1355 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the reverse proxy configuration of a FLNet Client on this machine.
+Runs a local nginx with the config files of a client directory, whose upstreams
+are replaced by lightweight stub servers standing in for the containers.
+Requires an nginx binary on this machine (see --nginx), nothing is sent to the
+real services. The selfcheck command checks the stubs and the config rewrite
+without nginx.
+
+Usage:
+    python3 proxy_benchmark.py --output before.json load --duration 10 --concurrency 16
+    python3 proxy_benchmark.py load --duration 10 --concurrency 16 --baseline before.json
+    python3 proxy_benchmark.py upload --size-gb 4 --upload-mode buffered --upload-mode streaming
+    python3 proxy_benchmark.py replicas --location /importer/ --replicas 1 --replicas 2 --replicas 4
+    python3 proxy_benchmark.py tls --handshakes 500 --key-type ec --key-type rsa
+    python3 proxy_benchmark.py idle-websockets --websockets 500 --idle-seconds 90
+    python3 proxy_benchmark.py flood --target token --flood-concurrency 64
+    python3 proxy_benchmark.py selfcheck
+
+The load generator is written in Python, so absolute numbers are a lower bound of
+what nginx can do. Compare runs on the same machine with the same parameters.
+All benchmarks but flood send their load from a single client address and run without the
+request rate and connection limits of the config, which would reject most of it.
+"""
+import argparse
+import base64
+import hashlib
+import http.client
+import json
+import math
+import os
+import re
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from client_installer import (
+    FLNET_CLIENT_DIR, NGINX_STATUS_PORT, UPLOAD_MODES, parse_rate_limits, patch_nginx_rate_limits, patch_nginx_replicas,
+    patch_nginx_tls, patch_nginx_upload_mode, patch_nginx_websocket_timeout,
+)
+
+# Service names of the upstream servers in nginx.conf
+STUB_SERVICES = ("dataimporter-api", "local-learning-api", "instance-manager-frontend", "keycloak")
+# Container paths of the nginx files mapped into the local nginx prefix
+NGINX_PATH_REWRITES = {
+    "/etc/nginx/conf.d/default.conf": "conf/default.conf",
+    "/etc/nginx/conf.d/ssl-config.conf": "conf/ssl-config.conf",
+    "/etc/nginx/mime.types": "conf/mime.types",
+    "/etc/nginx/ssl/": "ssl/",
+    "/var/run/nginx.pid": "nginx.pid",
+    "/var/cache/nginx/": "cache/",
+    "/var/lib/nginx/": "lib/",
+    "/dev/stdout": "logs/nginx.log",
+}
+MINIMAL_MIME_TYPES = """types {
+    text/html html;
+    text/css css;
+    application/javascript js;
+    application/json json;
+}
+"""
+CHUNK_SIZE = 1024 * 1024
+STARTUP_TIMEOUT_SECONDS = 10
+# The locations of nginx.conf and the service behind each, with the path requested through it
+BENCHMARK_LOCATIONS = {
+    "/importer/": ("dataimporter-api", "/importer/benchmark"),
+    "/local-learning-api/": ("local-learning-api", "/local-learning-api/benchmark"),
+    "/auth/": ("keycloak", "/auth/benchmark"),
+    "/": ("instance-manager-frontend", "/benchmark"),
+}
+BENCHMARK_FILES = ('nginx.conf', 'nginx_server.conf', 'nginx_conf_HTTP.conf', 'nginx_conf_HTTPS.conf')
+SCHEMES = ("http", "https")
+# openssl req options of the self-signed certificate per key type
+TLS_KEY_TYPES = {
+    "ec": ("-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1"),
+    "rsa": ("-newkey", "rsa:2048"),
+}
+REQUEST_TIMEOUT_SECONDS = 10
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_OPCODE_BINARY = 0x2
+WEBSOCKET_OPCODE_CLOSE = 0x8
+
+# ============================================================================
+# Websocket Frames (RFC 6455, just enough for an echo benchmark)
+# ============================================================================
+def websocket_accept(key: str) -> str:
+    """Sec-WebSocket-Accept answer to a Sec-WebSocket-Key."""
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+def mask_payload(payload: bytes, key: bytes) -> bytes:
+    """XOR the payload with the repeated 4 byte key (masking and unmasking are the same)."""
+    mask = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(mask, "big")).to_bytes(len(payload), "big")
+
+
+def websocket_frame(payload: bytes, opcode: int = WEBSOCKET_OPCODE_BINARY, mask: bool = False) -> bytes:
+    """A single final frame. Clients must mask their frames, servers must not."""
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header += bytes([mask_bit | len(payload)])
+    elif len(payload) < 2 ** 16:
+        header += bytes([mask_bit | 126]) + len(payload).to_bytes(2, "big")
+    else:
+        header += bytes([mask_bit | 127]) + len(payload).to_bytes(8, "big")
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + mask_payload(payload, key)
+
+
+def read_websocket_frame(stream) -> tuple[Optional[int], bytes]:
+    """Read one frame from a binary file object. Returns (None, b"") when the connection was closed."""
+    header = stream.read(2)
+    if len(header) < 2:
+        return None, b""
+    length = header[1] & 0x7F
+    if length == 126:
+        length = int.from_bytes(stream.read(2), "big")
+    elif length == 127:
+        length = int.from_bytes(stream.read(8), "big")
+    key = stream.read(4) if header[1] & 0x80 else None
+    payload = stream.read(length)
+    if key:
+        payload = mask_payload(payload, key)
+    return header[0] & 0x0F, payload
+
+# ============================================================================
+# Stub Upstreams
+# ============================================================================
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Answers every request of the proxy with a small fixed response and records timings."""
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse of the proxy is visible
+    disable_nagle_algorithm = True  # headers and body are written separately, avoid delayed ACK stalls
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass  # the proxy benchmark prints its own results
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            self.echo_websocket()
+        else:
+            self.respond()
+
+    def do_POST(self):
+        received_at = time.monotonic()
+        first_byte_at = None
+        received = 0
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                while size:
+                    data = self.rfile.read(min(size, CHUNK_SIZE))
+                    first_byte_at = first_byte_at or time.monotonic()
+                    size -= len(data)
+                    received += len(data)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining:
+                data = self.rfile.read(min(remaining, CHUNK_SIZE))
+                if not data:
+                    break
+                first_byte_at = first_byte_at or time.monotonic()
+                remaining -= len(data)
+                received += len(data)
+        with self.server.lock:
+            self.server.uploads.append({
+                "request_received_at": received_at,
+                "first_body_byte_at": first_byte_at,
+                "completed_at": time.monotonic(),
+                "bytes": received,
+            })
+        self.respond()
+
+    def respond(self):
+        if self.server.service_time:
+            # one request at a time, like a single busy worker of the service
+            with self.server.busy:
+                time.sleep(self.server.service_time)
+        with self.server.lock:
+            self.server.requests += 1
+        body = self.server.response_body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def echo_websocket(self):
+        """Accept the websocket upgrade and echo every message until the client closes."""
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", websocket_accept(self.headers.get("Sec-WebSocket-Key", "")))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        with self.server.lock:
+            self.server.websockets += 1
+            self.server.open_websockets += 1
+        try:
+            while True:
+                opcode, payload = read_websocket_frame(self.rfile)
+                if opcode is None or opcode == WEBSOCKET_OPCODE_CLOSE:
+                    self.wfile.write(websocket_frame(b"", WEBSOCKET_OPCODE_CLOSE))
+                    return
+                self.wfile.write(websocket_frame(payload, opcode))
+                self.wfile.flush()
+        finally:
+            with self.server.lock:
+                self.server.open_websockets -= 1
+
+
+class StubUpstream(ThreadingHTTPServer):
+    """A local HTTP server standing in for one service behind the proxy."""
+    daemon_threads = True
+
+    def __init__(self, service: str, service_time: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StubRequestHandler)
+        self.service = service
+        self.service_time = service_time
+        self.busy = threading.Lock()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.websockets = 0
+        self.open_websockets = 0
+        self.uploads = []
+        self.response_body = json.dumps({"service": service}).encode()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+# ============================================================================
+# Local Proxy
+# ============================================================================
+def free_port() -> int:
+    """A currently unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalProxy:
+    """
+    Runs nginx with the config files of a client directory on a local port.
+    The container paths are mapped into a temporary nginx prefix, the upstream
+    servers are replaced by the given local port(s) per service and the HTTP or HTTPS
+    config is included depending on https. Without rate_limits the limit_req and limit_conn
+    directives of the config are left out.
+    """
+    def __init__(self, client_dir: Path, upstream_ports: dict, nginx: str = "nginx", https: bool = False,
+                 key_type: str = "ec", rate_limits: bool = False):
+        self.client_dir = client_dir
+        self.rate_limits = rate_limits
+        self.upstream_ports = upstream_ports
+        self.nginx = nginx
+        self.https = https
+        self.key_type = key_type
+        self.port = free_port()
+        self.plain_port = free_port() if https else self.port  # port 80 of the container, e.g. the catch-all
+        self.tls_port = self.port if https else free_port()  # port 443 of the container, e.g. the TLS default_server
+        self.status_port = free_port()  # stub_status server of the observability profile
+        self.prefix = Path(tempfile.mkdtemp(prefix="flnet-proxy-benchmark-"))
+        self.process = None
+        self.server_name = "localhost"
+
+    def rewrite(self, content: str) -> str:
+        """Map the container paths and ports of an nginx config file to the local prefix."""
+        for container_path, local_path in NGINX_PATH_REWRITES.items():
+            content = content.replace(container_path, f"{self.prefix}/{local_path}")
+
+        def upstream_server(match):
+            host = match.group(1)
+            if host not in self.upstream_ports:
+                # the copy of a service for a co-hosted network (e.g. local-learning-api-daibetes) gets its stub
+                services = [service for service in self.upstream_ports if host.startswith(service + "-")]
+                if not services:
+                    raise RuntimeError(f"No stub for the upstream server '{host}' of the nginx config, "
+                                       f"known services: {', '.join(self.upstream_ports)}")
+                host = max(services, key=len)
+            ports = self.upstream_ports[host]
+            return " ".join(f"server 127.0.0.1:{port};" for port in (ports if isinstance(ports, list) else [ports]))
+        content = re.sub(r'server\s+([\w.-]+):\d+\s+resolve;', upstream_server, content)
+        content = re.sub(r'^\s*resolver\s+.*?;', '', content, flags=re.MULTILINE)  # docker DNS only
+        content = re.sub(r'^\s*listen\s+\[::\]:\d+.*?;', '', content, flags=re.MULTILINE)
+        content = re.sub(r'^(\s*listen\s+)443\b', rf'\g<1>{self.tls_port}', content, flags=re.MULTILINE)
+        content = re.sub(r'^(\s*listen\s+)80\b', rf'\g<1>{self.plain_port}', content, flags=re.MULTILINE)
+        content = re.sub(rf'^(\s*listen\s+){NGINX_STATUS_PORT}\b', rf'\g<1>{self.status_port}', content, flags=re.MULTILINE)
+        if not self.rate_limits:
+            content = re.sub(r'^\s*limit_(req|conn)\s+.*?;', '', content, flags=re.MULTILINE)  # the zones are kept, unused
+        return content
+
+    def render(self) -> None:
+        """Write the rewritten config files into the prefix."""
+        for folder in ("conf", "logs", "ssl", "cache", "lib", "tmp"):
+            (self.prefix / folder).mkdir(parents=True, exist_ok=True)
+        main_config = self.rewrite((self.client_dir / 'nginx_server.conf').read_text())
+        # the compiled in temp paths are usually not writable by a normal user
+        temp_paths = "".join(
+            f"\n    {directive}_temp_path {self.prefix / 'tmp' / directive};"
+            for directive in ("client_body", "proxy", "fastcgi", "uwsgi", "scgi")
+        )
+        main_config = re.sub(r'^http\s*\{', lambda match: match.group(0) + temp_paths, main_config, count=1, flags=re.MULTILINE)
+        (self.prefix / 'conf' / 'nginx.conf').write_text(main_config)
+        default_config = self.rewrite((self.client_dir / 'nginx.conf').read_text())
+        (self.prefix / 'conf' / 'default.conf').write_text(default_config)
+        ssl_config = 'nginx_conf_HTTPS.conf' if self.https else 'nginx_conf_HTTP.conf'
+        (self.prefix / 'conf' / 'ssl-config.conf').write_text(self.rewrite((self.client_dir / ssl_config).read_text()))
+        (self.prefix / 'conf' / 'mime.types').write_text(MINIMAL_MIME_TYPES)
+
+        server_name = re.search(r'^\s*server_name\s+([^;\s]+)', default_config, flags=re.MULTILINE)
+        if server_name:
+            self.server_name = server_name.group(1)
+        if self.https:
+            self.create_self_signed_certificate()
+
+    def create_self_signed_certificate(self) -> None:
+        """Self-signed certificate (ECDSA P-256 or RSA 2048) for the server_name, as public.crt/private.key of the container."""
+        key_options = TLS_KEY_TYPES[self.key_type]
+        subprocess.run(
+            ["openssl", "req", "-x509", *key_options,
+             "-nodes", "-days", "1", "-subj", f"/CN={self.server_name}",
+             "-keyout", str(self.prefix / 'ssl' / 'private.key'), "-out", str(self.prefix / 'ssl' / 'public.crt')],
+            check=True, capture_output=True,
+        )
+
+    def __enter__(self):
+        self.render()
+        self.process = subprocess.Popen(
+            [self.nginx, "-p", str(self.prefix), "-c", str(self.prefix / 'conf' / 'nginx.conf'), "-g", "daemon off;"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"nginx exited: {self.process.stderr.read().strip()}\n{self.error_log()}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError(f"nginx did not listen on port {self.port} within {STARTUP_TIMEOUT_SECONDS}s")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        shutil.rmtree(self.prefix, ignore_errors=True)
+
+    def error_log(self) -> str:
+        log = self.prefix / 'logs' / 'nginx.log'
+        return log.read_text()[-2000:] if log.exists() else ""
+
+
+class StubEnvironment:
+    """
+    Stub upstreams for all services plus the local proxy in front of them.
+    replicas starts several stubs for a service (stubs holds the first one, replica_stubs all of them).
+    """
+    def __init__(self, client_dir: Path, nginx: str, https: bool = False, replicas: Optional[dict] = None,
+                 service_time: float = 0.0, key_type: str = "ec", rate_limits: bool = False):
+        self.replica_stubs = {
+            service: [StubUpstream(service, service_time) for _ in range((replicas or {}).get(service, 1))]
+            for service in STUB_SERVICES
+        }
+        self.stubs = {service: stubs[0] for service, stubs in self.replica_stubs.items()}
+        upstream_ports = {service: [stub.port() for stub in stubs] for service, stubs in self.replica_stubs.items()}
+        self.proxy = LocalProxy(client_dir, upstream_ports, nginx, https, key_type, rate_limits)
+
+    def all_stubs(self) -> list:
+        return [stub for stubs in self.replica_stubs.values() for stub in stubs]
+
+    def __enter__(self):
+        for stub in self.all_stubs():
+            stub.__enter__()
+        try:
+            self.proxy.__enter__()
+        except Exception:
+            self.close_stubs()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.proxy.__exit__()
+        self.close_stubs()
+
+    def close_stubs(self):
+        for stub in self.all_stubs():
+            stub.__exit__()
+
+
+def copy_client_config(client_dir: Path) -> Path:
+    """Copy the nginx files of a client directory, so the benchmark can patch them without touching the deployment."""
+    copy = Path(tempfile.mkdtemp(prefix="flnet-proxy-config-"))
+    for file in BENCHMARK_FILES:
+        shutil.copy(client_dir / file, copy / file)
+    return copy
+
+
+def config_fingerprint(client_dir: Path) -> str:
+    """Hash of the benchmarked nginx files, identifies the config a result was measured with."""
+    digest = hashlib.sha256()
+    for file in BENCHMARK_FILES:
+        digest.update((client_dir / file).read_bytes())
+    return digest.hexdigest()
+
+# ============================================================================
+# Load Benchmark
+# ============================================================================
+def percentile(sorted_values: list, fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize_latencies(latencies: list, errors: int, duration: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+def unverified_tls_context() -> ssl.SSLContext:
+    """The benchmark proxy uses a self-signed certificate."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def open_connection(port: int, https: bool, server_name: Optional[str] = None) -> socket.socket:
+    """TCP (or TLS, with server_name as SNI) connection to the local proxy."""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=REQUEST_TIMEOUT_SECONDS)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return unverified_tls_context().wrap_socket(sock, server_hostname=server_name) if https else sock
+
+
+class LocalHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection to the local proxy that sends the server name as SNI, e.g. for a TLS default_server."""
+    def connect(self):
+        self.sock = open_connection(self.port, True, self.host)
+
+
+def run_workers(concurrency: int, worker) -> None:
+    """Run worker(latencies, errors) in concurrency threads, each appends to its own lists."""
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def http_load(port: int, host: str, path: str, https: bool, concurrency: int, duration: float) -> dict:
+    """Keep-alive GET requests from concurrency clients for duration seconds."""
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+
+    def worker():
+        connection = None
+        while time.monotonic() < deadline:
+            if connection is None:
+                if https:
+                    connection = LocalHTTPSConnection(host, port, timeout=REQUEST_TIMEOUT_SECONDS)
+                else:
+                    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT_SECONDS)
+            started_at = time.monotonic()
+            try:
+                connection.request("GET", path, headers={"Host": host})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise http.client.HTTPException(f"status {response.status}")
+                latencies.append((time.monotonic() - started_at) * 1000)
+            except (OSError, http.client.HTTPException):
+                errors.append(1)
+                connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+
+    run_workers(concurrency, worker)
+    return summarize_latencies(latencies, len(errors), duration)
+
+
+def open_websocket(port: int, host: str, path: str, https: bool) -> tuple[socket.socket, object]:
+    """Open a websocket through the proxy, returns the socket and a buffered reader. Raises OSError if refused."""
+    sock = open_connection(port, https, host)
+    try:
+        stream = sock.makefile("rb")
+        key = base64.b64encode(os.urandom(16)).decode()
+        sock.sendall(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        status_line = stream.readline()
+        while stream.readline() not in (b"\r\n", b""):
+            pass
+        if b" 101 " not in status_line:
+            raise ConnectionError(f"websocket upgrade refused: {status_line.decode(errors='replace').strip()}")
+    except OSError:
+        sock.close()
+        raise
+    return sock, stream
+
+
+def websocket_load(port: int, host: str, path: str, https: bool, concurrency: int, duration: float, message_bytes: int) -> dict:
+    """Echo round trips over one long lived websocket per client for duration seconds."""
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    message = os.urandom(message_bytes)
+
+    def worker():
+        try:
+            sock, stream = open_websocket(port, host, path, https)
+        except OSError:
+            errors.append(1)
+            return
+        with sock:
+            try:
+                while time.monotonic() < deadline:
+                    started_at = time.monotonic()
+                    sock.sendall(websocket_frame(message, mask=True))
+                    opcode, payload = read_websocket_frame(stream)
+                    if opcode != WEBSOCKET_OPCODE_BINARY or payload != message:
+                        errors.append(1)
+                        return
+                    latencies.append((time.monotonic() - started_at) * 1000)
+                sock.sendall(websocket_frame(b"", WEBSOCKET_OPCODE_CLOSE, mask=True))
+            except OSError:
+                errors.append(1)
+
+    run_workers(concurrency, worker)
+    return summarize_latencies(latencies, len(errors), duration)
+
+
+def benchmark_load(client_dir: Path, nginx: str, schemes: list, locations: list, concurrency: int, duration: float,
+                   websocket: bool, message_bytes: int) -> list:
+    """
+    Drive HTTP and websocket load through every location, once per scheme.
+    Upstream connection reuse is the number of requests per connection the stub behind the location accepted.
+    """
+    results = []
+    for scheme in schemes:
+        with StubEnvironment(client_dir, nginx, https=scheme == "https") as environment:
+            proxy = environment.proxy
+            for location in locations:
+                service, path = BENCHMARK_LOCATIONS[location]
+                stub = environment.stubs[service]
+                kinds = ("http", "websocket") if websocket else ("http",)
+                for kind in kinds:
+                    connections_before = stub.connections
+                    if kind == "http":
+                        result = http_load(proxy.port, proxy.server_name, path, scheme == "https", concurrency, duration)
+                    else:
+                        result = websocket_load(proxy.port, proxy.server_name, path, scheme == "https",
+                                                concurrency, duration, message_bytes)
+                    upstream_connections = stub.connections - connections_before
+                    result.update({
+                        "scheme": scheme,
+                        "location": location,
+                        "kind": kind,
+                        "upstream_connections": upstream_connections,
+                        "requests_per_upstream_connection": result["requests"] / upstream_connections if upstream_connections else None,
+                    })
+                    results.append(result)
+                    print(f"  {scheme:<6}{kind:<10}{location:<22}{result['requests_per_second']:>9.0f} req/s", file=sys.stderr)
+    return results
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}ms"
+
+
+def print_load_results(results: list, parameters: dict, baseline: Optional[dict]) -> None:
+    """Print the load results, with the change against a baseline result file when given."""
+    previous = {}
+    if baseline:
+        if baseline.get("parameters") != parameters:
+            print(f"Warning: The baseline was measured with other parameters ({baseline.get('parameters')}), "
+                  "the changes are not comparable.")
+        previous = {(result["scheme"], result["kind"], result["location"]): result for result in baseline["results"]}
+    print(f"{'scheme':<7}{'kind':<10}{'location':<22}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}{'req/conn':>10}"
+          + (f"{'req/s Δ':>10}{'p99 Δ':>10}" if baseline else ""))
+    for result in results:
+        reuse = result["requests_per_upstream_connection"]
+        line = (f"{result['scheme']:<7}{result['kind']:<10}{result['location']:<22}{result['requests_per_second']:>9.0f}"
+                f"{format_ms(result['p50_ms']):>9}{format_ms(result['p95_ms']):>9}{format_ms(result['p99_ms']):>9}"
+                f"{result['errors']:>8}{'-' if reuse is None else f'{reuse:.0f}':>10}")
+        before = previous.get((result["scheme"], result["kind"], result["location"]))
+        if before and before["requests_per_second"] and before["p99_ms"] and result["p99_ms"]:
+            line += (f"{(result['requests_per_second'] / before['requests_per_second'] - 1) * 100:>+9.0f}%"
+                     f"{(result['p99_ms'] / before['p99_ms'] - 1) * 100:>+9.0f}%")
+        print(line)
+
+# ============================================================================
+# Replica Scaling Benchmark
+# ============================================================================
+# Locations of the replicated services, the websocket check only applies where the service has websockets
+REPLICA_LOCATIONS = {"/importer/": False, "/local-learning-api/": True}
+STICKY_WEBSOCKETS = 8
+
+
+def websocket_spread(port: int, host: str, path: str, https: bool, stubs: list) -> int:
+    """Open STICKY_WEBSOCKETS websockets from this client at once, returns on how many replicas they landed."""
+    before = [stub.websockets for stub in stubs]
+    sockets = []
+    try:
+        for _ in range(STICKY_WEBSOCKETS):
+            sockets.append(open_websocket(port, host, path, https)[0])
+        return sum(1 for stub, count in zip(stubs, before) if stub.websockets > count)
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def benchmark_replicas(client_dir: Path, nginx: str, location: str, replica_counts: list, concurrency: int,
+                       duration: float, service_time: float) -> list:
+    """
+    HTTP load through location with the service behind it running as 1..n replicas, rendered as the installer does.
+    Every stub replica serves one request at a time for service_time seconds, like a busy worker of the real service.
+    """
+    service = BENCHMARK_LOCATIONS[location][0]
+    path = BENCHMARK_LOCATIONS[location][1]
+    results = []
+    for count in replica_counts:
+        config_dir = copy_client_config(client_dir)
+        try:
+            patch_nginx_replicas(config_dir, {service: count})
+            with StubEnvironment(config_dir, nginx, replicas={service: count}, service_time=service_time) as environment:
+                proxy = environment.proxy
+                stubs = environment.replica_stubs[service]
+                result = http_load(proxy.port, proxy.server_name, path, False, concurrency, duration)
+                result.update({
+                    "location": location,
+                    "replicas": count,
+                    "requests_per_replica": [stub.requests for stub in stubs],
+                    "websocket_replicas": websocket_spread(proxy.port, proxy.server_name, path, False, stubs)
+                        if REPLICA_LOCATIONS[location] else None,
+                })
+        finally:
+            shutil.rmtree(config_dir, ignore_errors=True)
+        results.append(result)
+        print(f"  {location:<22}{count:>3} replicas{result['requests_per_second']:>9.0f} req/s", file=sys.stderr)
+    return results
+
+
+def print_replica_results(results: list) -> None:
+    """Throughput per replica count, scaling relative to the first (smallest) count."""
+    print(f"{'location':<22}{'replicas':>9}{'req/s':>9}{'scaling':>9}{'p50':>9}{'p99':>9}{'errors':>8}  requests per replica")
+    base = results[0]["requests_per_second"] if results else 0
+    for result in results:
+        scaling = result["requests_per_second"] / base if base else 0
+        print(f"{result['location']:<22}{result['replicas']:>9}{result['requests_per_second']:>9.0f}{scaling:>8.2f}x"
+              f"{format_ms(result['p50_ms']):>9}{format_ms(result['p99_ms']):>9}{result['errors']:>8}"
+              f"  {result['requests_per_replica']}")
+        if result["websocket_replicas"] is not None and result["websocket_replicas"] > 1:
+            print(f"  Warning: {STICKY_WEBSOCKETS} websockets of one client were spread over {result['websocket_replicas']} replicas, "
+                  "they are not sticky.")
+
+# ============================================================================
+# TLS Benchmark
+# ============================================================================
+TLS_VARIANTS = ("default", "fast-path")
+UNKNOWN_SERVER_NAME = "unknown.invalid"
+
+
+def timed_handshake(context: ssl.SSLContext, port: int, server_name: str,
+                    session: Optional[ssl.SSLSession] = None) -> tuple[float, ssl.SSLSocket]:
+    """TCP connect plus TLS handshake in ms, resuming session (of the same context) when given."""
+    started_at = time.monotonic()
+    sock = socket.create_connection(("127.0.0.1", port), timeout=REQUEST_TIMEOUT_SECONDS)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        tls_socket = context.wrap_socket(sock, server_hostname=server_name, session=session)
+    except OSError:
+        sock.close()
+        raise
+    return (time.monotonic() - started_at) * 1000, tls_socket
+
+
+def first_request(tls_socket: ssl.SSLSocket, host: str, path: str) -> None:
+    """One GET with Connection: close on a fresh TLS connection, reads the response up to the end."""
+    tls_socket.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    while tls_socket.recv(CHUNK_SIZE):
+        pass
+
+
+def tls_handshakes(port: int, host: str, path: str, count: int) -> dict:
+    """
+    count new connections each with a full handshake plus a first request, then count connections resuming
+    the session of the previous one (via session ID or ticket, whichever the server offers).
+    """
+    full, first_requests, resumed = [], [], []
+    errors = 0
+    context = unverified_tls_context()
+    session = None
+    for _ in range(count):
+        try:
+            handshake_ms, tls_socket = timed_handshake(context, port, host)
+            with tls_socket:
+                started_at = time.monotonic()
+                first_request(tls_socket, host, path)
+                first_requests.append(handshake_ms + (time.monotonic() - started_at) * 1000)
+                full.append(handshake_ms)
+                # TLS 1.3 sends the session after the handshake, it is only available once data was read
+                session = tls_socket.session
+        except OSError:
+            errors += 1
+    reused = 0
+    for _ in range(count if session else 0):
+        try:
+            handshake_ms, tls_socket = timed_handshake(context, port, host, session)
+            with tls_socket:
+                first_request(tls_socket, host, path)
+                if tls_socket.session_reused:
+                    reused += 1
+                    resumed.append(handshake_ms)
+                session = tls_socket.session or session
+        except OSError:
+            errors += 1
+    full.sort()
+    first_requests.sort()
+    resumed.sort()
+    return {
+        "handshakes": count,
+        "errors": errors,
+        "full_handshake_p50_ms": percentile(full, 0.5),
+        "full_handshake_p95_ms": percentile(full, 0.95),
+        "resumed_handshake_p50_ms": percentile(resumed, 0.5),
+        "session_reuse_rate": reused / count if count else 0,
+        "first_request_p50_ms": percentile(first_requests, 0.5),
+        "first_request_p95_ms": percentile(first_requests, 0.95),
+    }
+
+
+def unknown_server_name_rejected(port: int) -> bool:
+    """Whether a handshake with a server name the proxy does not serve is refused instead of answered."""
+    try:
+        timed_handshake(unverified_tls_context(), port, UNKNOWN_SERVER_NAME)[1].close()
+        return False
+    except ssl.SSLError:
+        return True
+
+
+def benchmark_tls(client_dir: Path, nginx: str, variant: str, key_type: str, handshakes: int, concurrency: int,
+                  duration: float) -> dict:
+    """
+    Handshake and request latency of the HTTPS config with a self-signed certificate of key_type,
+    as is (default) or with the TLS fast path of the installer (no stapling, a self-signed certificate has no responder).
+    """
+    location = "/importer/"
+    path = BENCHMARK_LOCATIONS[location][1]
+    config_dir = copy_client_config(client_dir)
+    try:
+        patch_nginx_tls(config_dir, variant == "fast-path", False, False)
+        with StubEnvironment(config_dir, nginx, https=True, key_type=key_type) as environment:
+            proxy = environment.proxy
+            result = tls_handshakes(proxy.port, proxy.server_name, path, handshakes)
+            keep_alive = http_load(proxy.port, proxy.server_name, path, True, concurrency, duration)
+            result.update({
+                "variant": variant,
+                "key_type": key_type,
+                "location": location,
+                "keep_alive_requests_per_second": keep_alive["requests_per_second"],
+                "keep_alive_p50_ms": keep_alive["p50_ms"],
+                "keep_alive_p99_ms": keep_alive["p99_ms"],
+                "unknown_server_name_rejected": unknown_server_name_rejected(proxy.port),
+            })
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+    print(f"  {variant:<10}{key_type:<4}{result['full_handshake_p50_ms'] or 0:>8.1f}ms handshake", file=sys.stderr)
+    return result
+
+
+def print_tls_results(results: list) -> None:
+    print(f"{'variant':<11}{'key':<5}{'full p50':>10}{'full p95':>10}{'resumed':>10}{'reuse':>7}"
+          f"{'first req':>11}{'keep-alive':>12}{'req/s':>8}{'unknown SNI':>13}")
+    for result in results:
+        print(f"{result['variant']:<11}{result['key_type']:<5}{format_ms(result['full_handshake_p50_ms']):>10}"
+              f"{format_ms(result['full_handshake_p95_ms']):>10}{format_ms(result['resumed_handshake_p50_ms']):>10}"
+              f"{result['session_reuse_rate'] * 100:>6.0f}%{format_ms(result['first_request_p50_ms']):>11}"
+              f"{format_ms(result['keep_alive_p50_ms']):>12}{result['keep_alive_requests_per_second']:>8.0f}"
+              f"{'rejected' if result['unknown_server_name_rejected'] else 'answered':>13}")
+        if result["errors"]:
+            print(f"  Warning: {result['errors']} of {result['handshakes'] * 2} connections failed.")
+
+# ============================================================================
+# Idle Websocket Test
+# ============================================================================
+IDLE_WEBSOCKET_LOCATION = "/local-learning-api/"
+
+
+def hold_idle_websockets(port: int, host: str, path: str, https: bool, count: int, idle_seconds: float,
+                         stub: StubUpstream) -> dict:
+    """
+    Open count websockets, keep all of them silent for idle_seconds and check afterwards that every one
+    still echoes a message, i.e. neither the proxy nor the upstream side was closed in the meantime.
+    """
+    websockets, refused = [], 0
+    for _ in range(count):
+        try:
+            websockets.append(open_websocket(port, host, path, https))
+        except OSError:
+            refused += 1
+    print(f"  {len(websockets)} websockets open, idle for {idle_seconds:.0f}s...", file=sys.stderr)
+    time.sleep(idle_seconds)
+    upstream_open = stub.open_websockets
+    message = b"still there?"
+    alive = 0
+    for sock, stream in websockets:
+        try:
+            sock.sendall(websocket_frame(message, mask=True))
+            if read_websocket_frame(stream) == (WEBSOCKET_OPCODE_BINARY, message):
+                alive += 1
+        except OSError:
+            pass
+        finally:
+            sock.close()
+    return {
+        "websockets": count,
+        "refused": refused,
+        "idle_seconds": idle_seconds,
+        "alive": alive,
+        "dropped": len(websockets) - alive,
+        "upstream_open_after_idle": upstream_open,
+    }
+
+
+def benchmark_idle_websockets(client_dir: Path, nginx: str, scheme: str, count: int, idle_seconds: float,
+                              idle_timeout: Optional[int]) -> dict:
+    """Hold idle websockets through the learning API location, with the idle timeout of the config or idle_timeout."""
+    path = BENCHMARK_LOCATIONS[IDLE_WEBSOCKET_LOCATION][1]
+    config_dir = copy_client_config(client_dir)
+    try:
+        if idle_timeout is not None:
+            patch_nginx_websocket_timeout(config_dir, idle_timeout)
+        with StubEnvironment(config_dir, nginx, https=scheme == "https") as environment:
+            proxy = environment.proxy
+            result = hold_idle_websockets(proxy.port, proxy.server_name, path, scheme == "https", count, idle_seconds,
+                                          environment.stubs["local-learning-api"])
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+    result.update({"scheme": scheme, "location": IDLE_WEBSOCKET_LOCATION, "idle_timeout": idle_timeout})
+    return result
+
+
+def print_idle_websocket_results(result: dict) -> None:
+    print(f"{result['websockets']} websockets through {result['location']} ({result['scheme']}), "
+          f"idle for {result['idle_seconds']:.0f}s:")
+    print(f"  alive: {result['alive']}, dropped: {result['dropped']}, refused: {result['refused']}, "
+          f"open at the upstream after the idle time: {result['upstream_open_after_idle']}")
+    if result["refused"]:
+        print("  Warning: Websockets were refused, every websocket takes two of the worker_connections of nginx.")
+    print("PASSED: no websocket was dropped." if not result["dropped"] and not result["refused"]
+          else "FAILED: websockets were dropped or refused.")
+
+# ============================================================================
+# Flood Test
+# ============================================================================
+# Paths one client floods, with the service behind each. The token endpoint is keycloak's most expensive one.
+FLOOD_TARGETS = {
+    "token": ("keycloak", "/auth/realms/flnet/protocol/openid-connect/token"),
+    "importer": ("dataimporter-api", "/importer/benchmark"),
+    "learning": ("local-learning-api", "/local-learning-api/benchmark"),
+    "frontend": ("instance-manager-frontend", "/benchmark"),
+}
+# One round of an interactive user: log in (token), load the page and poll the learning API
+INTERACTIVE_PATHS = (FLOOD_TARGETS["token"][1], FLOOD_TARGETS["frontend"][1], FLOOD_TARGETS["learning"][1])
+FLOOD_VARIANTS = ("unlimited", "limited")
+# Client addresses, Linux routes all of 127.0.0.0/8 to the loopback interface. Every interactive user has its own.
+DEFAULT_FLOOD_ADDRESS = "127.0.0.2"
+INTERACTIVE_ADDRESS_PREFIX = "127.0.1."
+FLOOD_WARMUP_SECONDS = 1.0
+
+
+def flood_load(port: int, host: str, path: str, source_address: str, concurrency: int, duration: float) -> dict:
+    """
+    Keep-alive GET requests as fast as possible from concurrency connections of one client address.
+    Runs in its own process, so the flood does not compete with the interactive clients for the GIL.
+    """
+    passed, rejected, errors = [], [], []
+    deadline = time.monotonic() + duration
+
+    def worker():
+        connection = None
+        while time.monotonic() < deadline:
+            if connection is None:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT_SECONDS,
+                                                        source_address=(source_address, 0))
+            started_at = time.monotonic()
+            try:
+                connection.request("GET", path, headers={"Host": host})
+                response = connection.getresponse()
+                response.read()
+                latency = (time.monotonic() - started_at) * 1000
+                if response.status == 200:
+                    passed.append(latency)
+                elif response.status == 429:
+                    rejected.append(latency)
+                else:
+                    raise http.client.HTTPException(f"status {response.status}")
+                if response.will_close:
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException):
+                errors.append(1)
+                connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+
+    run_workers(concurrency, worker)
+    rejected.sort()
+    return {
+        "requests_per_second": (len(passed) + len(rejected)) / duration,
+        "passed": len(passed),
+        "rejected": len(rejected),
+        "errors": len(errors),
+        "rejection_p50_ms": percentile(rejected, 0.50),
+        "rejection_p99_ms": percentile(rejected, 0.99),
+    }
+
+
+def interactive_load(port: int, host: str, concurrency: int, duration: float, think_time: float) -> dict:
+    """Rounds of INTERACTIVE_PATHS with think_time in between, every user from its own client address."""
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    addresses = iter([f"{INTERACTIVE_ADDRESS_PREFIX}{index + 1}" for index in range(concurrency)])
+
+    def worker():
+        address = next(addresses)
+        connection = None
+        while time.monotonic() < deadline:
+            for path in INTERACTIVE_PATHS:
+                if connection is None:
+                    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT_SECONDS,
+                                                            source_address=(address, 0))
+                started_at = time.monotonic()
+                try:
+                    connection.request("GET", path, headers={"Host": host})
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        raise http.client.HTTPException(f"status {response.status}")
+                    latencies.append((time.monotonic() - started_at) * 1000)
+                except (OSError, http.client.HTTPException):
+                    errors.append(1)
+                    connection.close()
+                    connection = None
+            time.sleep(think_time)
+        if connection is not None:
+            connection.close()
+
+    run_workers(concurrency, worker)
+    return summarize_latencies(latencies, len(errors), duration)
+
+
+def has_rate_limits(client_dir: Path) -> bool:
+    return re.search(r'^\s*limit_req\s', (client_dir / 'nginx.conf').read_text(), flags=re.MULTILINE) is not None
+
+
+def benchmark_flood(client_dir: Path, nginx: str, variant: str, target: str, flood_address: str, flood_concurrency: int,
+                    concurrency: int, duration: float, think_time: float, service_time: float) -> dict:
+    """
+    Interactive latency alone and while one client floods target, without (unlimited) or with (limited) the
+    rate limits of the config, the installer defaults if the config has none. Every stub serves one request
+    at a time for service_time seconds, so an unlimited flood queues up in front of the service like in front
+    of a saturated JVM.
+    """
+    service, path = FLOOD_TARGETS[target]
+    config_dir = copy_client_config(client_dir)
+    try:
+        if variant == "limited" and not has_rate_limits(config_dir):
+            print("  The client directory has no rate limits, using the defaults of the installer.", file=sys.stderr)
+            patch_nginx_rate_limits(config_dir, parse_rate_limits(True))
+        with StubEnvironment(config_dir, nginx, service_time=service_time, rate_limits=variant == "limited") as environment:
+            proxy = environment.proxy
+            stub = environment.stubs[service]
+            alone = interactive_load(proxy.port, proxy.server_name, concurrency, duration, think_time)
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                requests_before = stub.requests
+                flood = executor.submit(flood_load, proxy.port, proxy.server_name, path, flood_address,
+                                        flood_concurrency, duration + 2 * FLOOD_WARMUP_SECONDS)
+                time.sleep(FLOOD_WARMUP_SECONDS)
+                flooded = interactive_load(proxy.port, proxy.server_name, concurrency, duration, think_time)
+                flood_result = flood.result()
+                upstream_requests = stub.requests - requests_before
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+    result = {
+        "variant": variant,
+        "target": target,
+        "interactive_alone": alone,
+        "interactive_flooded": flooded,
+        "flood": flood_result,
+        "upstream_requests_per_second": upstream_requests / (duration + 2 * FLOOD_WARMUP_SECONDS),
+    }
+    print(f"  {variant:<10}{target:<10}p99 {format_ms(alone['p99_ms'])} alone, {format_ms(flooded['p99_ms'])} flooded",
+          file=sys.stderr)
+    return result
+
+
+def print_flood_results(results: list) -> None:
+    print(f"{'variant':<11}{'target':<10}{'alone p50':>11}{'alone p99':>11}{'flood p50':>11}{'flood p99':>11}"
+          f"{'errors':>8}{'flood req/s':>13}{'rejected':>10}{'429 p99':>9}{'upstream req/s':>16}")
+    for result in results:
+        alone, flooded, flood = result["interactive_alone"], result["interactive_flooded"], result["flood"]
+        flood_requests = flood["passed"] + flood["rejected"]
+        print(f"{result['variant']:<11}{result['target']:<10}{format_ms(alone['p50_ms']):>11}{format_ms(alone['p99_ms']):>11}"
+              f"{format_ms(flooded['p50_ms']):>11}{format_ms(flooded['p99_ms']):>11}{flooded['errors']:>8}"
+              f"{flood['requests_per_second']:>13.0f}"
+              f"{(flood['rejected'] / flood_requests * 100 if flood_requests else 0):>9.0f}%"
+              f"{format_ms(flood['rejection_p99_ms']):>9}{result['upstream_requests_per_second']:>16.0f}")
+        if flood["errors"]:
+            print(f"  Warning: {flood['errors']} requests of the flooding client failed or timed out instead of a 429.")
+        if result["variant"] == "limited" and flooded["errors"]:
+            print(f"  Warning: {flooded['errors']} interactive requests failed, the limits are too tight for them.")
+
+# ============================================================================
+# Upload Benchmark
+# ============================================================================
+def upload(port: int, host: str, path: str, size: int) -> dict:
+    """Upload size zero bytes via HTTP/1.1 with Content-Length and wait for the response."""
+    payload = memoryview(bytes(CHUNK_SIZE))
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        started_at = time.monotonic()
+        sock.sendall(
+            f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/octet-stream\r\n"
+            f"Content-Length: {size}\r\nConnection: close\r\n\r\n".encode()
+        )
+        remaining = size
+        while remaining:
+            chunk = payload[:min(remaining, CHUNK_SIZE)]
+            sock.sendall(chunk)
+            remaining -= len(chunk)
+        sent_at = time.monotonic()
+        status_line = sock.makefile("rb").readline().decode(errors="replace").strip()
+        return {"started_at": started_at, "sent_at": sent_at, "response_at": time.monotonic(), "status": status_line}
+
+
+def benchmark_upload(client_dir: Path, nginx: str, mode: str, size: int) -> dict:
+    """Upload through the importer location in the given upload mode and measure when the upstream sees the data."""
+    config_dir = copy_client_config(client_dir)
+    try:
+        patch_nginx_upload_mode(config_dir, mode)
+        with StubEnvironment(config_dir, nginx) as environment:
+            client = upload(environment.proxy.port, environment.proxy.server_name, "/importer/upload", size)
+            uploads = environment.stubs["dataimporter-api"].uploads
+            if not uploads:
+                raise RuntimeError(f"The upload did not reach the importer stub ({client['status']}):\n{environment.proxy.error_log()}")
+            upstream = uploads[-1]
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+    start = client["started_at"]
+    return {
+        "mode": mode,
+        "bytes": size,
+        "status": client["status"],
+        "upstream_time_to_first_byte": upstream["first_body_byte_at"] - start,
+        "client_send_duration": client["sent_at"] - start,
+        "total_duration": client["response_at"] - start,
+        "upstream_bytes": upstream["bytes"],
+        "throughput_mb_per_second": size / (1024 * 1024) / (client["response_at"] - start),
+    }
+
+
+def print_upload_results(results: list) -> None:
+    print(f"{'mode':<12}{'size':>10}{'upstream TTFB':>16}{'client sent':>14}{'total':>10}{'MB/s':>10}")
+    for result in results:
+        print(f"{result['mode']:<12}{result['bytes'] / 1024 ** 3:>9.2f}G{result['upstream_time_to_first_byte']:>15.2f}s"
+              f"{result['client_send_duration']:>13.2f}s{result['total_duration']:>9.2f}s{result['throughput_mb_per_second']:>10.0f}")
+        if result["upstream_bytes"] != result["bytes"]:
+            print(f"  Warning: the importer stub received {result['upstream_bytes']} of {result['bytes']} bytes ({result['status']})")
+
+# ============================================================================
+# Self Check
+# ============================================================================
+# Sizes of the chunks of the chunked upload, the last one spans several reads of the stub
+SELF_CHECK_CHUNKS = (1, 1000, CHUNK_SIZE + 1)
+# Websocket messages of the echo check, one per frame length encoding (7 bit, 16 bit, 64 bit)
+SELF_CHECK_MESSAGE_SIZES = (10, 1000, 70000)
+
+
+def check_chunked_upload() -> Optional[str]:
+    """POST a chunked body to an importer stub. Returns the problem, None if it received every byte."""
+    with StubUpstream("dataimporter-api") as stub:
+        with socket.create_connection(("127.0.0.1", stub.port()), timeout=REQUEST_TIMEOUT_SECONDS) as sock:
+            sock.sendall(b"POST /importer/upload HTTP/1.1\r\nHost: localhost\r\nTransfer-Encoding: chunked\r\n"
+                         b"Connection: close\r\n\r\n")
+            for size in SELF_CHECK_CHUNKS:
+                sock.sendall(f"{size:x}\r\n".encode() + bytes(size) + b"\r\n")
+            sock.sendall(b"0\r\n\r\n")
+            status_line = sock.makefile("rb").readline().decode(errors="replace").strip()
+        if " 200 " not in status_line:
+            return f"the stub answered '{status_line}'"
+        received = stub.uploads[-1]["bytes"] if stub.uploads else 0
+        if received != sum(SELF_CHECK_CHUNKS):
+            return f"the stub received {received} of {sum(SELF_CHECK_CHUNKS)} bytes"
+    return None
+
+
+def check_websocket_echo() -> Optional[str]:
+    """Echo messages of every frame length over a websocket to a learning API stub. Returns the problem, None if all came back."""
+    with StubUpstream("local-learning-api") as stub:
+        sock, stream = open_websocket(stub.port(), "localhost", "/local-learning-api/ws", False)
+        with sock:
+            for size in SELF_CHECK_MESSAGE_SIZES:
+                message = os.urandom(size)
+                sock.sendall(websocket_frame(message, mask=True))
+                opcode, payload = read_websocket_frame(stream)
+                if opcode != WEBSOCKET_OPCODE_BINARY or payload != message:
+                    return f"a message of {size} bytes came back as {len(payload)} bytes (opcode {opcode})"
+            sock.sendall(websocket_frame(b"", WEBSOCKET_OPCODE_CLOSE, mask=True))
+            opcode, _ = read_websocket_frame(stream)
+            if opcode != WEBSOCKET_OPCODE_CLOSE:
+                return f"the close frame was answered with opcode {opcode}"
+    return None
+
+
+def rewrite_problems(original: str, rewritten: str, upstream_ports: dict) -> list[str]:
+    """Everything of a rewritten config file that would make the local nginx reach past the stubs or the prefix."""
+    problems = []
+    rewritten = re.sub(r'#.*', '', rewritten)  # comments may mention anything
+    if 'resolve;' in rewritten:
+        problems.append("a 'server ... resolve;' line is left")
+    if re.search(r'^\s*resolver\s', rewritten, flags=re.MULTILINE):
+        problems.append("a resolver directive is left")
+    problems += [f"the container path '{path}' is left" for path in NGINX_PATH_REWRITES if path in rewritten]
+    problems += [f"'listen {port}' is left" for port in re.findall(r'^\s*listen\s+(80|443|\[::\]:\d+)\b', rewritten, flags=re.MULTILINE)]
+    stub_ports = {port: service for service, ports in upstream_ports.items() for port in ports}
+    servers = re.findall(r'^\s*server\s+([^\s;{]+)[^;{]*;', rewritten, flags=re.MULTILINE)
+    problems += [f"the upstream server '{server}' is not a stub" for server in servers
+                 if not re.fullmatch(r'127\.0\.0\.1:\d+', server) or int(server.split(':')[1]) not in stub_ports]
+    routed = {stub_ports.get(int(server.split(':')[1])) for server in servers if server.startswith('127.0.0.1:')}
+    if 'resolve;' in re.sub(r'#.*', '', original):
+        problems += [f"no upstream server points to the {service} stub" for service in upstream_ports if service not in routed]
+    return problems
+
+
+def check_rewrite(client_dir: Path) -> Optional[str]:
+    """Rewrite the nginx files of the client directory like a benchmark run. Returns the problems, None if there are none."""
+    # ports only appear in the rewritten config, nothing listens on them
+    upstream_ports = {service: [20000 + index] for index, service in enumerate(STUB_SERVICES)}
+    problems = []
+    for https in (False, True):
+        proxy = LocalProxy(client_dir, upstream_ports, https=https)
+        try:
+            files = [*BENCHMARK_FILES[:2], BENCHMARK_FILES[3] if https else BENCHMARK_FILES[2]]
+            for file in files:
+                original = (client_dir / file).read_text()
+                problems += [f"{file}: {problem}" for problem in
+                             rewrite_problems(original, proxy.rewrite(original), upstream_ports)]
+            try:
+                proxy.rewrite("upstream unknown {\n    server unknown-service:80 resolve;\n}\n")
+                problems.append("an upstream server without a stub was not rejected")
+            except RuntimeError:
+                pass
+        finally:
+            shutil.rmtree(proxy.prefix, ignore_errors=True)
+    return "; ".join(sorted(set(problems))) or None
+
+
+def self_check(client_dir: Path) -> list:
+    """Check the stub upstreams and the config rewrite the benchmarks rely on, without running nginx."""
+    checks = {
+        "chunked upload to a stub": check_chunked_upload,
+        "websocket echo of a stub": check_websocket_echo,
+        f"rewrite of the nginx files of '{client_dir}'": lambda: check_rewrite(client_dir),
+    }
+    results = []
+    for name, check in checks.items():
+        try:
+            problem = check()
+        except (OSError, RuntimeError) as e:
+            problem = f"{type(e).__name__}: {e}"
+        results.append({"check": name, "ok": problem is None, "problem": problem})
+    return results
+
+
+def print_self_check_results(results: list) -> None:
+    for result in results:
+        print(f"{'ok' if result['ok'] else 'FAILED':<8}{result['check']}")
+        if not result["ok"]:
+            print(f"        {result['problem']}")
+
+# ============================================================================
+# Main
+# ============================================================================
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--client-dir", type=Path, default=FLNET_CLIENT_DIR, help="Client directory with the nginx files to benchmark")
+    parser.add_argument("--nginx", default="nginx", help="nginx binary to run the config with")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON, e.g. to compare config changes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = subparsers.add_parser("load", help="Requests/s and latency percentiles through every location")
+    load_parser.add_argument("--scheme", action="append", choices=SCHEMES, help="Scheme(s) to benchmark (default: all)")
+    load_parser.add_argument("--location", action="append", choices=list(BENCHMARK_LOCATIONS),
+                             help="Location(s) to benchmark (default: all)")
+    load_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per location")
+    load_parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per location and kind")
+    load_parser.add_argument("--no-websocket", action="store_true", help="Only HTTP requests, no websocket echo load")
+    load_parser.add_argument("--message-bytes", type=int, default=256, help="Size of the websocket messages")
+    load_parser.add_argument("--baseline", type=Path, help="Results of an earlier run (--output) to compare with")
+
+    replicas_parser = subparsers.add_parser("replicas", help="Throughput of an API location with 1..n replicas behind it")
+    replicas_parser.add_argument("--location", choices=list(REPLICA_LOCATIONS), default="/importer/",
+                                 help="Location of the replicated service")
+    replicas_parser.add_argument("--replicas", type=int, action="append",
+                                 help="Replica count(s) to compare (default: 1, 2 and 4)")
+    replicas_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    replicas_parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per replica count")
+    replicas_parser.add_argument("--service-ms", type=float, default=20.0,
+                                 help="Time a replica needs per request, it serves one request at a time")
+
+    tls_parser = subparsers.add_parser("tls", help="Handshake and request latency of the HTTPS config with and without the TLS fast path")
+    tls_parser.add_argument("--variant", action="append", choices=TLS_VARIANTS, help="Variant(s) to compare (default: all)")
+    tls_parser.add_argument("--key-type", action="append", choices=list(TLS_KEY_TYPES),
+                            help="Key type(s) of the self-signed certificate (default: all)")
+    tls_parser.add_argument("--handshakes", type=int, default=200, help="New and resumed connections per variant")
+    tls_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent keep-alive clients")
+    tls_parser.add_argument("--duration", type=float, default=5.0, help="Seconds of keep-alive load per variant")
+
+    idle_parser = subparsers.add_parser("idle-websockets", help="Hold many idle websockets through the learning API and check none is dropped")
+    idle_parser.add_argument("--scheme", choices=SCHEMES, default="http", help="Scheme to connect with")
+    idle_parser.add_argument("--websockets", type=int, default=200, help="Number of concurrent websockets")
+    idle_parser.add_argument("--idle-seconds", type=float, default=75.0,
+                             help="How long the websockets stay silent (default: longer than the nginx default timeout)")
+    idle_parser.add_argument("--idle-timeout", type=int,
+                             help="Websocket idle timeout to render into the config copy (default: as in the client directory)")
+
+    flood_parser = subparsers.add_parser("flood", help="Interactive latency while one client floods an endpoint, with and without rate limits")
+    flood_parser.add_argument("--variant", action="append", choices=FLOOD_VARIANTS, help="Variant(s) to compare (default: all)")
+    flood_parser.add_argument("--target", choices=list(FLOOD_TARGETS), default="token", help="Endpoint the client floods")
+    flood_parser.add_argument("--flood-address", default=DEFAULT_FLOOD_ADDRESS,
+                              help="Loopback address the flood is sent from (the interactive users use 127.0.1.x)")
+    flood_parser.add_argument("--flood-concurrency", type=int, default=32, help="Connections of the flooding client")
+    flood_parser.add_argument("--concurrency", type=int, default=4, help="Interactive users, each with its own address")
+    flood_parser.add_argument("--duration", type=float, default=10.0, help="Seconds of interactive load, alone and flooded")
+    flood_parser.add_argument("--think-ms", type=float, default=250.0, help="Pause of an interactive user between rounds")
+    flood_parser.add_argument("--service-ms", type=float, default=10.0,
+                              help="Time a service needs per request, it serves one request at a time")
+
+    upload_parser = subparsers.add_parser("upload", help="Time-to-first-byte at the importer for a large upload")
+    upload_parser.add_argument("--size-gb", type=float, default=2.0, help="Size of the synthetic upload")
+    upload_parser.add_argument("--upload-mode", action="append", choices=UPLOAD_MODES,
+                               help="Upload mode(s) to compare (default: all)")
+
+    subparsers.add_parser("selfcheck", help="Check the stub servers and the config rewrite without nginx, exit code 1 on problems")
+    args = parser.parse_args(argv)
+
+    output = {"command": args.command, "config_sha256": config_fingerprint(args.client_dir)}
+    exit_code = 0
+    if args.command == "load":
+        output["parameters"] = {"concurrency": args.concurrency, "duration": args.duration, "message_bytes": args.message_bytes}
+        baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+        results = benchmark_load(args.client_dir, args.nginx, args.scheme or list(SCHEMES),
+                                 args.location or list(BENCHMARK_LOCATIONS), args.concurrency, args.duration,
+                                 not args.no_websocket, args.message_bytes)
+        print_load_results(results, output["parameters"], baseline)
+
+    if args.command == "replicas":
+        output["parameters"] = {"concurrency": args.concurrency, "duration": args.duration, "service_ms": args.service_ms}
+        results = benchmark_replicas(args.client_dir, args.nginx, args.location, sorted(args.replicas or [1, 2, 4]),
+                                     args.concurrency, args.duration, args.service_ms / 1000)
+        print_replica_results(results)
+
+    if args.command == "tls":
+        output["parameters"] = {"handshakes": args.handshakes, "concurrency": args.concurrency, "duration": args.duration}
+        results = [
+            benchmark_tls(args.client_dir, args.nginx, variant, key_type, args.handshakes, args.concurrency, args.duration)
+            for key_type in args.key_type or list(TLS_KEY_TYPES) for variant in args.variant or TLS_VARIANTS
+        ]
+        print_tls_results(results)
+
+    if args.command == "idle-websockets":
+        output["parameters"] = {"websockets": args.websockets, "idle_seconds": args.idle_seconds}
+        result = benchmark_idle_websockets(args.client_dir, args.nginx, args.scheme, args.websockets, args.idle_seconds,
+                                           args.idle_timeout)
+        print_idle_websocket_results(result)
+        results = [result]
+        exit_code = 1 if result["dropped"] or result["refused"] else 0
+
+    if args.command == "flood":
+        output["parameters"] = {"flood_concurrency": args.flood_concurrency, "concurrency": args.concurrency,
+                                "duration": args.duration, "think_ms": args.think_ms, "service_ms": args.service_ms}
+        results = [
+            benchmark_flood(args.client_dir, args.nginx, variant, args.target, args.flood_address, args.flood_concurrency,
+                            args.concurrency, args.duration, args.think_ms / 1000, args.service_ms / 1000)
+            for variant in args.variant or FLOOD_VARIANTS
+        ]
+        print_flood_results(results)
+
+    if args.command == "upload":
+        size = int(args.size_gb * 1024 ** 3)
+        results = [benchmark_upload(args.client_dir, args.nginx, mode, size) for mode in args.upload_mode or UPLOAD_MODES]
+        print_upload_results(results)
+
+    if args.command == "selfcheck":
+        results = self_check(args.client_dir)
+        print_self_check_results(results)
+        exit_code = 0 if all(result["ok"] for result in results) else 1
+
+    if args.output:
+        output["results"] = results
+        args.output.write_text(json.dumps(output, indent=2))
+        print(f"Results written to '{args.output}'.")
+    return exit_code
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\nCancelled by user.")
+        sys.exit(1)
+    except (RuntimeError, subprocess.CalledProcessError, OSError) as e:
+        print(f"\n\nError: {e}", file=sys.stderr)
+        sys.exit(1)
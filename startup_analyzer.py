@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Analyzes the cold start of a FLNet Client.
+Reads the depends_on/healthcheck graph of the compose project, computes the
+critical path to the reverse proxy and optionally measures the start-to-healthy
+time and the memory usage of every service. From the measurement it emits tuned
+healthcheck settings as a compose overlay file. Two measured reports, e.g. of the
+separate and the shared database mode, can be compared.
+
+Usage:
+    python3 startup_analyzer.py graph
+    python3 startup_analyzer.py measure --report startup-report.json --write-overlay FLNet_client/docker-compose.healthcheck.yml
+    python3 startup_analyzer.py compare separate.json shared.json
+
+All docker interaction goes through the docker CLI (see --docker), so the tool can
+be run against a stand-in script instead of a real daemon.
+"""
+import argparse
+import json
+import math
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from client_installer import FLNET_CLIENT_DIR, render_yaml
+
+# Conditions after which a dependent service may start, see compose specification
+HEALTH_GATED_CONDITIONS = ("service_healthy", "service_completed_successfully")
+# Services the user waits for, i.e. the end of the critical path
+DEFAULT_TARGETS = ("reverse-proxy-unencrypted", "reverse-proxy-encrypted")
+# Interval of healthchecks during their start period, requires Docker Engine >= 25
+TUNED_START_INTERVAL_SECONDS = 1
+# Lower bound for a tuned start_period, a margin for slower (e.g. first) starts
+MIN_START_PERIOD_SECONDS = 30
+START_PERIOD_MARGIN_FACTOR = 3
+POLL_INTERVAL_SECONDS = 0.5
+
+# Units of 'docker stats' (binary and decimal), as factor to MiB
+MEMORY_UNITS = {"b": 1 / 2**20, "kib": 1 / 2**10, "mib": 1, "gib": 2**10, "tib": 2**20,
+                "kb": 1e3 / 2**20, "mb": 1e6 / 2**20, "gb": 1e9 / 2**20, "tb": 1e12 / 2**20}
+GO_DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+
+# ============================================================================
+# Compose Model
+# ============================================================================
+def parse_duration(value) -> Optional[float]:
+    """
+    Parse a compose duration into seconds.
+    Accepts Go duration strings ('1m30s', '500ms') and plain numbers (nanoseconds, as in docker inspect).
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1e9
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)', str(value))
+    if not parts:
+        raise ValueError(f"Invalid duration '{value}'")
+    return sum(float(number) * GO_DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_memory_mib(value: str) -> Optional[float]:
+    """Parse a memory size of 'docker stats' (e.g. '123.4MiB') into MiB."""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([a-zA-Z]+)\s*", value)
+    if not match or match.group(2).lower() not in MEMORY_UNITS:
+        return None
+    return float(match.group(1)) * MEMORY_UNITS[match.group(2).lower()]
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    """Format seconds for the report tables."""
+    return "-" if seconds is None else f"{seconds:.1f}s"
+
+
+class Service:
+    """A compose service with the attributes relevant for its startup."""
+    def __init__(self, name: str, definition: dict):
+        self.name = name
+        self.depends_on = {}
+        depends_on = definition.get("depends_on") or {}
+        if isinstance(depends_on, list):
+            depends_on = {dependency: {"condition": "service_started"} for dependency in depends_on}
+        for dependency, options in depends_on.items():
+            self.depends_on[dependency] = (options or {}).get("condition", "service_started")
+        healthcheck = definition.get("healthcheck") or {}
+        self.has_healthcheck = bool(healthcheck.get("test")) and not healthcheck.get("disable", False)
+        self.interval = parse_duration(healthcheck.get("interval")) or 30.0
+        self.start_period = parse_duration(healthcheck.get("start_period")) or 0.0
+        self.start_interval = parse_duration(healthcheck.get("start_interval"))
+        # a task that exits when done (e.g. creating databases), set for dependencies in load_compose_services
+        self.one_shot = definition.get("restart") == "no"
+
+    def check_interval_during_start(self) -> float:
+        """Time between healthchecks while the service is starting."""
+        if self.start_interval is not None and self.start_period > 0:
+            return self.start_interval
+        return self.interval
+
+    def gating_time(self, condition: str, started: dict, healthy: dict) -> Optional[float]:
+        """Point in time at which a dependent with the given condition may start."""
+        if condition in HEALTH_GATED_CONDITIONS:
+            return healthy.get(self.name)
+        return started.get(self.name)
+
+
+def load_compose_services(docker: str, compose_dir: Path) -> dict:
+    """Load the fully interpolated compose model (including active profiles) via the docker CLI."""
+    output = subprocess.run(
+        [docker, "compose", "config", "--format", "json"],
+        cwd=compose_dir, check=True, capture_output=True, text=True,
+    ).stdout
+    services = {name: Service(name, definition) for name, definition in json.loads(output).get("services", {}).items()}
+    for service in services.values():
+        for dependency, condition in service.depends_on.items():
+            if condition == "service_completed_successfully" and dependency in services:
+                services[dependency].one_shot = True
+    return services
+
+
+def start_order(services: dict) -> list:
+    """Topological order of the services (dependencies first)."""
+    order = []
+    visiting = set()
+
+    def visit(name: str):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle detected at service '{name}'")
+        visiting.add(name)
+        for dependency in services[name].depends_on:
+            if dependency in services:
+                visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in sorted(services):
+        visit(name)
+    return order
+
+# ============================================================================
+# Critical Path
+# ============================================================================
+def simulate(services: dict, durations: dict) -> tuple[dict, dict, dict]:
+    """
+    Compute start and healthy times of all services from their start-to-healthy durations.
+    Services without healthcheck count as healthy once started.
+
+    Returns:
+        (started, healthy, gated_by) where gated_by maps a service to the dependency it waited for last
+    """
+    started, healthy, gated_by = {}, {}, {}
+    for name in start_order(services):
+        service = services[name]
+        start, gate = 0.0, None
+        for dependency, condition in service.depends_on.items():
+            if dependency not in services:
+                continue  # e.g. disabled by profile
+            ready = services[dependency].gating_time(condition, started, healthy)
+            if ready >= start:
+                start, gate = ready, dependency
+        started[name] = start
+        healthy[name] = start + (durations.get(name, 0.0) if service.has_healthcheck else 0.0)
+        gated_by[name] = gate
+    return started, healthy, gated_by
+
+
+def critical_path(target: str, gated_by: dict) -> list:
+    """Chain of services the target waited for, starting with the first one."""
+    path = [target]
+    while gated_by.get(path[0]):
+        path.insert(0, gated_by[path[0]])
+    return path
+
+
+def detection_delays(services: dict) -> dict:
+    """Worst case time between a service being ready and docker marking it healthy."""
+    return {
+        name: service.check_interval_during_start()
+        for name, service in services.items() if service.has_healthcheck
+    }
+
+
+def select_targets(services: dict, targets: Optional[list]) -> list:
+    """Targets of the critical path analysis: the given ones, the active reverse proxy or all leaves."""
+    if targets:
+        return [target for target in targets if target in services]
+    proxies = [name for name in DEFAULT_TARGETS if name in services]
+    if proxies:
+        return proxies
+    dependencies = {dependency for service in services.values() for dependency in service.depends_on}
+    return sorted(name for name in services if name not in dependencies)
+
+# ============================================================================
+# Measurement
+# ============================================================================
+def compose_ps(docker: str, compose_dir: Path) -> list:
+    """Current state of the compose containers. Handles both the JSON array and JSON lines output of compose."""
+    output = subprocess.run(
+        [docker, "compose", "ps", "--all", "--format", "json"],
+        cwd=compose_dir, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    if not output:
+        return []
+    if output.startswith("["):
+        return json.loads(output)
+    return [json.loads(line) for line in output.splitlines() if line.strip()]
+
+
+def measure_startup(docker: str, compose_dir: Path, services: dict, timeout: float, down_first: bool) -> tuple[dict, dict]:
+    """
+    Run 'docker compose up -d' and poll until every service is healthy (or running if it has no healthcheck).
+    One-shot services count as healthy once they exited with code 0, they are never seen running if they are quick.
+
+    Returns:
+        (started, healthy): seconds since 'up' was issued at which each service was first seen running/healthy
+    """
+    if down_first:
+        # never remove volumes, the databases must survive the measurement
+        subprocess.run([docker, "compose", "down"], cwd=compose_dir, check=True, capture_output=True)
+
+    started, healthy = {}, {}
+    start = time.monotonic()
+    up = subprocess.Popen([docker, "compose", "up", "-d"], cwd=compose_dir,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    while True:
+        now = time.monotonic() - start
+        for container in compose_ps(docker, compose_dir):
+            name = container.get("Service")
+            if name not in services:
+                continue
+            if container.get("State") == "running":
+                started.setdefault(name, now)
+                if not services[name].has_healthcheck or container.get("Health") == "healthy":
+                    healthy.setdefault(name, now)
+            elif container.get("State") == "exited" and container.get("ExitCode") == 0 and services[name].one_shot:
+                started.setdefault(name, now)
+                healthy.setdefault(name, now)
+        if len(healthy) == len(services) and up.poll() is not None:
+            break
+        if now > timeout:
+            print(f"Warning: Timeout after {timeout:.0f}s, not healthy: {', '.join(sorted(set(services) - set(healthy)))}", file=sys.stderr)
+            break
+        time.sleep(POLL_INTERVAL_SECONDS)
+    if up.wait() != 0:
+        print(f"Warning: 'docker compose up -d' failed: {up.stderr.read().strip()}", file=sys.stderr)
+    return started, healthy
+
+def measure_memory(docker: str, compose_dir: Path, services: dict) -> dict:
+    """Current memory usage in MiB of every running service, from a single 'docker stats' sample."""
+    containers = {container.get("Name"): container.get("Service") for container in compose_ps(docker, compose_dir)
+                  if container.get("Service") in services and container.get("State") == "running"}
+    if not containers:
+        return {}
+    output = subprocess.run(
+        [docker, "stats", "--no-stream", "--format", "{{json .}}", *containers],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    memory = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        stats = json.loads(line)
+        name = containers.get(stats.get("Name"))
+        usage = parse_memory_mib(stats.get("MemUsage", "").split("/")[0])
+        if name and usage is not None:
+            # replicas of a service add up
+            memory[name] = memory.get(name, 0.0) + usage
+    return memory
+
+# ============================================================================
+# Healthcheck Tuning
+# ============================================================================
+def tuned_healthchecks(services: dict, start_to_healthy: dict) -> dict:
+    """
+    Healthcheck settings that detect readiness within about a second during startup.
+    The steady state interval is kept, only the start period is probed every TUNED_START_INTERVAL_SECONDS.
+    The start period covers the measured start-to-healthy time with a margin, so slow starts still don't count as failures.
+    """
+    tuned = {}
+    for name, service in sorted(services.items()):
+        if not service.has_healthcheck:
+            continue
+        measured = start_to_healthy.get(name)
+        start_period = max(MIN_START_PERIOD_SECONDS, service.start_period)
+        if measured is not None:
+            start_period = max(start_period, math.ceil(measured * START_PERIOD_MARGIN_FACTOR))
+        tuned[name] = {
+            "healthcheck": {
+                "start_period": f"{int(start_period)}s",
+                "start_interval": f"{TUNED_START_INTERVAL_SECONDS}s",
+            }
+        }
+    return {"services": tuned}
+
+
+def write_overlay(path: Path, overlay: dict) -> None:
+    """Write the tuned healthchecks as compose overlay file."""
+    path.write_text(
+        "# Generated by startup_analyzer.py from the healthchecks and, with measure, the measured startup.\n"
+        "# Requires Docker Engine >= 25 (start_interval), the shipped compose files do not use it.\n"
+        "# Enabled by client_installer.py via COMPOSE_FILE when present.\n"
+        + render_yaml(overlay) + "\n"
+    )
+    print(f"Tuned healthchecks written to '{path}'.")
+
+# ============================================================================
+# Report
+# ============================================================================
+def format_mib(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}MiB"
+
+
+def print_report(services: dict, started: dict, healthy: dict, gated_by: dict, targets: list, measured: bool, memory: dict) -> None:
+    """Print the per service timing table and the critical path of every target."""
+    delays = detection_delays(services)
+    kind = "measured" if measured else "estimated from healthcheck intervals only (zero boot time)"
+    print(f"Startup timeline, {kind}:")
+    print(f"{'service':<28}{'started':>10}{'healthy':>10}{'start->healthy':>16}{'check every':>13}{'memory':>10}  waited for")
+    for name in sorted(services, key=lambda service: (started.get(service, math.inf), service)):
+        duration = healthy[name] - started[name] if name in healthy and name in started else None
+        print(f"{name:<28}{format_seconds(started.get(name)):>10}{format_seconds(healthy.get(name)):>10}"
+              f"{format_seconds(duration):>16}{format_seconds(delays.get(name)):>13}{format_mib(memory.get(name)):>10}"
+              f"  {gated_by.get(name) or '-'}")
+    if memory:
+        print(f"Total memory of all services once healthy: {format_mib(sum(memory.values()))}")
+    print()
+    for target in targets:
+        path = critical_path(target, gated_by)
+        delay = sum(delays.get(name, 0.0) for name in path)
+        print(f"Critical path to '{target}' ({format_seconds(healthy.get(target))}):")
+        print("  " + " -> ".join(path))
+        print(f"  Worst case healthcheck detection delay along this path: {format_seconds(delay)}")
+    print()
+
+
+def build_report(services: dict, started: dict, healthy: dict, gated_by: dict, targets: list, memory: dict) -> dict:
+    """Machine readable version of the report."""
+    return {
+        "services": {
+            name: {
+                "depends_on": services[name].depends_on,
+                "started": started.get(name),
+                "healthy": healthy.get(name),
+                "start_to_healthy": healthy[name] - started[name] if name in healthy and name in started else None,
+                "waited_for": gated_by.get(name),
+                "healthcheck_detection_delay": detection_delays(services).get(name),
+                "memory_mib": memory.get(name),
+            } for name in sorted(services)
+        },
+        "critical_paths": {target: critical_path(target, gated_by) for target in targets},
+        "time_to_healthy": {target: healthy.get(target) for target in targets},
+        "total_memory_mib": sum(memory.values()) if memory else None,
+    }
+
+
+def compare_reports(baseline: dict, candidate: dict) -> None:
+    """Print time to healthy and memory of two measured reports side by side."""
+    def row(label: str, before: Optional[float], after: Optional[float], fmt) -> None:
+        change = "-" if before is None or after is None else f"{after - before:+.1f}"
+        print(f"{label:<36}{fmt(before):>12}{fmt(after):>12}{change:>12}")
+
+    print(f"{'':<36}{'baseline':>12}{'candidate':>12}{'change':>12}")
+    for target in sorted(set(baseline.get("time_to_healthy", {})) | set(candidate.get("time_to_healthy", {}))):
+        row(f"time to healthy: {target}", baseline.get("time_to_healthy", {}).get(target),
+            candidate.get("time_to_healthy", {}).get(target), format_seconds)
+    row("total memory", baseline.get("total_memory_mib"), candidate.get("total_memory_mib"), format_mib)
+    # services only present in one report (e.g. the shared postgres server) show up with '-'
+    for name in sorted(set(baseline["services"]) | set(candidate["services"])):
+        row(f"memory: {name}", baseline["services"].get(name, {}).get("memory_mib"),
+            candidate["services"].get(name, {}).get("memory_mib"), format_mib)
+
+
+def gated_by_measurement(services: dict, started: dict, healthy: dict) -> dict:
+    """For measured runs: the dependency that became ready last before each service started."""
+    gated_by = {}
+    for name, service in services.items():
+        gate, latest = None, -1.0
+        for dependency, condition in service.depends_on.items():
+            if dependency not in services:
+                continue
+            ready = services[dependency].gating_time(condition, started, healthy)
+            if ready is not None and ready > latest:
+                gate, latest = dependency, ready
+        gated_by[name] = gate
+    return gated_by
+
+# ============================================================================
+# Main
+# ============================================================================
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("graph", "measure", "compare"),
+                        help="graph: static analysis of the compose file. measure: start the stack and time it. "
+                             "compare: compare two reports written by measure.")
+    parser.add_argument("reports", nargs="*", type=Path, help="compare: baseline and candidate report")
+    parser.add_argument("--compose-dir", type=Path, default=FLNET_CLIENT_DIR, help="Client directory with docker-compose.yml and .env")
+    parser.add_argument("--docker", default="docker", help="docker CLI to use, e.g. a stand-in script for testing")
+    parser.add_argument("--target", action="append", help="Service(s) at the end of the critical path (default: the reverse proxy)")
+    parser.add_argument("--timeout", type=float, default=900, help="measure: seconds to wait for all services to become healthy")
+    parser.add_argument("--down-first", action="store_true", help="measure: stop the stack before starting it (volumes are kept)")
+    parser.add_argument("--report", type=Path, help="Write the timing report as JSON")
+    parser.add_argument("--write-overlay", type=Path, help="Write tuned healthcheck settings as compose overlay file")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        if len(args.reports) != 2:
+            parser.error("compare needs exactly two reports")
+        baseline, candidate = (json.loads(path.read_text()) for path in args.reports)
+        compare_reports(baseline, candidate)
+        return 0
+
+    services = load_compose_services(args.docker, args.compose_dir)
+    targets = select_targets(services, args.target)
+    if args.command == "graph":
+        # without a measurement the healthchecks themselves are the only known delay
+        started, healthy, gated_by = simulate(services, detection_delays(services))
+        measured_durations = {}
+        memory = {}
+    else:
+        started, healthy = measure_startup(args.docker, args.compose_dir, services, args.timeout, args.down_first)
+        gated_by = gated_by_measurement(services, started, healthy)
+        measured_durations = {name: healthy[name] - started[name] for name in healthy if name in started}
+        memory = measure_memory(args.docker, args.compose_dir, services)
+
+    print_report(services, started, healthy, gated_by, targets, measured=args.command == "measure", memory=memory)
+    if args.report:
+        args.report.write_text(json.dumps(build_report(services, started, healthy, gated_by, targets, memory), indent=2))
+        print(f"Report written to '{args.report}'.")
+    if args.write_overlay:
+        write_overlay(args.write_overlay, tuned_healthchecks(services, measured_durations))
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\nCancelled by user.")
+        sys.exit(1)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"\n\nError: {e}", file=sys.stderr)
+        sys.exit(1)